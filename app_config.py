@@ -0,0 +1,33 @@
+import json
+import os
+
+CONFIG_FILE = "config.json"
+
+DEFAULTS = {
+    "storage": "journal",  # 任务存储后端: "journal"（tasks.json + 日志）或 "sqlite"
+    "sqlite_file": "tasks.db",
+    "snapshot_format": "json",  # journal 后端的快照格式: "json" 或 "binary"（tasks.snap）
+    "reminders": True,  # 截止当天提醒未完成的任务
+    "reminder_time": "09:00",  # 提醒时间（本地时间）
+    "save_delay_ms": 500,  # 合并连续修改的时间窗口（毫秒）
+    "undo_memory_limit_mb": 16,  # 撤销历史占用内存的上限，超出时丢弃最旧的步骤
+    "undo_persist": False,  # 是否把撤销历史写入 tasks.json.undo，重启后仍可撤销
+    "update_check_min_interval": 600,  # 两次请求 GitHub 发布信息之间的最短间隔（秒）
+    "update_check_interval": 86400,  # 后台自动检查更新的间隔（秒），0 表示不自动检查
+    "update_check_jitter": 0.2,  # 间隔的随机抖动比例，避免大量客户端同时请求
+    "update_prefetch": False,  # 发现新版本后是否在后台预先下载更新文件
+    "update_prefetch_rate": 256,  # 后台预下载的限速（KB/s）
+    "update_keep_versions": 3,  # 保留多少份更新前的旧文件用于回滚
+}
+
+
+def load_config(path=CONFIG_FILE):
+    """读取 config.json，缺少的项使用默认值"""
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config.update(json.load(f))
+        except ValueError as e:
+            print(f"Error reading {path}: {e}")
+    return config
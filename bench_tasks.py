@@ -0,0 +1,231 @@
+"""任务持久化、加载和渲染路径的基准测试
+
+用法:
+    python bench_tasks.py                         # 1k / 10k / 100k
+    python bench_tasks.py --sizes 1000 1000000 --output results.json
+    python bench_tasks.py --compare old.json      # 与之前的结果对比
+    python bench_tasks.py --tk                    # 同时测量隐藏 Tk 窗口中的渲染
+    python bench_tasks.py --max-query-ms 25       # 每次按键的查询超过预算时以状态 1 退出
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from task_storage import JournalStorage
+from task_store import PRIORITIES, TaskStore
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+KEYSTROKES = ("", "r", "re", "rev", "revi", "review", "review d", "review de")  # 逐字输入搜索词
+WORDS = "review deploy report meeting email fix bug write plan call budget design test 会议 报告".split()
+
+
+def generate_tasks(count, seed=0):
+    rng = random.Random(seed)
+    start = date(2026, 1, 1)
+    tasks = []
+    for i in range(count):
+        tasks.append({
+            "id": i + 1,
+            "text": " ".join(rng.choices(WORDS, k=4)) + f" #{i}",
+            "deadline": (start + timedelta(days=rng.randrange(365))).isoformat() if rng.random() < 0.7 else "",
+            "priority": rng.choice(PRIORITIES),
+            "subtasks": rng.sample(WORDS, rng.randrange(3)),
+            "done": int(rng.random() < 0.1),
+        })
+    return tasks
+
+
+def write_tasks_file(path, tasks):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(tasks, f, ensure_ascii=False, indent=2)
+
+
+class Bench:
+    def __init__(self, size, batch, memory):
+        self.size = size
+        self.batch = batch
+        self.memory = memory
+        self.results = []
+
+    def measure(self, op, items, func, setup=None):
+        """计时一次 func()；需要时在另一次运行中用 tracemalloc 统计峰值内存"""
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        seconds = time.perf_counter() - start
+
+        peak = None
+        if self.memory:
+            state = setup() if setup else None
+            tracemalloc.start()
+            func(state)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        result = {
+            "size": self.size,
+            "op": op,
+            "items": items,
+            "seconds": round(seconds, 6),
+            "items_per_sec": round(items / seconds, 1) if seconds else None,
+            "peak_bytes": peak,
+        }
+        self.results.append(result)
+        peak_text = f"{peak / 1e6:9.1f} MB" if peak is not None else ""
+        print(f"{self.size:>9} {op:<12}{seconds * 1000:12.1f} ms{result['items_per_sec'] or 0:14.0f} /s {peak_text}")
+        return result
+
+
+def run_model(size, batch, memory, workdir):
+    path = os.path.join(workdir, f"tasks_{size}.json")
+    write_tasks_file(path, generate_tasks(size))
+    bench = Bench(size, batch, memory)
+
+    def fresh_storage():
+        for suffix in (".journal", ".journal.1"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return JournalStorage(path, compact_threshold=10 ** 9)
+
+    def loaded():
+        storage = fresh_storage()
+        store = TaskStore()
+        store.load(storage.load())
+        return storage, store
+
+    def load(storage):
+        TaskStore().load(storage.load())
+
+    def save(state):
+        state[0].compact()
+
+    def bulk_add(state):
+        storage, store = state
+        for item in generate_tasks(batch, seed=size):
+            del item["id"]
+            storage.add(item)
+            store.add(item)
+
+    def bulk_delete(state):
+        storage, store = state
+        ids = list(store.records)[:batch]
+        for task_id in ids:
+            store.remove(task_id)
+        storage.delete(ids)
+
+    def query_typing(state):
+        # 与主窗口相同：按截止日期排序、只显示顶层任务，每次按键重新查询
+        store = state[1]
+        for text in KEYSTROKES:
+            store.query(text, sort="deadline", roots_only=True)
+
+    bench.measure("load", size, load, fresh_storage)
+    bench.measure("save", size, save, loaded)
+    bench.measure("bulk_add", batch, bulk_add, loaded)
+    bench.measure("bulk_delete", batch, bulk_delete, loaded)
+    bench.measure("query_typing", len(KEYSTROKES), query_typing, loaded)
+    return bench.results
+
+
+def run_render(size, workdir):
+    """在隐藏的 Tk 根窗口中测量 TaskManager 的加载和一次完整滚动"""
+    import tkinter as tk
+    import task_manager
+
+    path = os.path.join(workdir, f"tasks_{size}.json")
+    write_tasks_file(path, generate_tasks(size))
+    task_manager.DATA_FILE = path
+    root = tk.Tk()
+    root.withdraw()
+    bench = Bench(size, 0, False)
+    app = None
+    try:
+        def render_load(_):
+            nonlocal app
+            app = task_manager.TaskManager(root)
+            while app.loading:
+                root.update()
+        bench.measure("render_load", size, render_load)
+
+        def scroll(_):
+            for step in range(0, 200):
+                app.task_view.yview("moveto", step / 200)
+                root.update_idletasks()
+        bench.measure("render_scroll", 200, scroll)
+        app.storage.close()
+    finally:
+        root.destroy()
+    return bench.results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["size"], r["op"]): r for r in json.load(f)["results"]}
+    print("\nsize      op           ratio (new / old)")
+    for r in results:
+        old = baseline.get((r["size"], r["op"]))
+        if old and old["seconds"]:
+            print(f"{r['size']:>9} {r['op']:<12}{r['seconds'] / old['seconds']:8.2f}x")
+
+
+def check_query_budget(results, max_ms):
+    """返回每次按键的平均查询时间超过 max_ms 的结果说明"""
+    failures = []
+    for r in results:
+        if r["op"] == "query_typing":
+            per_query = r["seconds"] / r["items"] * 1000
+            if per_query > max_ms:
+                failures.append(f"{r['size']} tasks: {per_query:.1f} ms per keystroke > {max_ms} ms")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--batch", type=int, default=1000, help="bulk add/delete 的任务数")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--label", default="", help="写入结果文件的标签，例如版本号")
+    parser.add_argument("--compare", help="之前的结果文件")
+    parser.add_argument("--no-memory", action="store_true", help="不统计峰值内存（省去第二次运行）")
+    parser.add_argument("--tk", action="store_true", help="同时测量隐藏 Tk 窗口中的渲染")
+    parser.add_argument("--max-query-ms", type=float, help="每次按键的查询时间预算（毫秒），超过时以状态 1 退出")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            results += run_model(size, args.batch, not args.no_memory, workdir)
+            if args.tk:
+                results += run_render(size, workdir)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "label": args.label,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.max_query_ms is not None:
+        failures = check_query_budget(results, args.max_query_ms)
+        for failure in failures:
+            print(f"Query budget exceeded: {failure}", file=sys.stderr)
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""发布构建，只需要 Python，Linux / macOS / Windows 上都能运行
+
+    python build.py 1.1.0 --base-url URL                           # 构建到 dist/1.1.0/
+    python build.py 1.1.0 --base-url URL --title "Task Manager(test)"  # 测试更新用的版本（原来的 task_manager_latest.py）
+    python build.py 1.1.0 --base-url URL --update-baseline         # 把本次的启动时间和大小记为基准
+    python build.py 1.1.0 --base-url URL --binary task_manager.exe --binary updater.exe  # 一起发布预先构建的程序
+
+步骤:
+    1. 把程序模块复制到输出目录，在 task_manager.py 中注入 CURRENT_VERSION（和 APP_TITLE），
+       仓库里只保留一份源码
+    2. 预编译字节码，检查语法，冒烟基准也在有 .pyc 的情况下测量。.pyc 只对构建机器上的
+       解释器版本有效，不写入清单，客户端第一次运行时自己生成
+    3. 复制 --binary 指定的预构建程序（如 PyInstaller 生成的 task_manager.exe），updater.exe
+       可以按清单中的分块哈希只下载变化的块
+    4. 生成 update_manifest 读取的 manifest.json（sha256、大小、大文件的分块哈希）和 SHA256SUMS
+    5. 冒烟基准：在新进程中测量命令行模式的启动时间、图形界面模块的导入时间和产物大小，
+       与 build_baseline.json 相比退化超过阈值时构建失败（退出码 1）；没有基准文件时同样失败，
+       需要先在构建机器上用 --update-baseline 记录一次（计时与机器有关，所以不提交到仓库）
+
+manifest 中的哈希对应的是构建产物（已注入版本号），不是仓库中的源码，所以必须用
+--base-url 指定输出目录发布到的位置，客户端按 base_url + 文件名下载；不能指向仓库标签下的原始文件。
+清单中的文件都在顶层，可以直接作为 GitHub 发布的附件（releases/download/<标签>/）上传。
+Windows 上的 updater.exe 仍由 build_updater.bat 用 PyInstaller 生成。
+"""
+import argparse
+import compileall
+import hashlib
+import json
+import os
+import platform
+import py_compile
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from task_storage import atomic_write
+from update_manifest import BLOCK_SIZE, MANIFEST_NAME, file_sha256
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(ROOT, "dist")
+EXCLUDED = {"build.py", "bench_tasks.py"}  # 只在开发时使用的脚本
+MAIN_MODULE = "task_manager.py"
+SUMS_NAME = "SHA256SUMS"
+BYTECODE_DIR = "__pycache__"
+BASELINE_FILE = os.path.join(ROOT, "build_baseline.json")
+BENCH_RUNS = 7
+MAX_TIME_REGRESSION = 0.25  # 启动时间最多比基准慢 25%
+TIME_SLACK_MS = 15          # 再加上固定的余量，避免几十毫秒量级的测量噪声导致失败
+MAX_SIZE_REGRESSION = 0.10
+
+
+class BuildError(Exception):
+    pass
+
+
+def source_files(root=ROOT):
+    return sorted(name for name in os.listdir(root)
+                  if name.endswith(".py") and name not in EXCLUDED and os.path.isfile(os.path.join(root, name)))
+
+
+def inject(source, name, value):
+    """替换模块顶层 `name = "..."` 的值，保留行尾注释"""
+    literal = json.dumps(value, ensure_ascii=False)
+    source, count = re.subn(rf'^({name} = )"[^"\n]*"', lambda m: m.group(1) + literal, source, flags=re.M)
+    if count != 1:
+        raise BuildError(f"expected one {name} assignment in {MAIN_MODULE}, found {count}")
+    return source
+
+
+def check_base_url(base_url):
+    """manifest 中的文件地址是 base_url + 相对路径，结尾必须是 /"""
+    if not re.match(r"https?://", base_url or ""):
+        raise BuildError(f"--base-url must be an http(s) URL where the build output is published, got {base_url!r}")
+    return base_url if base_url.endswith("/") else base_url + "/"
+
+
+def check_version(version):
+    from packaging.version import InvalidVersion, Version
+    try:
+        Version(version)
+    except InvalidVersion:
+        # 客户端用 packaging 比较版本号，无法解析的标签永远不会被当作新版本
+        raise BuildError(f"{version!r} is not a valid version number")
+
+
+def prepare_output(out):
+    """清空上次构建的输出；不是构建产物的目录不会被删除"""
+    if os.path.exists(out):
+        if os.listdir(out) and not os.path.exists(os.path.join(out, MANIFEST_NAME)):
+            raise BuildError(f"{out} exists and does not look like a build output, refusing to overwrite")
+        shutil.rmtree(out)
+    os.makedirs(out)
+
+
+def copy_sources(files, out, version, title=None, root=ROOT):
+    for name in files:
+        src = os.path.join(root, name)
+        dest = os.path.join(out, name)
+        if name == MAIN_MODULE:
+            with open(src, "r", encoding="utf-8") as f:
+                source = inject(f.read(), "CURRENT_VERSION", version)
+            if title is not None:
+                source = inject(source, "APP_TITLE", title)
+            with open(dest, "w", encoding="utf-8", newline="") as f:
+                f.write(source)
+            shutil.copymode(src, dest)
+        else:
+            shutil.copy2(src, dest)
+
+
+def copy_binaries(paths, out):
+    for path in paths:
+        if not os.path.isfile(path):
+            raise BuildError(f"binary {path} does not exist")
+        name = os.path.basename(path)
+        if os.path.exists(os.path.join(out, name)):
+            raise BuildError(f"binary {name} clashes with a file already in the build")
+        shutil.copy2(path, os.path.join(out, name))
+
+
+def compile_bytecode(out):
+    ok = compileall.compile_dir(out, quiet=1, invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH)
+    if not ok:
+        raise BuildError("byte-compiling failed")
+
+
+def artifact_files(out):
+    """写入清单的文件（相对路径，使用 /），不含清单本身和 __pycache__"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(out):
+        dirnames[:] = sorted(name for name in dirnames if name != BYTECODE_DIR)
+        for name in sorted(filenames):
+            path = os.path.relpath(os.path.join(dirpath, name), out).replace(os.sep, "/")
+            if path not in (MANIFEST_NAME, SUMS_NAME):
+                files.append(path)
+    return files
+
+
+def block_hashes(path):
+    with open(path, "rb") as f:
+        return [hashlib.sha256(block).hexdigest() for block in iter(lambda: f.read(BLOCK_SIZE), b"")]
+
+
+def write_manifest(out, version, base_url):
+    entries = {}
+    for relative_path in artifact_files(out):
+        path = os.path.join(out, *relative_path.split("/"))
+        entry = {"sha256": file_sha256(path), "size": os.path.getsize(path)}
+        if entry["size"] > BLOCK_SIZE:
+            # 大文件可以按块增量下载（update_manifest.build_from_blocks）
+            entry["blocks"] = block_hashes(path)
+        entries[relative_path] = entry
+    manifest = {"version": version, "base_url": base_url, "files": entries}
+    atomic_write(os.path.join(out, MANIFEST_NAME), lambda f: json.dump(manifest, f, indent=2, ensure_ascii=False))
+
+    # 与 sha256sum -c 兼容
+    sums = {path: entry["sha256"] for path, entry in entries.items()}
+    sums[MANIFEST_NAME] = file_sha256(os.path.join(out, MANIFEST_NAME))
+    lines = "".join(f"{digest}  {path}\n" for path, digest in sorted(sums.items()))
+    atomic_write(os.path.join(out, SUMS_NAME), lambda f: f.write(lines))
+    return manifest
+
+
+def _time_command(args, cwd, runs):
+    """在新进程中运行 runs 次，返回耗时的中位数（毫秒）"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise BuildError(f"smoke test {' '.join(args[1:])} failed:\n{result.stderr.decode(errors='replace')}")
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def smoke_benchmark(out, runs=BENCH_RUNS):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "tasks.json")
+        cli = [sys.executable, MAIN_MODULE, "--cli", "--local", "--data", data_file]
+        # 先写入一条任务，同时检查构建出的程序能正常运行
+        _time_command(cli + ["add", "smoke test"], out, 1)
+        results = {
+            "cli_start_ms": _time_command(cli + ["list"], out, runs),
+            "gui_import_ms": _time_command([sys.executable, "-c", "import task_manager"], out, runs),
+        }
+    results["size_bytes"] = sum(os.path.getsize(os.path.join(out, *path.split("/")))
+                                for path in artifact_files(out) + [MANIFEST_NAME, SUMS_NAME])
+    return results
+
+
+def find_regressions(results, baseline, time_ratio=MAX_TIME_REGRESSION, size_ratio=MAX_SIZE_REGRESSION):
+    failures = []
+    for key in ("cli_start_ms", "gui_import_ms"):
+        if key in baseline:
+            limit = baseline[key] * (1 + time_ratio) + TIME_SLACK_MS
+            if results[key] > limit:
+                failures.append(f"{key}: {results[key]:.1f} ms > limit {limit:.1f} ms (baseline {baseline[key]:.1f} ms)")
+    if "size_bytes" in baseline:
+        limit = baseline["size_bytes"] * (1 + size_ratio)
+        if results["size_bytes"] > limit:
+            failures.append(f"size_bytes: {results['size_bytes']} > limit {limit:.0f} (baseline {baseline['size_bytes']})")
+    return failures
+
+
+def build(version, out=None, title=None, base_url=None, bench=True, baseline_path=BASELINE_FILE,
+          update_baseline=False, time_ratio=MAX_TIME_REGRESSION, size_ratio=MAX_SIZE_REGRESSION, binaries=()):
+    """执行全部构建步骤，返回冒烟基准的结果；退化超过阈值时抛出 BuildError"""
+    check_version(version)
+    base_url = check_base_url(base_url)
+    if bench and not update_baseline and not os.path.exists(baseline_path):
+        raise BuildError(f"no baseline at {baseline_path}, so regressions cannot be checked; "
+                         "record one with --update-baseline on this build machine (or pass --no-bench)")
+    out = out or os.path.join(DIST_DIR, version)
+    prepare_output(out)
+    copy_sources(source_files(), out, version, title)
+    compile_bytecode(out)
+    copy_binaries(binaries, out)
+    manifest = write_manifest(out, version, base_url)
+    print(f"Built {len(manifest['files'])} files into {out}")
+    if not bench:
+        return None
+
+    results = smoke_benchmark(out)
+    for key, value in results.items():
+        print(f"{key:<14}{value:>12.1f}" if key.endswith("_ms") else f"{key:<14}{value:>12}")
+    if update_baseline:
+        record = dict(results, version=version, python=platform.python_version())
+        atomic_write(baseline_path, lambda f: json.dump(record, f, indent=2))
+        print(f"Baseline written to {baseline_path}")
+    else:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = find_regressions(results, baseline, time_ratio, size_ratio)
+        if failures:
+            raise BuildError("performance regression against " + baseline_path + ":\n  " + "\n  ".join(failures))
+        print(f"Within thresholds of {baseline_path} (version {baseline.get('version', '?')})")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a release of the task manager.")
+    parser.add_argument("version", help="release version, e.g. 1.1.0 (must match the GitHub release tag)")
+    parser.add_argument("--out", help="output directory (default: dist/<version>)")
+    parser.add_argument("--title", help="window title to inject instead of the default")
+    parser.add_argument("--base-url", required=True,
+                        help="URL the output directory is published at; clients download the files from there")
+    parser.add_argument("--binary", action="append", default=[],
+                        help="prebuilt program to publish with the release (repeatable), e.g. task_manager.exe")
+    parser.add_argument("--no-bench", action="store_true", help="skip the smoke benchmark")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file (default: build_baseline.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="record this build as the new baseline")
+    parser.add_argument("--max-time-regression", type=float, default=MAX_TIME_REGRESSION,
+                        help="allowed startup time increase as a fraction (default: %(default)s)")
+    parser.add_argument("--max-size-regression", type=float, default=MAX_SIZE_REGRESSION,
+                        help="allowed artifact size increase as a fraction (default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        build(args.version, args.out, args.title, args.base_url, not args.no_bench, args.baseline,
+              args.update_baseline, args.max_time_regression, args.max_size_regression, args.binary)
+    except BuildError as e:
+        print(f"Build failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""监视数据文件的变化，在 Tk 事件循环中回调
+
+Linux 上用 inotify 监视所在目录（文件会被原子替换，只监视文件本身会丢失事件），
+inotify 的文件描述符通过 createfilehandler 挂到 Tk 事件循环上，不需要额外线程；
+其他平台或 inotify 不可用时，定时比较文件的 mtime 和大小。
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+_EVENT = struct.Struct("iIII")
+
+DEBOUNCE_MS = 50     # 一次保存会产生多个事件，合并后只回调一次
+POLL_INTERVAL_MS = 1000
+
+
+def _init_inotify(directory):
+    """返回监视 directory 的 inotify 文件描述符，不可用时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """paths 中任一文件被修改、创建、删除或替换时调用 on_change()"""
+
+    def __init__(self, root, paths, on_change, poll_interval_ms=POLL_INTERVAL_MS):
+        self.root = root
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.names = {os.path.basename(path) for path in self.paths}
+        self.on_change = on_change
+        self.poll_interval_ms = poll_interval_ms
+        self._pending = None
+        self._job = None
+        self._signatures = None
+        self.fd = _init_inotify(os.path.dirname(self.paths[0]))
+        if self.fd is not None:
+            try:
+                root.tk.createfilehandler(self.fd, 2, self._on_readable)  # 2 = tkinter.READABLE
+            except (AttributeError, RuntimeError):
+                os.close(self.fd)
+                self.fd = None
+        if self.fd is None:
+            self._signatures = self._stat_all()
+            self._job = root.after(poll_interval_ms, self._poll)
+
+    @property
+    def mode(self):
+        return "inotify" if self.fd is not None else "polling"
+
+    def _on_readable(self, fd, mask):
+        relevant = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if os.fsdecode(name) in self.names:
+                    relevant = True
+        if relevant and self._pending is None:
+            self._pending = self.root.after(DEBOUNCE_MS, self._fire)
+
+    def _fire(self):
+        self._pending = None
+        self.on_change()
+
+    def _stat_all(self):
+        signatures = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signatures.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signatures.append(None)
+        return signatures
+
+    def _poll(self):
+        signatures = self._stat_all()
+        if signatures != self._signatures:
+            self._signatures = signatures
+            self.on_change()
+        self._job = self.root.after(self.poll_interval_ms, self._poll)
+
+    def stop(self):
+        if self.fd is not None:
+            self.root.tk.deletefilehandler(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        for job in (self._job, self._pending):
+            if job is not None:
+                self.root.after_cancel(job)
+        self._job = self._pending = None
@@ -0,0 +1,132 @@
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+
+BUCKET_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_stats = {}
+_lock = threading.Lock()
+
+
+class Stat:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def percentile(self, fraction):
+        """根据直方图估算分位数（返回所在桶的上界，单位毫秒）"""
+        target = self.count * fraction
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max * 1000
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max * 1000,
+            "histogram": dict(zip([f"<={b}ms" for b in BUCKET_BOUNDS_MS] + ["slower"], self.buckets)),
+        }
+
+
+def record(name, seconds):
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = Stat()
+        stat.count += 1
+        stat.total += seconds
+        stat.max = max(stat.max, seconds)
+        stat.buckets[bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+
+
+def snapshot():
+    with _lock:
+        return {name: stat.to_dict() for name, stat in sorted(_stats.items())}
+
+
+class timed:
+    """记录一段代码的耗时，可作为装饰器或 with 语句使用
+
+        @timed("load_page")
+        def _load_next_page(...): ...
+
+        with timed("journal.append"):
+            ...
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self._start)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(self.name, time.perf_counter() - start)
+        return wrapper
+
+
+class LoopLagMonitor:
+    """定时检查 Tk 事件循环的延迟：实际回调时间比预定时间晚了多少"""
+
+    def __init__(self, root, interval_ms=100):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.last_lag_ms = 0.0
+        self._job = None
+
+    def start(self):
+        if self._job is None:
+            self._schedule()
+
+    def _schedule(self):
+        expected = time.perf_counter() + self.interval_ms / 1000
+        self._job = self.root.after(self.interval_ms, self._tick, expected)
+
+    def _tick(self, expected):
+        lag = max(0.0, time.perf_counter() - expected)
+        self.last_lag_ms = lag * 1000
+        record("event_loop_lag", lag)
+        self._schedule()
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+
+class SessionProfiler:
+    """--profile-session PATH：整个会话运行 cProfile，退出时写出 PATH.prof 和 PATH.json"""
+
+    def __init__(self, path):
+        import cProfile
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def dump(self, extra=None):
+        self.profile.disable()
+        self.profile.dump_stats(self.path + ".prof")
+        with open(self.path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"timings": snapshot(), **(extra or {})}, f, indent=2)
@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from task_storage import atomic_write
+
+CACHE_FILE = "release_cache.json"
+REQUEST_TIMEOUT = (5, 30)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """两个更新程序共用的带连接池的 requests.Session"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+class ReleaseCache:
+    """发布信息的条件请求缓存
+
+    保存 ETag / Last-Modified 和解析后的 JSON，距上次检查不足 min_interval 秒时
+    直接返回缓存；否则发送条件请求，304 视为命中缓存。
+    """
+
+    def __init__(self, path=CACHE_FILE, min_interval=600):
+        self.path = path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except ValueError:
+                self._entries = {}
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+        now = time.time()
+        if entry and now - entry["checked_at"] < self.min_interval:
+            return entry["data"]
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and entry:
+            entry["checked_at"] = now
+        else:
+            response.raise_for_status()
+            entry = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "checked_at": now,
+                "data": response.json(),
+            }
+        with self._lock:
+            self._entries[url] = entry
+            atomic_write(self.path, lambda f: json.dump(self._entries, f, ensure_ascii=False))
+        return entry["data"]
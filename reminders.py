@@ -0,0 +1,110 @@
+"""截止日期提醒
+
+截止日期只在任务加入时解析一次，换算成提醒时间（截止当天的 remind_at）放进
+最小堆；只为堆顶设置一个 root.after 定时器。增删、完成任务时只调整对应的条目，
+空闲时没有任何轮询，也不会遍历整个任务列表。
+"""
+import heapq
+import time
+from datetime import date, datetime
+
+MAX_TIMER_MS = 3600 * 1000  # 定时器最长间隔，系统休眠或修改时钟后最多晚一小时提醒
+
+
+class ReminderEngine:
+    def __init__(self, root, on_due, remind_at="09:00"):
+        self.root = root
+        self.on_due = on_due  # on_due(records)：到期的 TaskRecord 列表
+        hour, minute = (int(part) for part in remind_at.split(":"))
+        self.remind_at = (hour, minute)
+        self._heap = []  # (提醒时间戳, id)，被取消或修改的条目留在堆中，弹出时跳过
+        self._entries = {}  # id -> (提醒时间戳, TaskRecord)，只有与之一致的堆条目有效
+        self._notified = set()  # 已提醒过的 (id, 时间戳)，取消完成后不会再次提醒
+        self._times = {}  # 截止日期字符串 -> 时间戳，大量任务的截止日期往往重复
+        self._job = None
+        self._armed_for = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _due_time(self, deadline):
+        due = self._times.get(deadline)
+        if due is None and deadline not in self._times:
+            try:
+                day = date.fromisoformat(deadline)
+                due = datetime(day.year, day.month, day.day, *self.remind_at).timestamp()
+            except ValueError:
+                due = None
+            self._times[deadline] = due
+        return due
+
+    def load(self, records):
+        """records 通常已按截止日期排序（TaskStore.open_by_deadline），此时 heapify 只需线性比较一遍"""
+        self._heap = []
+        self._entries = {}
+        for record in records:
+            due = self._due_time(record.deadline)
+            if due is not None:
+                self._heap.append((due, record.id))
+                self._entries[record.id] = (due, record)
+        heapq.heapify(self._heap)  # 不依赖调用方的顺序
+        self._arm()
+
+    def tasks_changed(self, records=(), removed=()):
+        """TaskService 的监听函数：records 为新增或修改的任务，removed 为删除的 id"""
+        for task_id in removed:
+            self._entries.pop(task_id, None)
+        for record in records:
+            self._schedule(record)
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            # 失效条目过多时重建堆
+            self._heap = [(due, task_id) for task_id, (due, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+        if self._heap and (self._armed_for is None or self._heap[0][0] < self._armed_for):
+            self._arm()
+
+    def _schedule(self, record):
+        due = None if record.done or not record.deadline else self._due_time(record.deadline)
+        if due is None or (record.id, due) in self._notified:
+            self._entries.pop(record.id, None)
+            return
+        entry = self._entries.get(record.id)
+        self._entries[record.id] = (due, record)
+        if entry is None or entry[0] != due:
+            heapq.heappush(self._heap, (due, record.id))
+
+    def _is_live(self, item):
+        entry = self._entries.get(item[1])
+        return entry is not None and entry[0] == item[0]
+
+    def _arm(self):
+        heap = self._heap
+        while heap and not self._is_live(heap[0]):
+            heapq.heappop(heap)
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        if not heap:
+            self._armed_for = None
+            return
+        self._armed_for = heap[0][0]
+        delay_ms = int(max(0.0, heap[0][0] - time.time()) * 1000)
+        self._job = self.root.after(min(delay_ms, MAX_TIMER_MS), self._fire)
+
+    def _fire(self):
+        self._job = None
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            item = heapq.heappop(self._heap)
+            if self._is_live(item):
+                due.append(self._entries.pop(item[1])[1])
+                self._notified.add((item[1], item[0]))
+        self._arm()
+        if due:
+            self.on_due(due)
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
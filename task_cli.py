@@ -0,0 +1,232 @@
+"""命令行和守护进程模式，不需要图形界面
+
+    python task_manager.py --cli add "Write report" --deadline 2026-11-01 --priority High
+    python task_manager.py --cli list --status open --sort deadline
+    python task_manager.py --cli done 42
+    python task_manager.py --cli due 2026-11-01
+    python task_manager.py --cli delete-done
+    python task_manager.py --daemon            # 常驻进程，通过 Unix socket 处理命令
+
+守护进程运行时，--cli 把命令发给它执行，省去每次启动时导入模块和加载任务的时间；
+连接不上时在本进程中直接执行。这个模块和 task_core 都不导入 tkinter 和 requests。
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import sys
+from contextlib import redirect_stdout
+from datetime import date
+
+from task_store import PRIORITIES, SORT_KEYS, STATUSES, format_task, is_valid_deadline
+
+DEFAULT_DATA_FILE = "tasks.json"
+SOCKET_SUFFIX = ".sock"
+CLIENT_TIMEOUT = 5  # 守护进程等待一个客户端发送请求的最长时间（秒），超时后处理下一个连接
+
+
+class CommandError(Exception):
+    pass
+
+
+class _Parser(argparse.ArgumentParser):
+    # 守护进程中解析出错时不能退出进程
+    def error(self, message):
+        raise CommandError(f"{self.prog}: error: {message}")
+
+
+def deadline_arg(text):
+    if not is_valid_deadline(text):
+        raise argparse.ArgumentTypeError(f"invalid date {text!r}, expected YYYY-MM-DD")
+    return text
+
+
+def build_parser():
+    parser = _Parser(prog="task_manager.py --cli", description="Manage tasks without the GUI.")
+    parser.add_argument("--cli", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--daemon", action="store_true", help="serve commands over a Unix socket")
+    parser.add_argument("--data", default=DEFAULT_DATA_FILE, help="task data file (default: %(default)s)")
+    parser.add_argument("--socket", help="daemon socket path (default: <data file>.sock)")
+    parser.add_argument("--local", action="store_true", help="do not use a running daemon")
+    commands = parser.add_subparsers(dest="command", parser_class=_Parser)
+
+    add = commands.add_parser("add", help="add a task")
+    add.add_argument("text")
+    add.add_argument("--deadline", default="", help="YYYY-MM-DD")
+    add.add_argument("--priority", default="Medium", choices=PRIORITIES)
+    add.add_argument("--subtasks", default="", help="comma-separated, each becomes a subtask")
+    add.add_argument("--parent", type=int, help="add as a subtask of this task id")
+
+    listing = commands.add_parser("list", help="list tasks")
+    listing.add_argument("--search", default="")
+    listing.add_argument("--priority", choices=PRIORITIES)
+    listing.add_argument("--status", default="all", choices=STATUSES)
+    listing.add_argument("--sort", default="added", choices=SORT_KEYS)
+    listing.add_argument("--json", action="store_true", help="one JSON object per line")
+
+    due = commands.add_parser("due", help="open tasks due on or before a date")
+    due.add_argument("day", nargs="?", type=deadline_arg, help="YYYY-MM-DD (default: today)")
+    due.add_argument("--json", action="store_true", help="one JSON object per line")
+
+    for name, help_text in (("done", "mark a task as done"), ("undone", "mark a task as not done")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("id", type=int)
+
+    commands.add_parser("delete-done", help="delete completed tasks")
+    commands.add_parser("archive-done", help="move completed tasks to the archive file")
+    commands.add_parser("stop", help="stop the daemon")
+    return parser
+
+
+def _print_records(records, as_json, out):
+    for record in records:
+        if as_json:
+            out.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+        else:
+            parent = f" | Parent: {record.parent}" if record.parent is not None else ""
+            out.write(f"{record.id}\t[{'x' if record.done else ' '}] {format_task(record)}{parent}\n")
+
+
+def run_command(service, args, out):
+    """在已加载的 TaskService 上执行一条命令，返回退出码"""
+    if args.command == "add":
+        try:
+            record = service.add(args.text, args.deadline, args.priority, args.subtasks.split(","), args.parent)
+        except ValueError as e:
+            raise CommandError(str(e))
+        out.write(f"Added task {record.id}\n")
+    elif args.command == "list":
+        _print_records(service.query(args.search, args.priority, args.status, args.sort), args.json, out)
+    elif args.command == "due":
+        day = args.day or date.today().isoformat()
+        _print_records(service.due_before(day), args.json, out)
+    elif args.command in ("done", "undone"):
+        try:
+            service.set_done(args.id, 1 if args.command == "done" else 0)
+        except KeyError:
+            raise CommandError(f"No task with id {args.id}")
+    elif args.command == "delete-done":
+        out.write(f"Deleted {service.delete_done()} tasks\n")
+    elif args.command == "archive-done":
+        out.write(f"Archived {service.archive_done()} tasks\n")
+    elif args.command == "stop":
+        raise CommandError("No daemon is running")
+    else:
+        raise CommandError("No command given, see --help")
+    return 0
+
+
+def socket_path(args):
+    return args.socket or os.path.splitext(args.data)[0] + SOCKET_SUFFIX
+
+
+def send_command(path, argv):
+    """把命令发给守护进程，返回 (退出码, 输出)；连接失败时抛出 OSError"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        with client.makefile("rwb") as f:
+            f.write(json.dumps({"argv": argv}).encode("utf-8") + b"\n")
+            f.flush()
+            response = json.loads(f.readline())
+    return response["status"], response["output"]
+
+
+def _handle(service, parser, line):
+    """处理守护进程收到的一行请求，返回 (退出码, 输出, 是否停止)"""
+    out = io.StringIO()
+    try:
+        # --help 等由 argparse 直接打印到 stdout 并退出，这里把它们转给客户端
+        with redirect_stdout(out):
+            args = parser.parse_args(json.loads(line)["argv"])
+        if args.command == "stop":
+            return 0, "Daemon stopped\n", True
+        # 图形界面或其他进程可能同时修改了数据文件
+        service.sync()
+        return run_command(service, args, out), out.getvalue(), False
+    except SystemExit as e:
+        return e.code or 0, out.getvalue(), False
+    except (CommandError, ValueError, KeyError, TypeError) as e:
+        return 1, out.getvalue() + f"{e}\n", False
+    except OSError as e:
+        # 磁盘已满、归档文件只读等，只让这一条命令失败，守护进程继续运行
+        return 1, out.getvalue() + f"Error: {e}\n", False
+
+
+def serve(service, path):
+    """逐个处理 Unix socket 上的命令，直到收到 stop 或 SIGTERM"""
+    import signal
+    if os.path.exists(path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(path)
+        except OSError:
+            os.remove(path)  # 上次异常退出留下的 socket 文件
+        else:
+            raise CommandError(f"A daemon is already listening on {path}")
+
+    parser = build_parser()
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        os.chmod(path, 0o600)
+        server.listen(16)
+        print(f"Serving {service.storage.path} on {path}", file=sys.stderr)
+        stopping = False
+        while not stopping:
+            conn, _ = server.accept()
+            # 只连接不发送的客户端不能阻塞其他命令
+            conn.settimeout(CLIENT_TIMEOUT)
+            with conn, conn.makefile("rwb") as f:
+                try:
+                    line = f.readline()
+                except OSError:
+                    continue
+                if not line:
+                    continue
+                status, output, stopping = _handle(service, parser, line)
+                try:
+                    f.write(json.dumps({"status": status, "output": output}, ensure_ascii=False).encode("utf-8") + b"\n")
+                    f.flush()
+                except OSError:
+                    pass  # 客户端已断开
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+    return 0
+
+
+def main(argv):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+        path = socket_path(args)
+        has_unix_socket = hasattr(socket, "AF_UNIX")
+        if args.daemon and not has_unix_socket:
+            raise CommandError("Daemon mode needs Unix domain sockets, which this platform does not support")
+
+        if not args.daemon and not args.local and has_unix_socket and os.path.exists(path):
+            try:
+                status, output = send_command(path, argv)
+            except OSError:
+                pass  # 守护进程已退出，改为本地执行
+            else:
+                (sys.stdout if status == 0 else sys.stderr).write(output)
+                return status
+
+        from task_core import TaskService
+        service = TaskService.open(args.data)
+        service.load()
+        try:
+            if args.daemon:
+                return serve(service, path)
+            return run_command(service, args, sys.stdout)
+        finally:
+            service.close()
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return 1
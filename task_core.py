@@ -0,0 +1,277 @@
+"""与界面无关的任务操作，TaskManager 窗口、命令行和守护进程共用
+
+这里不导入 tkinter 和 requests，命令行模式只需加载这些轻量模块。
+"""
+from app_config import load_config
+from task_storage import archive_tasks, open_storage
+from task_store import PRIORITIES, TaskStore, is_valid_deadline
+from undo_log import id_runs, iter_run_ids
+
+DATA_FILE = "tasks.json"
+ARCHIVE_FILE = "tasks_archive.jsonl"
+
+
+def make_task(text, deadline="", priority="Medium", parent=None):
+    """校验输入并生成任务 dict，输入无效时抛出 ValueError；parent 为父任务 id 时生成子任务"""
+    text = text.strip()
+    deadline = deadline.strip()
+    if not text:
+        raise ValueError("Task cannot be empty!")
+    if deadline and not is_valid_deadline(deadline):
+        raise ValueError("Deadline format should be YYYY-MM-DD.")
+    if priority not in PRIORITIES:
+        raise ValueError(f"Priority should be one of {', '.join(PRIORITIES)}.")
+    item = {
+        "text": text,
+        "deadline": deadline,
+        "priority": priority,
+        "subtasks": [],
+        "done": 0
+    }
+    if parent is not None:
+        item["parent"] = parent
+    return item
+
+
+class TaskService:
+    """TaskStore（内存索引）加上存储后端，所有修改同时写入两者
+
+    listeners 中的函数在每次修改后以 listener(records, removed) 调用，records 是
+    新增或修改过的 TaskRecord，removed 是删除的 id，例如用于更新提醒。
+
+    子任务是 parent 指向父任务的独立记录，有自己的完成状态；删除或归档父任务时
+    连同所有子任务一起处理。旧版本保存在 subtasks 字段中的字符串由 migrate_subtasks()
+    转换为子任务。
+
+    history 为 undo_log.UndoLog 时，添加、勾选、删除和导入都会记录撤销差异，
+    由 undo() / redo() 执行。
+    """
+
+    def __init__(self, storage, archive_file=ARCHIVE_FILE):
+        self.storage = storage
+        self.archive_file = archive_file
+        self.store = TaskStore()
+        self.listeners = []
+        self.history = None
+
+    def _notify(self, records=(), removed=()):
+        for listener in self.listeners:
+            listener(records, removed)
+
+    def _record(self, label, delta):
+        if self.history is not None:
+            self.history.push(label, delta)
+
+    @classmethod
+    def open(cls, data_file=DATA_FILE, config=None):
+        config = config or load_config()
+        return cls(open_storage(config, data_file))
+
+    def load(self):
+        self.store.load(self.storage.load())
+        self.migrate_subtasks()
+
+    def add(self, text, deadline="", priority="Medium", subtasks=(), parent=None):
+        """添加任务，subtasks 中的每个字符串作为它的子任务；parent 为父任务 id 时添加子任务"""
+        if parent is not None and self.store.get(parent) is None:
+            raise ValueError(f"No task with id {parent}")
+        item = make_task(text, deadline, priority, parent)
+        self.storage.add(item)
+        record = self.store.add(item)
+        children = [make_task(s, "", priority, record.id) for s in subtasks if s.strip()]
+        if children:
+            self.storage.add_many(children)
+        records = [record] + [self.store.add(child) for child in children]
+        self._notify(records)
+        self._record("Add Subtask" if parent is not None else "Add Task",
+                     ["delete", id_runs(r.id for r in records)])
+        return record
+
+    def migrate_subtasks(self, records=None):
+        """把 subtasks 字段中的字符串转换为子任务记录，返回转换的任务数
+
+        records 默认为所有任务，只在加载后执行一次；导入时只检查新导入的任务。
+        """
+        if records is None:
+            records = self.store.records.values()
+        legacy = [record for record in records if record.subtasks]
+        if not legacy:
+            return 0
+        children = [make_task(text, "", record.priority, record.id)
+                    for record in legacy for text in record.subtasks if text.strip()]
+        self.storage.add_many(children)
+        self.storage.update_many({record.id: {"subtasks": []} for record in legacy})
+        self.store.clear_subtasks([record.id for record in legacy])
+        self.store.extend(children)
+        self._notify(legacy + [self.store.get(child["id"]) for child in children])
+        return len(legacy)
+
+    def import_tasks(self, path):
+        """从 CSV / JSONL 导入，返回 task_io.ImportReport"""
+        from task_io import import_tasks
+        imported, report = import_tasks(path, self.storage)
+        self.store.extend(imported)
+        records = [self.store.get(item["id"]) for item in imported]
+        self._notify(records)
+        self.migrate_subtasks(records)
+        if records:
+            ids = [record.id for record in records]
+            self._record("Import Tasks", ["delete", id_runs(ids + self.store.descendants(ids))])
+        return report
+
+    def set_done(self, task_id, done):
+        record = self.store.get(task_id)
+        if record is None:
+            raise KeyError(task_id)
+        previous = record.done
+        self.store.set_done(task_id, done)
+        self.storage.update(task_id, done=done)
+        self._notify([record])
+        self._record("Mark Done" if done else "Mark Not Done", ["done", [[task_id, previous]]])
+
+    def _done_with_descendants(self):
+        done = list(self.store.done_ids)
+        return done + self.store.descendants(done)
+
+    def _remove(self, ids):
+        self.store.remove_many(ids)
+        self.storage.delete(ids)
+        self._notify(removed=ids)
+
+    def delete_done(self):
+        """删除所有已完成任务及其子任务，返回删除的数量"""
+        deleted = self._done_with_descendants()
+        if deleted:
+            self._record("Delete Completed", ["restore", [self.store.get(task_id).to_dict() for task_id in deleted]])
+            self._remove(deleted)
+        return len(deleted)
+
+    def archive_done(self):
+        """把已完成任务及其子任务移到归档文件，返回归档的数量"""
+        records = [self.store.get(task_id) for task_id in self._done_with_descendants()]
+        if not records:
+            return 0
+        archive_tasks(self.archive_file, [record.to_dict() for record in records])
+        # 归档文件只追加，撤销会让任务同时出现在两处，所以归档不记录撤销
+        self._remove([record.id for record in records])
+        return len(records)
+
+    def undo(self):
+        """撤销最近一步，返回它的说明；没有可撤销的步骤时返回 None"""
+        return self.history.undo(self._apply) if self.history is not None else None
+
+    def redo(self):
+        return self.history.redo(self._apply) if self.history is not None else None
+
+    def _apply(self, delta):
+        """执行一步撤销差异，返回反方向的差异；其他实例已删除的任务跳过"""
+        kind, payload = delta
+        store = self.store
+        if kind == "delete":
+            ids = [task_id for task_id in iter_run_ids(payload) if store.get(task_id) is not None]
+            ids += store.descendants(ids)
+            items = [store.get(task_id).to_dict() for task_id in ids]
+            self._remove(ids)
+            return ["restore", items]
+        if kind == "done":
+            inverse = []
+            for task_id, done in payload:
+                record = store.get(task_id)
+                if record is not None:
+                    inverse.append([task_id, record.done])
+                    store.set_done(task_id, done)
+            self.storage.update_many({task_id: {"done": done} for task_id, done in payload
+                                      if store.get(task_id) is not None})
+            self._notify([store.get(task_id) for task_id, _ in inverse])
+            return ["done", inverse]
+        if kind == "restore":
+            return ["delete", id_runs(self._restore(payload))]
+        raise ValueError(f"unknown undo record {kind!r}")
+
+    def _restore(self, items):
+        """按原来的 id 重新加入任务，返回加入的 id
+
+        id 已被占用（例如压缩后重新分配给了新任务）的任务分配新 id，
+        指向它的子任务随之修改 parent。
+        """
+        store = self.store
+        items = [dict(item) for item in items]  # 存储层会持有并修改加入的 dict
+        by_id = {item["id"]: item for item in items}
+
+        def depth(item):  # 父任务先于子任务
+            level, seen = 0, set()
+            while item.get("parent") in by_id and item["id"] not in seen:
+                seen.add(item["id"])
+                item = by_id[item["parent"]]
+                level += 1
+            return level
+
+        # 先加入 id 未被占用的任务，让存储层的下一个 id 越过它们，再为被占用的分配新 id
+        kept = [item for item in items if store.get(item["id"]) is None]
+        if kept:
+            self.storage.add_many(kept)
+        renamed = {}
+        for item in sorted((item for item in items if store.get(item["id"]) is not None), key=depth):
+            if item.get("parent") in renamed:
+                item["parent"] = renamed[item["parent"]]
+            old_id = item.pop("id")
+            self.storage.add(item)
+            renamed[old_id] = item["id"]
+        moved = {}
+        for item in kept:
+            if item.get("parent") in renamed:
+                item["parent"] = moved[item["id"]] = renamed[item["parent"]]
+        if moved:
+            self.storage.update_many({task_id: {"parent": parent} for task_id, parent in moved.items()})
+        store.extend(items)
+        self._notify([store.get(item["id"]) for item in items])
+        return [item["id"] for item in items]
+
+    def query(self, text="", priority=None, status="all", sort="added"):
+        return self.store.query(text, priority, status, sort)
+
+    def export_items(self):
+        """导出用的任务 dict：每个顶层任务后面按先序跟着它的子任务
+
+        子任务带 parent（指向导出文件中的 id）和自己的完成状态，再次导入时能恢复层级。
+        """
+        store = self.store
+        for record in store.records.values():
+            if store.is_root(record):
+                yield record.to_dict()
+                for task_id in store.descendants([record.id]):
+                    yield store.get(task_id).to_dict()
+
+    def due_before(self, day):
+        return self.store.due_before(day)
+
+    def sync(self):
+        """合并其他实例写入的修改，返回处理的记录数"""
+        changes = self.storage.poll_changes()
+        store = self.store
+        touched = {}
+        removed = []
+        for record in changes:
+            op = record["op"]
+            if op == "add":
+                task = record["task"]
+                if store.get(task["id"]) is None:
+                    touched[task["id"]] = store.add(task)
+                else:
+                    touched[task["id"]] = store.update(task["id"], task)
+            elif op == "update":
+                if store.get(record["id"]) is not None:
+                    touched[record["id"]] = store.update(record["id"], record["fields"])
+            elif op == "delete":
+                store.remove_many(record["ids"])
+                removed += record["ids"]
+                for task_id in record["ids"]:
+                    touched.pop(task_id, None)
+        if changes:
+            self._notify(list(touched.values()), removed)
+        return len(changes)
+
+    def close(self):
+        if self.history is not None:
+            self.history.close()
+        self.storage.close()
@@ -0,0 +1,144 @@
+import csv
+import json
+import os
+
+from task_store import PRIORITIES, is_valid_deadline
+
+FIELDS = ("text", "deadline", "priority", "subtasks", "done", "id", "parent")
+# id 和 parent 只在导出文件内部有效，用来还原子任务的层级；导入时会分配新的 id
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []  # (行号, 错误信息)，最多保留 MAX_REPORTED_ERRORS 条
+
+    def add_error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row, message))
+
+
+def parse_task(raw):
+    """把一行原始数据转换为任务 dict，返回 (item, 错误信息)"""
+    if not isinstance(raw, dict):
+        return None, "row is not an object"
+    text = str(raw.get("text") or "").strip()
+    if not text:
+        return None, "text is empty"
+
+    deadline = str(raw.get("deadline") or "").strip()
+    if deadline and not is_valid_deadline(deadline):
+        return None, f"invalid deadline {deadline!r}, expected YYYY-MM-DD"
+
+    priority = str(raw.get("priority") or "Medium").strip().capitalize()
+    if priority not in PRIORITIES:
+        return None, f"invalid priority {priority!r}"
+
+    subtasks = raw.get("subtasks") or []
+    if isinstance(subtasks, str):
+        subtasks = [s.strip() for s in subtasks.split(",") if s.strip()]
+    elif not isinstance(subtasks, list):
+        return None, "subtasks must be a list or comma-separated string"
+
+    done = raw.get("done") or 0
+    if isinstance(done, str):
+        done = done.strip().lower() in ("1", "true", "yes", "done")
+    return {"text": text, "deadline": deadline, "priority": priority,
+            "subtasks": [str(s) for s in subtasks], "done": int(bool(done))}, None
+
+
+def _parse_ref(value):
+    """id / parent 列的值，没有时返回 None，不是整数时抛出 ValueError"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (bool, float)):
+        raise ValueError(value)
+    return int(value)
+
+
+def import_tasks(path, storage, batch_size=IMPORT_BATCH_SIZE):
+    """流式导入任务文件，每 batch_size 条写入一次存储，返回 (新任务列表, ImportReport)
+
+    出错的行会记录在报告中并跳过，不会中断整个导入。parent 指向文件中前面某一行的 id 时
+    导入为它的子任务；子任务的 parent 在全部写入后一次更新。
+    """
+    report = ImportReport()
+    imported = []
+    batch = []
+    refs = {}  # 文件中的 id -> 导入的任务 dict
+    children = []  # (任务 dict, 文件中父任务的 id)
+    for row, raw, error in iter_rows(path):
+        if error is None:
+            item, error = parse_task(raw)
+        if error is None:
+            try:
+                ref, parent = _parse_ref(raw.get("id")), _parse_ref(raw.get("parent"))
+            except (TypeError, ValueError):
+                error = "id and parent must be integers"
+            else:
+                if parent is not None and parent not in refs:
+                    error = f"unknown parent {parent}, parents must come before their subtasks"
+        if error is not None:
+            report.add_error(row, error)
+            continue
+        if ref is not None:
+            refs[ref] = item
+        if parent is not None:
+            children.append((item, parent))
+        batch.append(item)
+        if len(batch) >= batch_size:
+            storage.add_many(batch)
+            imported += batch
+            batch = []
+    if batch:
+        storage.add_many(batch)
+        imported += batch
+    if children:
+        for item, parent in children:
+            item["parent"] = refs[parent]["id"]
+        storage.update_many({item["id"]: {"parent": item["parent"]} for item, _ in children})
+    report.imported = len(imported)
+    return imported, report
+
+
+def iter_rows(path):
+    """逐行读取 CSV / JSONL，产生 (行号, 原始数据, 解析错误)"""
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row, None
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line), None
+                except ValueError as e:
+                    yield line_no, None, f"invalid JSON: {e}"
+
+
+def export_tasks(path, items):
+    """把任务流式写入 CSV 或 JSONL，items 可以是任意可迭代对象"""
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            for item in items:
+                writer.writerow((item["text"], item.get("deadline", ""), item.get("priority", "Medium"),
+                                 ", ".join(item.get("subtasks", [])), item.get("done", 0),
+                                 item.get("id", ""), item.get("parent", "")))
+                count += 1
+        else:
+            for item in items:
+                f.write(json.dumps({k: item.get(k) for k in FIELDS}, ensure_ascii=False) + "\n")
+                count += 1
+    os.replace(tmp_path, path)
+    return count
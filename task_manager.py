@@ -1,97 +1,464 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
+import sys
+if __name__ == "__main__" and ("--cli" in sys.argv or "--daemon" in sys.argv):
+    # 命令行和守护进程模式不导入 tkinter 和更新相关的模块
+    from task_cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
 import tkinter as tk
-from tkinter import messagebox, ttk
-import json
+from tkinter import filedialog, messagebox, simpledialog, ttk
 import os
-from datetime import datetime
-import requests
-import zipfile
-import io
-import shutil
-import sys
-import subprocess
-from packaging import version
+from datetime import date
+import threading
+import queue
+import random
+from app_config import load_config
+from perf import LoopLagMonitor, SessionProfiler, snapshot as perf_snapshot, timed
+from reminders import ReminderEngine
+from task_core import ARCHIVE_FILE, DATA_FILE, TaskService
+from task_storage import WriteBehind, open_storage
+from task_store import PRIORITIES, SORT_KEYS, STATUSES, format_task
+from task_view import TaskListView
+from undo_log import UNDO_SUFFIX, UndoLog
+
+# 更新相关的依赖（requests、packaging、zipfile 等）只在第一次检查更新时导入
+_IMPORTS_DONE = time.perf_counter()
 
-DATA_FILE = "tasks.json"
 UPDATE_CHECK_URL = "https://api.github.com/repos/G-Est/test_tool/releases/latest"
-CURRENT_VERSION = "1.0.0"  # 当前版本号，需要与GitHub发布的版本对应
+CURRENT_VERSION = "1.0.0"  # 当前版本号，需要与GitHub发布的版本对应，发布时由 build.py 注入
+APP_TITLE = "Daily Task Manager"  # 窗口标题，发布时可由 build.py --title 替换
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+PROTECTED_FILES = {DATA_FILE, ARCHIVE_FILE, 'config.json'}
+MAX_REMINDER_LINES = 100  # 一次提醒最多列出的任务数
+
+class UpdateCancelled(Exception):
+    pass
 
 class UpdateManager:
+    release_cache = None
+    prefetched = None  # (版本号, 已暂存的文件列表)
+    _stage_lock = threading.RLock()
+    foreground = threading.Event()  # 用户正在等待更新时，后台预下载不再限速
+
     @staticmethod
-    def check_for_updates():
+    @timed("update.check")
+    def check_for_updates(raise_errors=False):
+        from packaging import version
+        from release_cache import ReleaseCache
         try:
-            response = requests.get(UPDATE_CHECK_URL)
-            response.raise_for_status()
-            latest_release = response.json()
+            if UpdateManager.release_cache is None:
+                UpdateManager.release_cache = ReleaseCache(
+                    min_interval=load_config()["update_check_min_interval"])
+            latest_release = UpdateManager.release_cache.get(UPDATE_CHECK_URL)
             latest_version = latest_release['tag_name']
             
             if version.parse(latest_version) > version.parse(CURRENT_VERSION):
                 return latest_release
             return None
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error checking for updates: {e}")
             return None
 
     @staticmethod
-    def download_and_apply_update(release_info):
+    def stage_update(release_info, progress=None, cancel_event=None):
+        """下载并校验新版本的文件，放在暂存目录中但不安装，返回暂存的文件列表"""
+        import requests
+        from update_manifest import DeltaUnavailable
+        from update_staging import UpdateStager
+        stager = UpdateStager()
+        version = release_info['tag_name']
+        with UpdateManager._stage_lock:
+            prefetched = UpdateManager.prefetched
+            if prefetched and prefetched[0] == version:
+                return prefetched[1]
+            try:
+                files = UpdateManager._stage_delta(stager, release_info, progress, cancel_event)
+            except (DeltaUnavailable, requests.RequestException) as e:
+                print(f"Delta update unavailable, downloading full package: {e}")
+                files = UpdateManager._stage_full_package(stager, release_info, progress, cancel_event)
+            UpdateManager.prefetched = (version, files)
+            return files
+
+    @staticmethod
+    @timed("update.download")
+    def download_and_apply_update(release_info, progress=None, cancel_event=None):
+        """先把新版本的文件全部暂存并校验，再一次性安装；安装失败时自动回滚
+
+        后台已经预下载过同一版本时直接安装暂存的文件。
+        """
+        from update_staging import UpdateStager
+        stager = UpdateStager(keep=load_config()["update_keep_versions"])
+        version = release_info['tag_name']
+        UpdateManager.foreground.set()
         try:
-            # 获取zipball下载URL
-            zip_url = release_info['zipball_url']
-            response = requests.get(zip_url)
-            response.raise_for_status()
-            
-            # 解压更新文件
-            with zipfile.ZipFile(io.BytesIO(response.content)) as zip_ref:
-                # 创建临时目录
-                temp_dir = "temp_update"
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-                os.makedirs(temp_dir)
-                
-                # 解压到临时目录
-                zip_ref.extractall(temp_dir)
-                
-                # 获取解压后的根目录（GitHub会创建一个包含版本号的子目录）
-                extracted_dir = os.path.join(temp_dir, os.listdir(temp_dir)[0])
-                
-                # 复制文件到当前目录（排除特定文件如数据文件）
-                for item in os.listdir(extracted_dir):
-                    s = os.path.join(extracted_dir, item)
-                    d = os.path.join(".", item)
-                    if os.path.isdir(s):
-                        shutil.copytree(s, d, dirs_exist_ok=True)
-                    else:
-                        # 跳过数据文件和特定配置文件
-                        if item not in [DATA_FILE, 'config.json']:
-                            shutil.copy2(s, d)
-                
-                # 清理临时文件
-                shutil.rmtree(temp_dir)
-                
-                return True
+            files = UpdateManager.stage_update(release_info, progress, cancel_event)
+            with UpdateManager._stage_lock:
+                UpdateManager.prefetched = None
+                try:
+                    stager.install(version, files, previous_version=CURRENT_VERSION)
+                except FileNotFoundError:
+                    # 暂存的文件已被清理，重新下载
+                    files = UpdateManager.stage_update(release_info, progress, cancel_event)
+                    UpdateManager.prefetched = None
+                    stager.install(version, files, previous_version=CURRENT_VERSION)
+            return True
+        except UpdateCancelled:
+            raise
         except Exception as e:
             print(f"Error applying update: {e}")
             return False
+        finally:
+            UpdateManager.foreground.clear()
+
+    @staticmethod
+    def rollback_update():
+        """恢复到最近一次更新之前的文件，返回恢复后的版本号"""
+        from update_staging import UpdateStager
+        return UpdateStager().rollback()
+
+    @staticmethod
+    def _stage_delta(stager, release_info, progress=None, cancel_event=None):
+        """根据发布清单只下载与本地不同的文件，返回暂存的文件列表"""
+        from update_manifest import changed_files, fetch_manifest, file_url
+        from update_staging import is_safe_path
+        manifest = fetch_manifest(release_info)
+        # 清单中的 .exe 由 updater.exe 按块更新，运行中的程序也不能在这里替换
+        binaries = {path for path in manifest["files"] if path.endswith(".exe")}
+        changed = [path for path in changed_files(manifest, skip=PROTECTED_FILES | binaries) if is_safe_path(path)]
+        total = sum(manifest["files"][path]["size"] for path in changed)
+        downloaded = 0
+
+        def report(size):
+            nonlocal downloaded
+            if cancel_event is not None and cancel_event.is_set():
+                raise UpdateCancelled()
+            downloaded += size
+            if progress:
+                progress(downloaded, total)
+
+        for relative_path in changed:
+            stager.download(release_info['tag_name'], relative_path, file_url(manifest, relative_path),
+                            manifest["files"][relative_path]["sha256"], report)
+        return changed
+
+    @staticmethod
+    def _stage_full_package(stager, release_info, progress=None, cancel_event=None):
+        import shutil
+        import tempfile
+        import zipfile
+        from release_cache import REQUEST_TIMEOUT, get_session
+        from update_staging import is_safe_path
+        # 获取zipball下载URL
+        zip_url = release_info['zipball_url']
+
+        # 流式下载到磁盘上的临时文件，内存占用与压缩包大小无关
+        with tempfile.TemporaryFile() as package:
+            with get_session().get(zip_url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                response.raise_for_status()
+                total = int(response.headers.get('content-length', 0))
+                downloaded = 0
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise UpdateCancelled()
+                    package.write(chunk)
+                    downloaded += len(chunk)
+                    if progress:
+                        progress(downloaded, total)
+
+            package.seek(0)
+            staged = []
+            with zipfile.ZipFile(package) as zip_ref:
+                UpdateManager._check_package_version(zip_ref, release_info['tag_name'])
+                for info in zip_ref.infolist():
+                    # GitHub会把所有文件放在一个包含版本号的根目录下
+                    parts = info.filename.split('/', 1)
+                    if info.is_dir() or len(parts) < 2 or not parts[1]:
+                        continue
+                    relative_path = parts[1]
+                    # 跳过数据文件和特定配置文件
+                    if relative_path in PROTECTED_FILES or not is_safe_path(relative_path):
+                        continue
+                    dest = os.path.normpath(os.path.join(".", *relative_path.split('/')))
+                    if not UpdateManager._member_changed(info, dest):
+                        continue
+
+                    # 解压到暂存目录，读取时 zipfile 会校验 CRC32
+                    with zip_ref.open(info) as src, open(stager.staging_path(release_info['tag_name'], relative_path), 'wb') as f:
+                        shutil.copyfileobj(src, f, DOWNLOAD_CHUNK_SIZE)
+                    staged.append(relative_path)
+        return staged
+
+    @staticmethod
+    def _check_package_version(zip_ref, tag):
+        """源码包里的版本号要与发布标签一致
+
+        版本号由 build.py 在构建时注入，仓库源码中的是开发用的默认值；安装这样的包后
+        程序会显示旧版本号，并不断提示同一个更新。
+        """
+        import re
+        from packaging import version
+        for info in zip_ref.infolist():
+            parts = info.filename.split('/', 1)
+            if len(parts) == 2 and parts[1] == "task_manager.py":
+                match = re.search(r'^CURRENT_VERSION = "([^"]*)"', zip_ref.read(info).decode("utf-8"), re.M)
+                if match and version.parse(match.group(1)) == version.parse(tag):
+                    return
+                found = match.group(1) if match else "none"
+                raise ValueError(f"source package for {tag} has version {found}; refusing to install it")
+        raise ValueError(f"source package for {tag} does not contain task_manager.py")
+
+    @staticmethod
+    def _member_changed(info, dest):
+        """按大小和 CRC32 判断压缩包成员与本地文件是否不同"""
+        import zlib
+        if not os.path.isfile(dest) or os.path.getsize(dest) != info.file_size:
+            return True
+        crc = 0
+        with open(dest, 'rb') as f:
+            for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                crc = zlib.crc32(block, crc)
+        return crc != info.CRC
 
     @staticmethod
     def restart_application():
+        import subprocess
         python = sys.executable
         subprocess.Popen([python] + sys.argv)
         sys.exit()
 
-class TaskManager:
+class UpdateWorker:
+    """在后台线程执行更新操作，进度和结果经队列交回 Tk 线程处理"""
+    POLL_INTERVAL = 100
+
     def __init__(self, root):
         self.root = root
-        self.root.title(f"Daily Task Manager v{CURRENT_VERSION}")
-        self.tasks = []
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def submit(self, func, on_done, on_progress=None):
+        """func(progress, cancel_event) 在工作线程中运行，回调都在 Tk 线程中调用"""
+        self.cancel_event.clear()
+        self.on_done = on_done
+        self.on_progress = on_progress
+
+        def run():
+            try:
+                result = func(lambda *args: self.queue.put(("progress", args)), self.cancel_event)
+                self.queue.put(("done", result))
+            except UpdateCancelled:
+                self.queue.put(("cancelled", None))
+            except Exception as e:
+                print(f"Update worker error: {e}")
+                self.queue.put(("done", None))
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        self.root.after(self.POLL_INTERVAL, self._poll)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _poll(self):
+        while True:
+            try:
+                kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                if self.on_progress:
+                    self.on_progress(*payload)
+            elif kind == "done":
+                self.on_done(payload)
+                return
+            else:
+                self.on_done(None, cancelled=True)
+                return
+        self.root.after(self.POLL_INTERVAL, self._poll)
+
+class UpdateScheduler:
+    """按配置的间隔在后台检查更新
+
+    每次的间隔都带随机抖动，避免大量客户端在同一时刻请求 GitHub；检查失败时
+    从 RETRY_BASE 开始指数退避，最长不超过正常间隔。发现新版本后调用 on_available，
+    开启 update_prefetch 时还会限速预下载更新文件，"Update Now" 时直接安装。
+    """
+    STARTUP_DELAY = 60  # 启动后第一次检查前的等待（秒）
+    RETRY_BASE = 60
+
+    def __init__(self, root, config, on_available, uniform=random.uniform):
+        self.root = root
+        self.uniform = uniform  # 抖动用的随机函数，测试时可替换
+        self.interval = config["update_check_interval"]
+        self.jitter = config["update_check_jitter"]
+        self.prefetch = config["update_prefetch"]
+        self.prefetch_rate = config["update_prefetch_rate"] * 1024
+        self.on_available = on_available
+        self.failures = 0
+        self.worker = UpdateWorker(root)
+        self.prefetch_worker = UpdateWorker(root)
+        self._prefetching = None
+        self._job = None
+
+    def start(self):
+        if self.interval > 0 and self._job is None:
+            self._schedule(self.STARTUP_DELAY)
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self.worker.cancel()
+        self.prefetch_worker.cancel()
+
+    def next_delay(self):
+        """下一次检查前的等待（秒）"""
+        if self.failures:
+            return min(self.interval, self.RETRY_BASE * 2 ** (self.failures - 1)) * self.uniform(1, 1 + self.jitter)
+        return self.interval * self.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _schedule(self, delay):
+        self._job = self.root.after(int(delay * 1000), self._check)
+
+    def _check(self):
+        def check(report, cancel_event):
+            try:
+                return True, UpdateManager.check_for_updates(raise_errors=True)
+            except Exception as e:
+                print(f"Scheduled update check failed: {e}")
+                return False, None
+
+        self.worker.submit(check, self._on_checked)
+
+    def _on_checked(self, result, cancelled=False):
+        if cancelled:
+            return
+        ok, release = result or (False, None)
+        self.failures = 0 if ok else self.failures + 1
+        self._schedule(self.next_delay())
+        if release is None:
+            return
+        self.on_available(release)
+        if self.prefetch and self._prefetching != release['tag_name']:
+            self._prefetching = release['tag_name']
+            self.prefetch_worker.submit(lambda report, cancel_event: self._prefetch(release, cancel_event),
+                                        lambda result, cancelled=False: None)
+
+    def _prefetch(self, release, cancel_event):
+        """限速下载更新文件；用户开始更新后不再限速"""
+        start = time.monotonic()
+
+        def throttle(downloaded, total):
+            ahead = downloaded / self.prefetch_rate - (time.monotonic() - start)
+            while ahead > 0 and not cancel_event.is_set() and not UpdateManager.foreground.is_set():
+                cancel_event.wait(min(ahead, 0.2))
+                ahead = downloaded / self.prefetch_rate - (time.monotonic() - start)
+
+        try:
+            return UpdateManager.stage_update(release, throttle, cancel_event)
+        except UpdateCancelled:
+            raise
+        except Exception as e:
+            print(f"Update prefetch failed: {e}")
+            self._prefetching = None
+            return None
+
+class StartupProfiler:
+    """--profile-startup 模式下记录启动各阶段的耗时"""
+
+    def __init__(self):
+        self.marks = [("imports", _IMPORTS_DONE)]
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self):
+        previous = _STARTUP_T0
+        for name, t in self.marks:
+            print(f"{name:<14}{(t - previous) * 1000:8.1f} ms", file=sys.stderr)
+            previous = t
+        print(f"{'total':<14}{(previous - _STARTUP_T0) * 1000:8.1f} ms", file=sys.stderr)
+
+class PerfWindow:
+    """实时显示各热点路径的耗时统计和 Tk 事件循环延迟"""
+    REFRESH_MS = 500
+
+    def __init__(self, app, on_close):
+        self.app = app
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Performance")
+        self.window.protocol("WM_DELETE_WINDOW", on_close)
+        self.text = tk.Text(self.window, width=84, height=24, font=("Courier", 9))
+        self.text.pack(fill="both", expand=True)
+        self.monitor = LoopLagMonitor(app.root)
+        self.monitor.start()
+        self._refresh()
+
+    def _refresh(self):
+        lines = [f"Event loop lag: {self.monitor.last_lag_ms:6.1f} ms    Tasks: {len(self.app.store)}"]
+        lines.append("Storage: " + "  ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}"
+                                             for k, v in self.app.storage.metrics().items()))
+        lines.append("")
+        lines.append(f"{'name':<22}{'count':>8}{'avg ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, stat in perf_snapshot().items():
+            lines.append(f"{name:<22}{stat['count']:>8}{stat['avg_ms']:>10.2f}{stat['p95_ms']:>10.1f}{stat['max_ms']:>10.1f}")
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        self._job = self.app.root.after(self.REFRESH_MS, self._refresh)
+
+    def close(self):
+        self.app.root.after_cancel(self._job)
+        self.monitor.stop()
+        self.window.destroy()
+
+class TaskManager:
+    def __init__(self, root, profiler=None):
+        self.root = root
+        self.profiler = profiler
+        self.root.title(f"{APP_TITLE} v{CURRENT_VERSION}")
+        config = load_config()
+        self.service = TaskService(WriteBehind(open_storage(config, DATA_FILE), root, config["save_delay_ms"]),
+                                   ARCHIVE_FILE)
+        self.store = self.service.store
+        self.storage = self.service.storage
+        self.service.history = UndoLog(config["undo_memory_limit_mb"] * 1024 * 1024,
+                                       DATA_FILE + UNDO_SUFFIX if config["undo_persist"] else None)
+        self.loading = True  # 任务在窗口第一次绘制后才开始加载
+        self.watcher = None
+        self.reminders = ReminderEngine(root, self.show_reminders, config["reminder_time"]) if config["reminders"] else None
+        self.reminder_window = None
 
         # 添加菜单栏
         self.menu_bar = tk.Menu(root)
         self.file_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.file_menu.add_command(label="Import Tasks...", command=self.import_tasks)
+        self.import_menu_index = self.file_menu.index("end")
+        self.file_menu.add_command(label="Export Tasks...", command=self.export_tasks)
+        self.file_menu.add_separator()
         self.file_menu.add_command(label="Check for Updates", command=self.check_updates)
+        self.update_menu_index = self.file_menu.index("end")
+        self.file_menu.add_command(label="Roll Back Last Update", command=self.rollback_update)
         self.file_menu.add_separator()
-        self.file_menu.add_command(label="Exit", command=root.quit)
+        self.file_menu.add_command(label="Exit", command=self.quit)
         self.menu_bar.add_cascade(label="File", menu=self.file_menu)
+        self.edit_menu = tk.Menu(self.menu_bar, tearoff=0, postcommand=self._update_edit_menu)
+        self.edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo)
+        self.edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo)
+        self.menu_bar.add_cascade(label="Edit", menu=self.edit_menu)
+        root.bind("<Control-z>", lambda e: self.undo())
+        root.bind("<Control-y>", lambda e: self.redo())
+        root.bind("<Control-Z>", lambda e: self.redo())  # Ctrl+Shift+Z
+        self.view_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.show_perf = tk.BooleanVar(value=False)
+        self.view_menu.add_checkbutton(label="Performance", variable=self.show_perf, command=self.toggle_perf_window)
+        self.menu_bar.add_cascade(label="View", menu=self.view_menu)
+        self.perf_window = None
         root.config(menu=self.menu_bar)
+        root.protocol("WM_DELETE_WINDOW", self.quit)
 
         self.frame = tk.Frame(root)
         self.frame.pack(padx=10, pady=10)
@@ -122,11 +489,113 @@ class TaskManager:
         self.delete_button = tk.Button(self.frame, text="Delete Completed", command=self.delete_done)
         self.delete_button.grid(row=3, column=2, columnspan=2, sticky="e")
 
-        # 任务列表显示 (保持不变)
-        self.task_frame = tk.Frame(self.frame)
-        self.task_frame.grid(row=4, column=0, columnspan=6, pady=10)
+        self.archive_button = tk.Button(self.frame, text="Archive Completed", command=self.archive_done)
+        self.archive_button.grid(row=3, column=4, columnspan=2, sticky="e")
+
+        # 搜索、筛选和排序
+        self.filter_frame = tk.Frame(self.frame)
+        self.filter_frame.grid(row=4, column=0, columnspan=6, sticky="w", pady=(10, 0))
+        tk.Label(self.filter_frame, text="Search:").pack(side="left")
+        self.search_text = tk.StringVar()
+        tk.Entry(self.filter_frame, textvariable=self.search_text, width=20).pack(side="left", padx=(0, 10))
+        self.filter_priority = tk.StringVar(value="All")
+        self.filter_status = tk.StringVar(value="all")
+        self.sort_key = tk.StringVar(value="added")
+        for label, var, values in (("Priority:", self.filter_priority, ("All",) + PRIORITIES),
+                                   ("Status:", self.filter_status, STATUSES),
+                                   ("Sort:", self.sort_key, SORT_KEYS)):
+            tk.Label(self.filter_frame, text=label).pack(side="left")
+            ttk.Combobox(self.filter_frame, textvariable=var, values=values, state="readonly",
+                         width=8).pack(side="left", padx=(0, 10))
+        for var in (self.search_text, self.filter_priority, self.filter_status, self.sort_key):
+            var.trace_add("write", lambda *args: self.refresh_view())
+
+        # 任务列表显示：只绘制可见行
+        self.task_view = TaskListView(self.frame, on_toggle=self.on_task_toggled, store=self.store,
+                                      on_context=self.show_task_menu)
+        self.task_view.grid(row=5, column=0, columnspan=6, pady=10)
+        self._set_loading(True)
+
+        # 先让窗口完成第一次绘制，再加载任务
+        self.root.after_idle(lambda: self.root.after(0, self._after_first_paint))
+
+        self.update_scheduler = UpdateScheduler(root, config, self._on_update_available)
+        if profiler is None:
+            self.update_scheduler.start()
+
+    def toggle_perf_window(self):
+        if self.perf_window is None:
+            self.perf_window = PerfWindow(self, on_close=self._close_perf_window)
+            self.show_perf.set(True)
+        else:
+            self._close_perf_window()
 
-        self.load_tasks()
+    def _close_perf_window(self):
+        if self.perf_window is not None:
+            self.perf_window.close()
+            self.perf_window = None
+        self.show_perf.set(False)
+
+    def show_reminders(self, records):
+        """在提醒窗口中列出到期的任务，窗口已打开时追加"""
+        if self.reminder_window is None or not self.reminder_window.winfo_exists():
+            self.reminder_window = tk.Toplevel(self.root)
+            self.reminder_window.title("Reminders")
+            self.reminder_list = tk.Listbox(self.reminder_window, width=80, height=10)
+            self.reminder_list.pack(fill="both", expand=True, padx=10, pady=10)
+            tk.Button(self.reminder_window, text="Dismiss", command=self.reminder_window.destroy).pack(pady=(0, 10))
+        today = date.today().isoformat()
+        for record in records[:MAX_REMINDER_LINES]:
+            status = "Overdue" if record.deadline < today else "Due today"
+            self.reminder_list.insert(tk.END, f"{status}: {format_task(record)}")
+        if len(records) > MAX_REMINDER_LINES:
+            self.reminder_list.insert(tk.END, f"... and {len(records) - MAX_REMINDER_LINES} more (Status: overdue)")
+        self.reminder_window.lift()
+        self.root.bell()
+
+    @timed("sync_tasks")
+    def sync_tasks(self):
+        if self.service.sync():
+            self.refresh_view()
+
+    def _on_update_available(self, release):
+        self.file_menu.entryconfig(self.update_menu_index, label=f"Update Available ({release['tag_name']})...")
+
+    def quit(self):
+        """退出前写入尚未保存的修改"""
+        self.update_scheduler.stop()
+        if self.reminders is not None:
+            self.reminders.stop()
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.storage.flush()
+        self.root.quit()
+
+    def restart(self):
+        """先写入尚未保存的修改并关闭存储，新进程启动时不会读到旧数据，也不会与本进程争用文件"""
+        self.quit()
+        self.service.close()  # 也释放撤销文件的锁，新进程才能接着使用它
+        UpdateManager.restart_application()
+
+    def _after_first_paint(self):
+        if self.profiler:
+            self.profiler.mark("first_paint")
+        self.load_tasks(self._on_tasks_loaded)
+
+    def _on_tasks_loaded(self):
+        # 其他实例修改同一数据文件时增量合并；加载期间的修改在第一次同步时读入
+        from file_watch import FileWatcher
+        self.watcher = FileWatcher(self.root, self.storage.watch_paths(), self.sync_tasks)
+        self.sync_tasks()
+        if self.service.migrate_subtasks():
+            self.refresh_view()
+        if self.reminders is not None:
+            self.reminders.load(self.store.open_by_deadline())
+            self.service.listeners.append(self.reminders.tasks_changed)
+        if self.profiler:
+            self.profiler.mark("load_tasks")
+            self.profiler.report()
+            self.root.quit()
 
     def check_updates(self):
         """检查更新并在有新版本时提示用户"""
@@ -140,10 +609,19 @@ class TaskManager:
         progress = ttk.Progressbar(update_window, mode='indeterminate')
         progress.pack(pady=10)
         progress.start()
+
+        worker = UpdateWorker(self.root)
+        cancel_btn = tk.Button(update_window, text="Cancel", command=update_window.destroy)
+        cancel_btn.pack(pady=5)
+        update_window.bind("<Destroy>", lambda e: worker.cancel() if e.widget is update_window else None)
         
-        def do_check():
-            latest_release = UpdateManager.check_for_updates()
-            
+        def on_checked(latest_release, cancelled=False):
+            if not update_window.winfo_exists():
+                return
+            progress.stop()
+            progress.pack_forget()
+            cancel_btn.pack_forget()
+
             if latest_release is None:
                 label.config(text="You are using the latest version.")
             else:
@@ -154,12 +632,9 @@ class TaskManager:
                 update_btn = tk.Button(update_window, text="Update Now", 
                                      command=lambda: self.perform_update(latest_release, update_window))
                 update_btn.pack(pady=10)
-            
-            progress.stop()
-            progress.pack_forget()
         
         # 在后台线程中执行检查
-        self.root.after(100, do_check)
+        worker.submit(lambda report, cancel_event: UpdateManager.check_for_updates(), on_checked)
 
     def perform_update(self, release_info, update_window):
         """执行更新过程"""
@@ -172,54 +647,65 @@ class TaskManager:
         progress = ttk.Progressbar(update_window, mode='indeterminate')
         progress.pack(pady=10)
         progress.start()
+
+        worker = UpdateWorker(self.root)
+        cancel_btn = tk.Button(update_window, text="Cancel", command=worker.cancel)
+        cancel_btn.pack(pady=5)
+        update_window.bind("<Destroy>", lambda e: worker.cancel() if e.widget is update_window else None)
+
+        def on_progress(downloaded, total):
+            if total and update_window.winfo_exists():
+                if str(progress['mode']) != 'determinate':
+                    progress.stop()
+                    progress.config(mode='determinate', maximum=total)
+                progress['value'] = downloaded
         
-        def do_update():
-            success = UpdateManager.download_and_apply_update(release_info)
+        def on_updated(success, cancelled=False):
+            if not update_window.winfo_exists():
+                return
             progress.stop()
+            cancel_btn.pack_forget()
             
-            if success:
+            if cancelled:
+                label.config(text="Update cancelled.")
+            elif success:
                 label.config(text="Update successful! The application will now restart.")
                 update_btn = tk.Button(update_window, text="Restart Now", 
-                                     command=UpdateManager.restart_application)
+                                     command=self.restart)
                 update_btn.pack(pady=10)
             else:
                 label.config(text="Update failed. Please try again later.")
         
-        self.root.after(100, do_update)
+        worker.submit(lambda report, cancel_event: UpdateManager.download_and_apply_update(release_info, report, cancel_event),
+                      on_updated, on_progress)
+
+    def rollback_update(self):
+        if not messagebox.askyesno("Roll Back Update", "Restore the files replaced by the last update and restart?"):
+            return
+        try:
+            restored = UpdateManager.rollback_update()
+        except (OSError, KeyError) as e:
+            messagebox.showerror("Error", f"Rollback failed: {e}")
+            return
+        messagebox.showinfo("Roll Back Update", f"Restored version {restored or 'before the last update'}. The application will now restart.")
+        self.restart()
 
     # 以下方法保持不变...
+    @timed("add_task")
     def add_task(self):
-        text = self.task_entry.get().strip()
-        deadline = self.deadline_entry.get().strip()
-        priority = self.priority.get()
-        subtasks = [s.strip() for s in self.subtasks_entry.get().split(",") if s.strip()]
-
-        if not text:
-            messagebox.showwarning("Warning", "Task cannot be empty!")
+        if self.loading:
+            return
+        subtasks = self.subtasks_entry.get().split(",")
+        try:
+            record = self.service.add(self.task_entry.get(), self.deadline_entry.get(), self.priority.get(), subtasks)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
-
-        if deadline:
-            try:
-                datetime.strptime(deadline, "%Y-%m-%d")
-            except ValueError:
-                messagebox.showerror("Error", "Deadline format should be YYYY-MM-DD.")
-                return
-
-        var = tk.IntVar()
-        info = f"{text} | Due: {deadline or 'N/A'} | Priority: {priority}"
-        if subtasks:
-            info += f" | Subtasks: {', '.join(subtasks)}"
-        cb = tk.Checkbutton(self.task_frame, text=info, variable=var, anchor="w", justify="left", wraplength=400)
-        cb.pack(anchor='w')
-        self.tasks.append((cb, var, {
-            "text": text,
-            "deadline": deadline,
-            "priority": priority,
-            "subtasks": subtasks,
-            "done": 0
-        }))
         self.clear_inputs()
-        self.save_tasks()
+        self.refresh_view()
+        rows = self.task_view.rows
+        if rows and rows[-1] is record:
+            self.task_view.see(len(rows) - 1)
 
     def clear_inputs(self):
         self.task_entry.delete(0, tk.END)
@@ -227,39 +713,155 @@ class TaskManager:
         self.subtasks_entry.delete(0, tk.END)
         self.priority.set("Medium")
 
+    @timed("delete_done")
     def delete_done(self):
-        new_tasks = []
-        for cb, var, data in self.tasks:
-            if var.get() == 0:
-                new_tasks.append((cb, var, data))
-            else:
-                cb.destroy()
-        self.tasks = new_tasks
-        self.save_tasks()
-
-    def save_tasks(self):
-        data = []
-        for cb, var, item in self.tasks:
-            item["done"] = var.get()
-            data.append(item)
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
-    def load_tasks(self):
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for item in data:
-                    var = tk.IntVar(value=item.get("done", 0))
-                    info = f"{item['text']} | Due: {item.get('deadline') or 'N/A'} | Priority: {item.get('priority', 'Medium')}"
-                    subtasks = item.get("subtasks", [])
-                    if subtasks:
-                        info += f" | Subtasks: {', '.join(subtasks)}"
-                    cb = tk.Checkbutton(self.task_frame, text=info, variable=var, anchor="w", justify="left", wraplength=400)
-                    cb.pack(anchor='w')
-                    self.tasks.append((cb, var, item))
+        if self.loading:
+            return
+        # 只处理已完成任务的 id 集合，不扫描整个列表；列表视图最后只重绘一次
+        self.service.delete_done()
+        self.refresh_view()
+
+    @timed("archive_done")
+    def archive_done(self):
+        """把已完成任务移到归档文件，不再留在活动列表中"""
+        if self.loading:
+            return
+        try:
+            archived = self.service.archive_done()
+        except OSError as e:
+            messagebox.showerror("Error", f"Archive failed: {e}")
+            return
+        if archived:
+            self.refresh_view()
+
+    def import_tasks(self):
+        """从 CSV / JSONL 批量导入任务，结束后只刷新一次列表"""
+        if self.loading:
+            return
+        path = filedialog.askopenfilename(title="Import Tasks",
+                                          filetypes=[("Task files", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")])
+        if not path:
+            return
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            report = self.service.import_tasks(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Import failed: {e}")
+            return
+        finally:
+            self.root.config(cursor="")
+        self.refresh_view()
+
+        message = f"Imported {report.imported} tasks."
+        if report.error_count:
+            lines = "\n".join(f"Row {row}: {error}" for row, error in report.errors[:10])
+            message += f"\n\n{report.error_count} rows were skipped:\n{lines}"
+            if report.error_count > 10:
+                message += "\n..."
+        messagebox.showinfo("Import Tasks", message)
+
+    def export_tasks(self):
+        from task_io import export_tasks
+        path = filedialog.asksaveasfilename(title="Export Tasks", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+        try:
+            count = export_tasks(path, self.service.export_items())
+        except OSError as e:
+            messagebox.showerror("Error", f"Export failed: {e}")
+            return
+        messagebox.showinfo("Export Tasks", f"Exported {count} tasks.")
+
+    def _update_edit_menu(self):
+        history = self.service.history
+        for index, verb, label in ((0, "Undo", history.undo_label), (1, "Redo", history.redo_label)):
+            self.edit_menu.entryconfig(index, label=f"{verb} {label}" if label else verb,
+                                       state="normal" if label and not self.loading else "disabled")
+
+    @timed("undo")
+    def undo(self):
+        if not self.loading and self.service.undo():
+            self.refresh_view()
+
+    @timed("redo")
+    def redo(self):
+        if not self.loading and self.service.redo():
+            self.refresh_view()
+
+    def on_task_toggled(self, record):
+        self.service.set_done(record.id, 0 if record.done else 1)
+
+    def show_task_menu(self, record, event):
+        menu = tk.Menu(self.root, tearoff=0)
+        menu.add_command(label="Add Subtask...", command=lambda: self.add_subtask(record))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def add_subtask(self, record):
+        if self.loading:
+            return
+        text = simpledialog.askstring("Add Subtask", f"Subtask of: {record.text}", parent=self.root)
+        if not text:
+            return
+        try:
+            self.service.add(text, "", record.priority, parent=record.id)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.task_view.expand(record.id)
+        self.refresh_view()
+
+    @timed("refresh_view")
+    def refresh_view(self):
+        """按当前的搜索词、筛选和排序条件重新查询列表"""
+        priority = self.filter_priority.get()
+        rows = self.store.query(self.search_text.get(), None if priority == "All" else priority,
+                                self.filter_status.get(), self.sort_key.get(), roots_only=True)
+        self.task_view.set_rows(rows)
+
+    def _set_loading(self, loading):
+        """加载期间只有部分任务在内存中，添加、导入、删除和归档都要等加载完成"""
+        self.loading = loading
+        state = "disabled" if loading else "normal"
+        for button in (self.add_button, self.delete_button, self.archive_button):
+            button.config(state=state)
+        self.file_menu.entryconfig(self.import_menu_index, state=state)
+
+    def load_tasks(self, on_loaded=None):
+        """分页加载任务，每页之间让出事件循环，窗口在加载大量任务时仍可响应"""
+        self._set_loading(True)
+        self.store.load(())
+        self._load_next_page(self.storage.iter_pages(), on_loaded)
+
+    @timed("load_tasks.page")
+    def _load_next_page(self, pages, on_loaded):
+        page = next(pages, None)
+        if page is None:
+            self._set_loading(False)
+            if on_loaded:
+                on_loaded()
+            return
+        self.store.extend(page)
+        self.refresh_view()
+        self.root.after(1, self._load_next_page, pages, on_loaded)
 
 if __name__ == "__main__":
+    from update_staging import UpdateStager
+    if UpdateStager().recover():
+        print("Previous update was interrupted and has been rolled back.", file=sys.stderr)
+    profiler = StartupProfiler() if "--profile-startup" in sys.argv else None
+    session_profiler = None
+    if "--profile-session" in sys.argv:
+        index = sys.argv.index("--profile-session") + 1
+        session_profiler = SessionProfiler(sys.argv[index] if index < len(sys.argv) else "session_profile")
     root = tk.Tk()
-    app = TaskManager(root)
-    root.mainloop()
\ No newline at end of file
+    if profiler:
+        profiler.mark("tk_init")
+    app = TaskManager(root, profiler)
+    if profiler:
+        profiler.mark("ui_init")
+    root.mainloop()
+    if session_profiler:
+        session_profiler.dump({"storage": app.storage.metrics()})
+    app.service.close()
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""紧凑的二进制任务快照格式
+
+文件布局（小端）:
+    头部     b"TMS2" | 记录数 u32 | 字符串表偏移 u64 | 索引偏移 u64 | 下一个可用 id u64
+    记录区   每条记录: 长度 u32 | 记录内容
+    字符串表 数量 u32 | 每个字符串: 长度 u32 | UTF-8
+    索引     每条记录的起始偏移 u64
+
+记录内容:
+    id u64 | 标志 u8 | 优先级引用 u32 | 子任务数 u32 | text 长度 u32 + UTF-8
+    | deadline 长度 u8 + UTF-8 | 子任务引用 u32 * n | 额外字段 JSON 长度 u32 + UTF-8
+
+头部中的“下一个可用 id”（最大整数 id + 1，无法表示时为 0）让分页加载在读完全部记录之前
+就能正确分配新 id。旧的 b"TMS1" 头部没有这一项，读取时扫描记录得到。
+
+优先级和子任务字符串放在共享的字符串表里，只存一份。通过 mmap 读取时，
+记录在访问时才解码。无法用上述字段精确表示的任务（字段类型不同等）整体
+以 JSON 存在“额外字段”中，保证与 JSON 格式往返无损。
+
+    python task_snapshot.py verify tasks.json   # 检查往返是否无损
+"""
+import json
+import mmap
+import struct
+import sys
+
+MAGIC = b"TMS2"
+MAGIC_V1 = b"TMS1"
+HEADER = struct.Struct("<4sIQQQ")
+HEADER_V1 = struct.Struct("<4sIQQ")
+RECORD_HEAD = struct.Struct("<QBIII")
+U32 = struct.Struct("<I")
+U64 = struct.Struct("<Q")
+
+DONE = 0x01
+HAS_DONE = 0x02
+HAS_DEADLINE = 0x04
+HAS_PRIORITY = 0x08
+HAS_SUBTASKS = 0x10
+RAW = 0x80
+
+KNOWN_KEYS = {"id", "text", "deadline", "priority", "subtasks", "done"}
+
+
+def _fits(item):
+    """判断任务能否用定长字段精确表示"""
+    task_id = item.get("id")
+    if type(task_id) is not int or not 0 <= task_id < 2 ** 64:
+        return False
+    if type(item.get("text")) is not str:
+        return False
+    deadline = item.get("deadline", "")
+    if type(deadline) is not str or len(deadline.encode("utf-8")) > 255:
+        return False
+    if type(item.get("priority", "")) is not str:
+        return False
+    subtasks = item.get("subtasks", [])
+    if type(subtasks) is not list or any(type(s) is not str for s in subtasks):
+        return False
+    return item.get("done", 0) in (0, 1) and type(item.get("done", 0)) is int
+
+
+def write_snapshot(f, items):
+    """把任务写入可 seek 的二进制文件对象 f"""
+    strings = []
+    string_ids = {}
+
+    def intern(s):
+        ref = string_ids.get(s)
+        if ref is None:
+            ref = string_ids[s] = len(strings)
+            strings.append(s)
+        return ref
+
+    f.write(HEADER.pack(MAGIC, 0, 0, 0, 0))
+    offsets = []
+    offset = HEADER.size
+    next_id = 1
+    for item in items:
+        if type(item.get("id")) is int:
+            next_id = max(next_id, item["id"] + 1)
+        if _fits(item):
+            flags = (DONE if item.get("done") else 0) | (HAS_DONE if "done" in item else 0)
+            flags |= (HAS_DEADLINE if "deadline" in item else 0) | (HAS_PRIORITY if "priority" in item else 0)
+            flags |= HAS_SUBTASKS if "subtasks" in item else 0
+            extra = {k: v for k, v in item.items() if k not in KNOWN_KEYS}
+            task_id = item["id"]
+            text = item["text"].encode("utf-8")
+            deadline = item.get("deadline", "").encode("utf-8")
+            priority_ref = intern(item.get("priority", ""))
+            subtask_refs = [intern(s) for s in item.get("subtasks", [])]
+        else:
+            flags = RAW
+            extra = item
+            task_id, text, deadline, priority_ref, subtask_refs = 0, b"", b"", 0, []
+        extra_bytes = json.dumps(extra, ensure_ascii=False).encode("utf-8") if extra else b""
+
+        body = b"".join((
+            RECORD_HEAD.pack(task_id, flags, priority_ref, len(subtask_refs), len(text)),
+            text,
+            bytes((len(deadline),)),
+            deadline,
+            struct.pack(f"<{len(subtask_refs)}I", *subtask_refs),
+            U32.pack(len(extra_bytes)),
+            extra_bytes,
+        ))
+        f.write(U32.pack(len(body)))
+        f.write(body)
+        offsets.append(offset)
+        offset += U32.size + len(body)
+
+    string_offset = offset
+    f.write(U32.pack(len(strings)))
+    for s in strings:
+        data = s.encode("utf-8")
+        f.write(U32.pack(len(data)))
+        f.write(data)
+    index_offset = f.tell()
+    f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, len(offsets), string_offset, index_offset, next_id if next_id < 2 ** 64 else 0))
+    f.seek(0, 2)
+
+
+class SnapshotReader:
+    """通过 mmap 读取快照，按下标访问时才解码对应的记录"""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法 mmap
+            self._file.close()
+            raise ValueError(f"{path} is not a task snapshot")
+        try:
+            magic = self._map[:4]
+            if magic == MAGIC:
+                _, self.count, string_offset, index_offset, self._next_id = HEADER.unpack_from(self._map, 0)
+            elif magic == MAGIC_V1:
+                _, self.count, string_offset, index_offset = HEADER_V1.unpack_from(self._map, 0)
+                self._next_id = 0
+            else:
+                raise struct.error("bad magic")
+        except struct.error:
+            self.close()
+            raise ValueError(f"{path} is not a task snapshot")
+
+        self.strings = []
+        (n,) = U32.unpack_from(self._map, string_offset)
+        pos = string_offset + U32.size
+        for _ in range(n):
+            (length,) = U32.unpack_from(self._map, pos)
+            pos += U32.size
+            self.strings.append(self._map[pos:pos + length].decode("utf-8"))
+            pos += length
+        self._index_offset = index_offset
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def next_id(self):
+        """比所有整数 id 都大的最小 id（至少为 1），不需要解码全部记录"""
+        if not self._next_id:
+            next_id = 1
+            for i in range(self.count):
+                task_id = self[i].get("id")
+                if type(task_id) is int:
+                    next_id = max(next_id, task_id + 1)
+            self._next_id = next_id
+        return self._next_id
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        buf = self._map
+        (pos,) = U64.unpack_from(buf, self._index_offset + 8 * i)
+        pos += U32.size
+        task_id, flags, priority_ref, n_subtasks, text_len = RECORD_HEAD.unpack_from(buf, pos)
+        pos += RECORD_HEAD.size
+        text = buf[pos:pos + text_len].decode("utf-8")
+        pos += text_len
+        deadline_len = buf[pos]
+        deadline = buf[pos + 1:pos + 1 + deadline_len].decode("utf-8")
+        pos += 1 + deadline_len
+        subtask_refs = struct.unpack_from(f"<{n_subtasks}I", buf, pos)
+        pos += 4 * n_subtasks
+        (extra_len,) = U32.unpack_from(buf, pos)
+        extra = json.loads(buf[pos + U32.size:pos + U32.size + extra_len].decode("utf-8")) if extra_len else {}
+        if flags & RAW:
+            return extra
+
+        item = {"id": task_id, "text": text}
+        if flags & HAS_DEADLINE:
+            item["deadline"] = deadline
+        if flags & HAS_PRIORITY:
+            item["priority"] = self.strings[priority_ref]
+        if flags & HAS_SUBTASKS:
+            item["subtasks"] = [self.strings[ref] for ref in subtask_refs]
+        if flags & HAS_DONE:
+            item["done"] = 1 if flags & DONE else 0
+        item.update(extra)
+        return item
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def verify_roundtrip(items, path):
+    """写入再读回，返回与原数据不一致的记录下标列表"""
+    with open(path, "w+b") as f:
+        write_snapshot(f, items)
+    with SnapshotReader(path) as reader:
+        if len(reader) != len(items):
+            return list(range(len(items)))
+        return [i for i, item in enumerate(items) if reader[i] != item]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "verify":
+        sys.exit("usage: python task_snapshot.py verify tasks.json")
+    import os
+    import tempfile
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        data = json.load(f)
+    fd, tmp_path = tempfile.mkstemp(suffix=".snap")
+    os.close(fd)
+    try:
+        mismatches = verify_roundtrip(data, tmp_path)
+        json_size = os.path.getsize(sys.argv[2])
+        snap_size = os.path.getsize(tmp_path)
+    finally:
+        os.remove(tmp_path)
+    print(f"{len(data)} tasks, JSON {json_size} bytes, snapshot {snap_size} bytes")
+    if mismatches:
+        sys.exit(f"{len(mismatches)} tasks did not round-trip, first at index {mismatches[0]}")
+    print("round-trip OK")
@@ -0,0 +1,858 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from perf import timed
+from task_snapshot import SnapshotReader, write_snapshot
+
+JOURNAL_SUFFIX = ".journal"
+SNAPSHOT_SUFFIX = ".snap"
+COMPACT_THRESHOLD = 1000  # 日志记录数达到该值时在后台压缩为快照
+PAGE_SIZE = 5000
+CHANGELOG_KEEP = 100000  # SQLite changes 表保留的记录数
+READER_TIMEOUT = 7 * 24 * 3600  # 超过该时间没有同步的实例视为已退出（崩溃时不会删除自己的记录）
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _record_ids(record):
+    """日志记录涉及的任务 id"""
+    if record["op"] == "delete":
+        return record["ids"]
+    return [record["task"]["id"] if record["op"] == "add" else record["id"]]
+
+
+def atomic_write(path, write_func, binary=False):
+    """先写临时文件再重命名，写到一半崩溃也不会损坏原文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        if binary:
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", encoding="utf-8")
+        with f:
+            write_func(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class FileLock:
+    """跨进程的建议锁（fcntl.flock / msvcrt.locking）
+
+    同一进程内的线程之间再用 threading.Lock 互斥，可以用 with 语句或 acquire/release。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        if not self._thread_lock.acquire(blocking):
+            return False
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                while True:
+                    try:
+                        msvcrt.locking(self._fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+        except BlockingIOError:
+            self._thread_lock.release()
+            return False
+        except OSError:
+            self._thread_lock.release()
+            if not blocking:
+                return False
+            raise
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return True
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class JournalStorage:
+    """快照 + 追加日志的任务存储
+
+    增删改只向日志追加一行记录，记录数达到阈值后在后台线程把当前状态
+    写成新的快照（即原来的 tasks.json）并清空日志。加载时先读快照再重放日志。
+    snapshot_format 为 "binary" 时快照改用 task_snapshot 的紧凑格式（tasks.snap）。
+
+    多个实例可以同时打开同一个文件：每次写入都在 <文件>.lock 的文件锁内进行，
+    写入前先读入其他实例追加到日志中的记录（id 也在锁内分配），因此不会互相覆盖。
+    本实例记录已读到的日志位置，poll_changes() 只读取之后新增的记录。
+    """
+
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD, snapshot_format="json"):
+        self.path = path
+        self.binary_path = os.path.splitext(path)[0] + SNAPSHOT_SUFFIX
+        self.snapshot_format = snapshot_format
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.rotated_path = self.journal_path + ".1"
+        self.compact_threshold = compact_threshold
+        self._tasks = {}
+        self._next_id = 1
+        self._journal_count = 0
+        self._lock = FileLock(path + ".lock")
+        self._compact_lock = FileLock(path + ".compact.lock")
+        self._compact_thread = None
+        # 已读到的日志位置，以及读取时快照文件的状态，用于判断其他实例是否改动过
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._snapshot_sig = None
+        self._followed_rotation = False
+        self._changes = []  # 写入前读到的其他实例的记录，等待 poll_changes() 取走
+        self._paging = False  # iter_pages 正在按页读取快照
+        self._deferred = []  # 分页期间读到的记录（含本实例写入的），加载完后按顺序重放
+        self._deferred_reload = False  # 分页期间其他实例重写了快照，加载完后重新加载
+
+    def load(self):
+        """读取快照并重放日志，返回按添加顺序排列的任务列表"""
+        with self._lock:
+            legacy = self._load_locked()
+        # 旧版 tasks.json 没有 id，立即写一次快照把分配的 id 固定下来
+        if legacy:
+            self.compact()
+        return list(self._tasks.values())
+
+    def _load_locked(self):
+        self._tasks = {}
+        self._next_id = 1
+        legacy = False
+        self._snapshot_sig = self._snapshot_signature()
+        for item in self._read_snapshot():
+            if "id" not in item:
+                legacy = True
+                item["id"] = self._next_id
+            self._tasks[item["id"]] = item
+            self._next_id = max(self._next_id, item["id"] + 1)
+
+        self._followed_rotation = os.path.exists(self.rotated_path)
+        self._journal_count = self._replay(self.rotated_path)[0]
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._read_journal()
+        return legacy
+
+    def _snapshot_paths(self):
+        """按优先顺序返回 (路径, 格式)，配置的格式优先，另一种用于切换格式后的首次加载"""
+        paths = [(self.path, "json"), (self.binary_path, "binary")]
+        if self.snapshot_format == "binary":
+            paths.reverse()
+        return paths
+
+    def _snapshot_signature(self):
+        signature = []
+        for path, _ in self._snapshot_paths():
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return signature
+
+    def _read_snapshot(self):
+        for path, fmt in self._snapshot_paths():
+            if os.path.exists(path):
+                if fmt == "binary":
+                    with SnapshotReader(path) as reader:
+                        return list(reader)
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        return []
+
+    def iter_pages(self, page_size=PAGE_SIZE):
+        """按页返回任务
+
+        只有二进制快照且没有待重放的日志时才在取下一页时解码这一页，其余情况先 load() 再切片；
+        按页解码只是把解码分摊到各页之间，全部取完时整个快照仍然都解码过一次。
+        """
+        path, fmt = self._snapshot_paths()[0]
+        with self._lock:
+            lazy = (fmt == "binary" and os.path.exists(path)
+                    and not os.path.exists(self.journal_path) and not os.path.exists(self.rotated_path))
+            if lazy:
+                self._snapshot_sig = self._snapshot_signature()
+                self._journal_ino = None
+                self._journal_offset = 0
+                self._followed_rotation = False
+        if lazy:
+            # 没有待重放的日志时，按页从 mmap 中解码，而不是一次性解码整个快照。
+            # 下一个 id 从快照头部读取，加载期间添加的任务不会与尚未读到的任务重复；
+            # 此时 _tasks 还不完整，不能压缩
+            self._tasks = {}
+            self._journal_count = 0
+            self._paging = True
+            try:
+                with SnapshotReader(path) as reader:
+                    self._next_id = reader.next_id
+                    for start in range(0, len(reader), page_size):
+                        page = [reader[i] for i in range(start, min(start + page_size, len(reader)))]
+                        for item in page:
+                            self._tasks[item["id"]] = item
+                        yield page
+                with self._lock:
+                    self._finish_paging()
+            finally:
+                self._paging = False
+                self._deferred = []
+                self._deferred_reload = False
+            return
+        tasks = self.load()
+        for start in range(0, len(tasks), page_size):
+            yield tasks[start:start + page_size]
+
+    def _finish_paging(self):
+        """任务读全后按原顺序重放分页期间读到的记录，需在持有锁时调用
+
+        这些记录涉及的任务当时可能还没读入，随后读入的快照内容会把修改覆盖掉；
+        其他实例改过的任务以最终状态留给 poll_changes()。
+        """
+        self._paging = False
+        if self._deferred_reload:
+            self._reload_diff(self._changes)
+            return
+        touched = {}
+        for record, own in self._deferred:
+            self._apply(record)
+            if not own:
+                touched.update(dict.fromkeys(_record_ids(record)))
+        deleted = [task_id for task_id in touched if task_id not in self._tasks]
+        self._changes += [{"op": "add", "task": self._tasks[task_id]} for task_id in touched
+                          if task_id in self._tasks]
+        if deleted:
+            self._changes.append({"op": "delete", "ids": deleted})
+
+    def _replay(self, path, offset=0, changes=None):
+        """从 offset 开始重放日志，返回 (记录数, 结束位置)；changes 不为 None 时收集读到的记录"""
+        if not os.path.exists(path):
+            return 0, 0
+        count = 0
+        good_offset = offset
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时写了一半的最后一行，丢弃
+                    break
+                self._apply(record)
+                if changes is not None:
+                    changes.append(record)
+                good_offset += len(line)
+                count += 1
+        if good_offset < os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+        return count, good_offset
+
+    def _read_journal(self, changes=None):
+        """读取日志中尚未读过的部分，需在持有锁时调用"""
+        try:
+            ino = os.stat(self.journal_path).st_ino
+        except FileNotFoundError:
+            return
+        count, self._journal_offset = self._replay(self.journal_path, self._journal_offset, changes)
+        self._journal_ino = ino
+        self._journal_count += count
+
+    def _sync_locked(self, changes):
+        """读入其他实例写入的修改，需在持有锁时调用
+
+        分页期间 _tasks 还不完整，读到的记录先记下来，由 _finish_paging() 在加载完后重放。
+        """
+        if self._paging:
+            if not self._deferred_reload:  # 否则加载完后整体重新加载，不必再增量读取
+                records = []
+                self._read_changes_locked(records)
+                self._deferred += [(record, False) for record in records]
+            return
+        self._read_changes_locked(changes)
+
+    def _read_changes_locked(self, changes):
+        if self._snapshot_signature() != self._snapshot_sig:
+            if self._followed_rotation:
+                # 已经读完了被压缩的日志，新快照里没有本实例不知道的内容
+                self._snapshot_sig = self._snapshot_signature()
+                self._followed_rotation = False
+            else:
+                self._reload_diff(changes)
+                return
+        if self._journal_ino is not None:
+            try:
+                st = os.stat(self.journal_path)
+            except FileNotFoundError:
+                st = None
+            if st is None or st.st_ino != self._journal_ino or st.st_size < self._journal_offset:
+                # 其他实例开始压缩，日志被移到了 .1，先读完 .1 中剩下的记录
+                try:
+                    rotated_ino = os.stat(self.rotated_path).st_ino
+                except FileNotFoundError:
+                    rotated_ino = None
+                if rotated_ino != self._journal_ino:
+                    self._reload_diff(changes)
+                    return
+                self._journal_count += self._replay(self.rotated_path, self._journal_offset, changes)[0]
+                self._followed_rotation = True
+                self._journal_ino = None
+                self._journal_offset = 0
+        self._read_journal(changes)
+
+    def _reload_diff(self, changes):
+        """无法增量读取时重新加载，把与内存中状态的差异整理成日志记录"""
+        if self._paging:
+            # 分页读取的旧快照还没读完，重新加载后又会被它覆盖
+            self._deferred_reload = True
+            return
+        old = self._tasks
+        self._load_locked()
+        for task_id, task in self._tasks.items():
+            before = old.get(task_id)
+            if before is None:
+                changes.append({"op": "add", "task": task})
+            elif before != task:
+                changes.append({"op": "update", "id": task_id, "fields": dict(task)})
+        deleted = [task_id for task_id in old if task_id not in self._tasks]
+        if deleted:
+            changes.append({"op": "delete", "ids": deleted})
+
+    def poll_changes(self):
+        """返回其他实例写入、本实例还没见过的修改（与日志记录格式相同）"""
+        with self._lock:
+            self._sync_locked(self._changes)
+            changes, self._changes = self._changes, []
+        return changes
+
+    def watch_paths(self):
+        return [self.path, self.binary_path, self.journal_path, self.rotated_path]
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "add":
+            task = record["task"]
+            self._tasks[task["id"]] = task
+            self._next_id = max(self._next_id, task["id"] + 1)
+        elif op == "update":
+            task = self._tasks.get(record["id"])
+            if task is not None:
+                task.update(record["fields"])
+        elif op == "delete":
+            for task_id in record["ids"]:
+                self._tasks.pop(task_id, None)
+
+    @contextmanager
+    def _transaction(self):
+        """在文件锁内先读入其他实例的修改，再把 with 块中加入列表的记录追加到日志"""
+        records = []
+        with timed("journal.append"), self._lock:
+            self._sync_locked(self._changes)
+            yield records
+            if records:
+                data = "".join(_ENCODER.encode(r) + "\n" for r in records).encode("utf-8")
+                with open(self.journal_path, "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._journal_offset = f.tell()
+                    self._journal_ino = os.fstat(f.fileno()).st_ino
+                self._journal_count += len(records)
+                if self._paging:
+                    self._deferred += [(record, True) for record in records]
+        # 日志长度与任务总数成比例时才压缩，批量导入时不会反复重写快照
+        if not self._paging and self._journal_count >= max(self.compact_threshold, len(self._tasks) // 2):
+            self.compact_async()
+
+    def _assign_id(self, item):
+        if "id" not in item:
+            item["id"] = self._next_id
+        self._next_id = max(self._next_id, item["id"] + 1)
+        self._tasks[item["id"]] = item
+
+    def add(self, item):
+        """添加任务并返回分配的 id"""
+        with self._transaction() as records:
+            self._assign_id(item)
+            records.append({"op": "add", "task": item})
+        return item["id"]
+
+    def add_many(self, items):
+        """批量添加，所有记录一次写入日志"""
+        with self._transaction() as records:
+            for item in items:
+                self._assign_id(item)
+                records.append({"op": "add", "task": item})
+
+    def update(self, task_id, **fields):
+        self.update_many({task_id: fields})
+
+    def update_many(self, changes):
+        """changes: {id: {字段: 值}}，所有修改一次写入日志"""
+        with self._transaction() as records:
+            for task_id, fields in changes.items():
+                task = self._tasks.get(task_id)
+                if task is not None:
+                    task.update(fields)
+                    records.append({"op": "update", "id": task_id, "fields": fields})
+
+    def delete(self, ids):
+        with self._transaction() as records:
+            ids = [task_id for task_id in ids if task_id in self._tasks]
+            for task_id in ids:
+                del self._tasks[task_id]
+            if ids:
+                records.append({"op": "delete", "ids": ids})
+
+    def _rotate(self):
+        """把当前日志移到 .1 并复制一份任务状态，需在持有锁时调用"""
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.rotated_path):
+                # 上次压缩没有完成，把新日志接到旧的后面
+                with open(self.journal_path, "rb") as src, open(self.rotated_path, "ab") as dst:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.rotated_path)
+        self._journal_count = 0
+        self._journal_ino = None
+        self._journal_offset = 0
+        return [dict(task) for task in self._tasks.values()]
+
+    @timed("journal.snapshot")
+    def _write_snapshot(self, snapshot):
+        """先写到 .new，再在锁内替换快照并删除 .1，其他实例不会读到不一致的组合"""
+        (path, fmt), (other_path, _) = self._snapshot_paths()
+        new_path = path + ".new"
+        if fmt == "binary":
+            atomic_write(new_path, lambda f: write_snapshot(f, snapshot), binary=True)
+        else:
+            atomic_write(new_path, lambda f: f.write(_ENCODER.encode(snapshot)))
+        with self._lock:
+            os.replace(new_path, path)
+            # 切换格式后，旧格式的快照已过时
+            if os.path.exists(other_path):
+                os.replace(other_path, other_path + ".migrated")
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+            self._snapshot_sig = self._snapshot_signature()
+            self._followed_rotation = False
+
+    def compact(self):
+        """同步把当前状态写成快照"""
+        self.wait_compaction()
+        with self._compact_lock:
+            with self._lock:
+                self._sync_locked(self._changes)
+                snapshot = self._rotate()
+            self._write_snapshot(snapshot)
+
+    def compact_async(self):
+        """在后台线程中压缩，调用方只需付出一次浅拷贝的代价；其他实例正在压缩时跳过"""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                self._sync_locked(self._changes)
+                snapshot = self._rotate()
+        except BaseException:
+            self._compact_lock.release()
+            raise
+
+        def run():
+            try:
+                self._write_snapshot(snapshot)
+            finally:
+                self._compact_lock.release()
+
+        self._compact_thread = threading.Thread(target=run, daemon=True)
+        self._compact_thread.start()
+
+    def wait_compaction(self):
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+            self._compact_thread = None
+
+    def close(self):
+        self.wait_compaction()
+        self._lock.close()
+        self._compact_lock.close()
+
+
+class SqliteStorage:
+    """SQLite 任务存储（WAL 模式）
+
+    每次增删改只更新对应的行；多个实例同时写入时由 SQLite 负责加锁，
+    不会互相覆盖。加载时按 id 分页读取。
+    """
+
+    COLUMNS = ("text", "deadline", "priority", "subtasks", "done")
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                deadline TEXT NOT NULL DEFAULT '',
+                priority TEXT NOT NULL DEFAULT 'Medium',
+                subtasks TEXT NOT NULL DEFAULT '[]',
+                done INTEGER NOT NULL DEFAULT 0,
+                extra TEXT
+            );
+            DROP INDEX IF EXISTS idx_tasks_deadline;
+            DROP INDEX IF EXISTS idx_tasks_priority;
+            DROP INDEX IF EXISTS idx_tasks_done;
+            CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, id INTEGER NOT NULL);
+            CREATE TRIGGER IF NOT EXISTS tasks_insert AFTER INSERT ON tasks
+                BEGIN INSERT INTO changes (id) VALUES (new.id); END;
+            CREATE TRIGGER IF NOT EXISTS tasks_update AFTER UPDATE ON tasks
+                BEGIN INSERT INTO changes (id) VALUES (new.id); END;
+            CREATE TRIGGER IF NOT EXISTS tasks_delete AFTER DELETE ON tasks
+                BEGIN INSERT INTO changes (id) VALUES (old.id); END;
+            CREATE TABLE IF NOT EXISTS readers (
+                reader INTEGER PRIMARY KEY AUTOINCREMENT,
+                last_change INTEGER NOT NULL,
+                seen REAL NOT NULL
+            );
+        """)
+        # changes 表由触发器记录每次修改的 id；data_version 只在其他连接提交后才会变化
+        self._last_change = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self._pruned = self._last_change
+        self._own = []  # 本实例写入、但之前还有其他实例的修改没读到的 (起, 止] seq 范围
+        # readers 表记录每个实例同步到的位置，清理 changes 时不会删掉还没读到的记录
+        self._reader = self.conn.execute("INSERT INTO readers (last_change, seen) VALUES (?, ?)",
+                                         (self._last_change, time.time())).lastrowid
+
+    @staticmethod
+    def _to_row(item):
+        extra = {k: v for k, v in item.items() if k not in SqliteStorage.COLUMNS and k != "id"}
+        return (item.get("id"), item["text"], item.get("deadline") or "", item.get("priority", "Medium"),
+                json.dumps(item.get("subtasks", []), ensure_ascii=False), int(item.get("done", 0)),
+                json.dumps(extra, ensure_ascii=False) if extra else None)
+
+    @staticmethod
+    def _from_row(row):
+        task_id, text, deadline, priority, subtasks, done, extra = row
+        item = {"id": task_id, "text": text, "deadline": deadline, "priority": priority,
+                "subtasks": json.loads(subtasks), "done": done}
+        if extra:
+            item.update(json.loads(extra))
+        return item
+
+    def iter_pages(self, page_size=PAGE_SIZE):
+        last_id = -1
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, text, deadline, priority, subtasks, done, extra FROM tasks "
+                "WHERE id > ? ORDER BY id LIMIT ?", (last_id, page_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [self._from_row(row) for row in rows]
+
+    def load(self):
+        return [item for page in self.iter_pages() for item in page]
+
+    @contextmanager
+    def _write(self):
+        """写事务：记下触发器为本实例的修改生成的 seq，poll_changes() 不会再把它们读回来"""
+        self.conn.execute("BEGIN IMMEDIATE")  # 立即拿到写锁，事务内新增的 seq 都是本实例的
+        try:
+            start = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            yield
+            end = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            caught_up = end > start and start == self._last_change
+            if caught_up:
+                self.conn.execute("UPDATE readers SET last_change = ?, seen = ? WHERE reader = ?",
+                                  (end, time.time(), self._reader))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        if caught_up:
+            self._last_change = end
+        elif end > start:
+            self._own.append((start, end))
+
+    def _insert(self, item):
+        cursor = self.conn.execute("INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)", self._to_row(item))
+        item["id"] = cursor.lastrowid
+        return item["id"]
+
+    def add(self, item):
+        with self._write():
+            return self._insert(item)
+
+    def add_many(self, items):
+        with self._write():
+            for item in items:
+                self._insert(item)
+
+    def update(self, task_id, **fields):
+        self.update_many({task_id: fields})
+
+    def update_many(self, changes):
+        with self._write():
+            for task_id, fields in changes.items():
+                self._update_row(task_id, fields)
+
+    def _update_row(self, task_id, fields):
+        columns = {k: v for k, v in fields.items() if k in self.COLUMNS}
+        if "subtasks" in columns:
+            columns["subtasks"] = json.dumps(columns["subtasks"], ensure_ascii=False)
+        extra = {k: v for k, v in fields.items() if k not in self.COLUMNS}
+        if columns:
+            assignments = ", ".join(f"{k} = ?" for k in columns)
+            self.conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", (*columns.values(), task_id))
+        if extra:
+            row = self.conn.execute("SELECT extra FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is not None:
+                merged = json.loads(row[0]) if row[0] else {}
+                merged.update(extra)
+                self.conn.execute("UPDATE tasks SET extra = ? WHERE id = ?",
+                                  (json.dumps(merged, ensure_ascii=False), task_id))
+
+    def delete(self, ids):
+        with self._write():
+            self.conn.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in ids])
+
+    def poll_changes(self):
+        """其他连接修改过的任务：现有的作为 add 记录（按 id 覆盖），不存在的作为 delete 记录
+
+        本实例自己写入的修改已经在内存中，会被跳过。
+        """
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return []
+        self._data_version = version
+        rows = self.conn.execute("SELECT seq, id FROM changes WHERE seq > ? ORDER BY seq",
+                                 (self._last_change,)).fetchall()
+        if not rows:
+            return []
+        self._last_change = rows[-1][0]
+        own, self._own = self._own, [(start, end) for start, end in self._own if end > self._last_change]
+        rows = [(seq, task_id) for seq, task_id in rows if not any(start < seq <= end for start, end in own)]
+        self.conn.execute("UPDATE readers SET last_change = ?, seen = ? WHERE reader = ?",
+                          (self._last_change, time.time(), self._reader))
+        if self._last_change - self._pruned >= CHANGELOG_KEEP:
+            self._prune()
+        if not rows:
+            return []
+        changes = []
+        deleted = []
+        for task_id in dict.fromkeys(task_id for _, task_id in rows):
+            row = self.conn.execute("SELECT id, text, deadline, priority, subtasks, done, extra FROM tasks "
+                                    "WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                deleted.append(task_id)
+            else:
+                changes.append({"op": "add", "task": self._from_row(row)})
+        if deleted:
+            changes.append({"op": "delete", "ids": deleted})
+        return changes
+
+    def watch_paths(self):
+        return [self.path, self.path + "-wal"]
+
+    def _prune(self):
+        # 只保留最近的修改记录，并且不删除最慢的实例还没读到的记录
+        last = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        self.conn.execute("DELETE FROM readers WHERE seen < ?", (time.time() - READER_TIMEOUT,))
+        slowest = self.conn.execute("SELECT MIN(last_change) FROM readers WHERE reader != ?",
+                                    (self._reader,)).fetchone()[0]
+        limit = last - CHANGELOG_KEEP
+        if slowest is not None:
+            limit = min(limit, slowest)
+        self.conn.execute("DELETE FROM changes WHERE seq <= ?", (limit,))
+        self._pruned = last
+
+    def compact(self):
+        self._prune()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        import sqlite3
+        try:
+            self.conn.execute("DELETE FROM readers WHERE reader = ?", (self._reader,))
+            self.compact()
+        except sqlite3.Error:
+            pass  # 其他实例正在写入时下次关闭再清理
+        self.conn.close()
+
+
+class WriteBehind:
+    """写回缓冲层
+
+    update 先合并到内存中，同一任务在 delay_ms 内的多次修改只写一次；
+    窗口到期后在事件循环空闲时批量写入，退出时 close() 会写入剩余的修改。
+    add 需要立即拿到 id，所以直接写入（先写入尚未保存的删除，撤销删除时重新加入的
+    任务不会随后被删掉）。其他方法转发给底层存储。
+    """
+
+    def __init__(self, storage, root, delay_ms=500):
+        self.storage = storage
+        self.root = root
+        self.delay_ms = delay_ms
+        self._pending = {}  # id -> 合并后的字段
+        self._pending_deletes = []
+        self._scheduled = False
+        self.edits = 0
+        self.flushes = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def _schedule(self):
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after(self.delay_ms, lambda: self.root.after_idle(self.flush))
+
+    def add(self, item):
+        if self._pending_deletes:
+            self.flush()
+        return self.storage.add(item)
+
+    def add_many(self, items):
+        if self._pending_deletes:
+            self.flush()
+        self.storage.add_many(items)
+
+    def update(self, task_id, **fields):
+        self.edits += 1
+        self._pending.setdefault(task_id, {}).update(fields)
+        self._schedule()
+
+    def update_many(self, changes):
+        for task_id, fields in changes.items():
+            self.update(task_id, **fields)
+
+    def delete(self, ids):
+        self.edits += 1
+        for task_id in ids:
+            self._pending.pop(task_id, None)
+        self._pending_deletes.extend(ids)
+        self._schedule()
+
+    def poll_changes(self):
+        """先写入自己尚未保存的修改，再读取其他实例的修改"""
+        self.flush()
+        return self.storage.poll_changes()
+
+    @timed("storage.flush")
+    def flush(self):
+        self._scheduled = False
+        if not self._pending and not self._pending_deletes:
+            return
+        start = time.perf_counter()
+        pending, self._pending = self._pending, {}
+        deletes, self._pending_deletes = self._pending_deletes, []
+        if pending:
+            self.storage.update_many(pending)
+        if deletes:
+            self.storage.delete(deletes)
+        self.last_latency = time.perf_counter() - start
+        self.total_latency += self.last_latency
+        self.max_latency = max(self.max_latency, self.last_latency)
+        self.flushes += 1
+
+    def metrics(self):
+        return {
+            "pending_edits": len(self._pending) + len(self._pending_deletes),
+            "edits": self.edits,
+            "flushes": self.flushes,
+            "last_write_ms": self.last_latency * 1000,
+            "avg_write_ms": self.total_latency / self.flushes * 1000 if self.flushes else 0.0,
+            "max_write_ms": self.max_latency * 1000,
+        }
+
+    def close(self):
+        self.flush()
+        self.storage.close()
+
+
+def archive_tasks(path, items):
+    """把任务追加到归档文件（每行一个 JSON），归档文件只追加、不回读"""
+    lines = "".join(_ENCODER.encode(item) + "\n" for item in items)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def migrate_json_to_sqlite(json_path, db_path, snapshot_format="json"):
+    """一次性把 tasks.json 或 tasks.snap（含日志）导入 SQLite，原文件改名为 .migrated 保留备份"""
+    storage = SqliteStorage(db_path)
+    journal = JournalStorage(json_path, snapshot_format=snapshot_format)
+    storage.add_many(journal.load())
+    journal.close()
+    for path in journal.watch_paths():
+        if os.path.exists(path):
+            os.replace(path, path + ".migrated")
+    return storage
+
+
+def open_storage(config, data_file):
+    """根据 config.json 中的 "storage" 选择存储后端"""
+    snapshot_format = config.get("snapshot_format", "json")
+    if config.get("storage") == "sqlite":
+        db_path = os.path.join(os.path.dirname(data_file), config["sqlite_file"])
+        # 只用过二进制快照的安装没有 tasks.json，只有 tasks.snap
+        legacy_files = JournalStorage(data_file).watch_paths()
+        if not os.path.exists(db_path) and any(os.path.exists(path) for path in legacy_files):
+            return migrate_json_to_sqlite(data_file, db_path, snapshot_format)
+        return SqliteStorage(db_path)
+    return JournalStorage(data_file, snapshot_format=snapshot_format)
@@ -0,0 +1,459 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+from functools import lru_cache
+
+PRIORITIES = ("High", "Medium", "Low")
+SORT_KEYS = ("added", "deadline", "priority")
+STATUSES = ("all", "open", "done", "overdue")
+
+_WORD_RE = re.compile(r"\w+")
+_DEADLINE_RE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+
+
+@lru_cache(maxsize=4096)
+def is_valid_deadline(text):
+    """截止日期必须严格是 YYYY-MM-DD
+
+    索引、逾期筛选、排序和提醒都按字符串比较截止日期，20240101、2024-W01-1 这类
+    fromisoformat 也能解析的写法会排错位置，所以不接受。大量任务的截止日期往往重复，缓存结果。
+    """
+    if not _DEADLINE_RE.fullmatch(text):
+        return False
+    try:
+        datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
+def tokenize(text):
+    """拆分为小写词；含非 ASCII 字符（如中文）的词再按单字拆分"""
+    tokens = set()
+    for word in _WORD_RE.findall(text.lower()):
+        tokens.add(word)
+        if not word.isascii():
+            tokens.update(ch for ch in word if not ch.isascii())
+    return tokens
+
+
+class TaskRecord:
+    # subtasks 是旧版本的子任务字符串列表，加载后由 TaskService 转换为 parent 指向父任务的子记录
+    __slots__ = ("id", "seq", "text", "deadline", "priority", "subtasks", "done", "parent")
+
+    def __init__(self, id, text, deadline="", priority="Medium", subtasks=(), done=0, seq=0, parent=None):
+        self.id = id
+        self.seq = seq
+        self.text = text
+        self.deadline = deadline or ""
+        self.priority = priority
+        self.subtasks = tuple(subtasks)
+        self.done = done
+        self.parent = parent
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(item["id"], item["text"], item.get("deadline", ""), item.get("priority", "Medium"),
+                   item.get("subtasks", ()), item.get("done", 0), parent=item.get("parent"))
+
+    def to_dict(self):
+        item = {
+            "id": self.id,
+            "text": self.text,
+            "deadline": self.deadline,
+            "priority": self.priority,
+            "subtasks": list(self.subtasks),
+            "done": self.done,
+        }
+        if self.parent is not None:
+            item["parent"] = self.parent
+        return item
+
+
+def format_task(record):
+    info = f"{record.text} | Due: {record.deadline or 'N/A'} | Priority: {record.priority}"
+    if record.subtasks:
+        info += f" | Subtasks: {', '.join(record.subtasks)}"
+    return info
+
+
+class TaskStore:
+    """与 Tk 控件无关的任务数据层
+
+    维护按截止日期排序的索引、按优先级分桶的 id 集合、已完成 id 集合，
+    以及基于 text 和 subtasks 的倒排词索引，供搜索、筛选和排序使用。
+
+    子任务是 parent 指向父任务 id 的普通记录。每个父任务的子任务 id 和
+    (已完成数, 总数) 随增删改增量维护，显示进度时不需要遍历子任务；
+    顶层任务另有一个按添加顺序排列的索引，树形视图不需要遍历全部任务。
+    """
+
+    def __init__(self):
+        self.records = {}  # id -> TaskRecord，按添加顺序
+        self.done_ids = set()
+        self._next_seq = 0
+        self._deadline_index = []  # 排好序的 (deadline, id)
+        self._priority_buckets = {p: set() for p in PRIORITIES}
+        self._postings = {}  # 词 -> id 集合
+        self._sorted_tokens = []  # 所有词排序后的列表，用于前缀匹配
+        self._children = {}  # 父任务 id -> {子任务 id: None}，保持添加顺序
+        self._progress = {}  # 父任务 id -> [已完成的子任务数, 子任务总数]
+        self._root_index = []  # 顶层任务排好序的 (seq, id)
+        self._views = {}  # (排序方式, 是否只含顶层任务) -> 排好序的 TaskRecord 列表，增删或修改排序字段时清空
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, task_id):
+        return self.records.get(task_id)
+
+    def load(self, items):
+        self.__init__()
+        self.extend(items)
+
+    def extend(self, items):
+        """批量添加（例如分页加载的一页），最后一次性排序索引，比逐条插入快"""
+        for item in items:
+            self._index(TaskRecord.from_dict(item), bulk=True)
+        self._deadline_index.sort()
+        self._sorted_tokens = sorted(self._postings)
+
+    def add(self, item):
+        record = TaskRecord.from_dict(item)
+        self._index(record)
+        return record
+
+    def _index(self, record, bulk=False):
+        self._views.clear()
+        record.seq = self._next_seq
+        self._next_seq += 1
+        self.records[record.id] = record
+        if record.done:
+            self.done_ids.add(record.id)
+        if record.parent is not None:
+            self._link(record)
+        if self.is_root(record):
+            self._root_index.append((record.seq, record.id))  # seq 最大，追加后仍然有序
+        for child_id in self._children.get(record.id, ()):
+            # 先于父任务加载的子任务不再是顶层任务
+            self._drop_root(self.records[child_id])
+        if record.deadline:
+            if bulk:
+                self._deadline_index.append((record.deadline, record.id))
+            else:
+                insort(self._deadline_index, (record.deadline, record.id))
+        self._priority_buckets.setdefault(record.priority, set()).add(record.id)
+        for token in self._record_tokens(record):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                if not bulk:
+                    insort(self._sorted_tokens, token)
+            posting.add(record.id)
+
+    def _link(self, record):
+        self._children.setdefault(record.parent, {})[record.id] = None
+        counts = self._progress.setdefault(record.parent, [0, 0])
+        counts[0] += 1 if record.done else 0
+        counts[1] += 1
+
+    def _unlink(self, record):
+        children = self._children[record.parent]
+        del children[record.id]
+        counts = self._progress[record.parent]
+        counts[0] -= 1 if record.done else 0
+        counts[1] -= 1
+        if not children:
+            del self._children[record.parent]
+            del self._progress[record.parent]
+
+    def _drop_root(self, record):
+        entry = (record.seq, record.id)
+        i = bisect_left(self._root_index, entry)
+        if i < len(self._root_index) and self._root_index[i] == entry:
+            del self._root_index[i]
+
+    def _orphaned(self, task_id):
+        """父任务 task_id 被删除后变成顶层任务的子任务"""
+        return [(self.records[child_id].seq, child_id) for child_id in self._children.get(task_id, ())
+                if child_id != task_id]
+
+    def children(self, task_id):
+        """直接子任务，按添加顺序"""
+        return [self.records[child_id] for child_id in self._children.get(task_id, ())]
+
+    def has_children(self, task_id):
+        return task_id in self._children
+
+    def progress(self, task_id):
+        """(已完成的子任务数, 子任务总数)，没有子任务时返回 None"""
+        counts = self._progress.get(task_id)
+        return tuple(counts) if counts else None
+
+    def descendants(self, ids):
+        """ids 中任务的所有后代 id（不含 ids 本身），按先序排列"""
+        result = []
+        seen = set(ids)
+        stack = [iter(self._children.get(task_id, ())) for task_id in reversed(list(ids))]
+        while stack:
+            child_id = next(stack[-1], None)
+            if child_id is None:
+                stack.pop()
+            elif child_id not in seen:
+                seen.add(child_id)
+                result.append(child_id)
+                stack.append(iter(self._children.get(child_id, ())))
+        return result
+
+    def root_of(self, task_id):
+        """沿 parent 向上找到最顶层的任务；父任务不存在（例如被其他实例删除）时停在当前任务"""
+        seen = {task_id}
+        parent = self.records[task_id].parent
+        while parent is not None and parent in self.records and parent not in seen:
+            seen.add(parent)
+            task_id = parent
+            parent = self.records[parent].parent
+        return task_id
+
+    def is_root(self, record):
+        return record.parent is None or record.parent not in self.records
+
+    @staticmethod
+    def _record_tokens(record):
+        tokens = tokenize(record.text)
+        for subtask in record.subtasks:
+            tokens |= tokenize(subtask)
+        return tokens
+
+    def remove(self, task_id):
+        record = self.records.pop(task_id, None)
+        if record is None:
+            return None
+        self._views.clear()
+        self.done_ids.discard(task_id)
+        if record.parent is not None:
+            self._unlink(record)
+        self._drop_root(record)
+        for entry in self._orphaned(task_id):
+            insort(self._root_index, entry)
+        if record.deadline:
+            i = bisect_left(self._deadline_index, (record.deadline, task_id))
+            del self._deadline_index[i]
+        self._priority_buckets[record.priority].discard(task_id)
+        for token in self._record_tokens(record):
+            posting = self._postings[token]
+            posting.discard(task_id)
+            if not posting:
+                del self._postings[token]
+                del self._sorted_tokens[bisect_left(self._sorted_tokens, token)]
+        return record
+
+    def remove_many(self, ids):
+        """批量删除；数量较多时一次性过滤有序索引，避免逐条 O(n) 删除"""
+        ids = [task_id for task_id in ids if task_id in self.records]
+        if len(ids) < 64:
+            return [self.remove(task_id) for task_id in ids]
+        removed = set(ids)
+        records = []
+        tokens_emptied = False
+        self._views.clear()
+        for task_id in ids:
+            record = self.records.pop(task_id)
+            records.append(record)
+            self.done_ids.discard(task_id)
+            if record.parent is not None:
+                self._unlink(record)
+            self._priority_buckets[record.priority].discard(task_id)
+            for token in self._record_tokens(record):
+                posting = self._postings[token]
+                posting.discard(task_id)
+                if not posting:
+                    del self._postings[token]
+                    tokens_emptied = True
+        self._deadline_index = [entry for entry in self._deadline_index if entry[1] not in removed]
+        self._root_index = [entry for entry in self._root_index if entry[1] not in removed]
+        orphans = [entry for record in records for entry in self._orphaned(record.id)]
+        if orphans:
+            self._root_index = sorted(self._root_index + orphans)
+        if tokens_emptied:
+            self._sorted_tokens = [token for token in self._sorted_tokens if token in self._postings]
+        return records
+
+    def update(self, task_id, fields):
+        """修改任务的字段，保持原来的添加顺序"""
+        record = self.records[task_id]
+        if fields.keys() <= {"done", "id"}:
+            self.set_done(task_id, fields.get("done", record.done))
+            return record
+        self._views.clear()
+        tokens = self._record_tokens(record)
+        if record.deadline:
+            del self._deadline_index[bisect_left(self._deadline_index, (record.deadline, task_id))]
+        self._priority_buckets[record.priority].discard(task_id)
+
+        merged = TaskRecord.from_dict({**record.to_dict(), **fields})
+        was_root = self.is_root(record)
+        if record.parent is not None:
+            self._unlink(record)
+        for name in ("text", "deadline", "priority", "subtasks", "parent"):
+            setattr(record, name, getattr(merged, name))
+        if record.parent is not None:
+            self._link(record)
+        if was_root and not self.is_root(record):
+            self._drop_root(record)
+        elif not was_root and self.is_root(record):
+            insort(self._root_index, (record.seq, task_id))
+        self.set_done(task_id, merged.done)
+        if record.deadline:
+            insort(self._deadline_index, (record.deadline, task_id))
+        self._priority_buckets.setdefault(record.priority, set()).add(task_id)
+        new_tokens = self._record_tokens(record)
+        for token in tokens - new_tokens:
+            posting = self._postings[token]
+            posting.discard(task_id)
+            if not posting:
+                del self._postings[token]
+                del self._sorted_tokens[bisect_left(self._sorted_tokens, token)]
+        for token in new_tokens - tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                insort(self._sorted_tokens, token)
+            posting.add(task_id)
+        return record
+
+    def clear_subtasks(self, ids):
+        """清空这些任务的 subtasks 字段（转换为子任务记录之后），只调整词索引"""
+        tokens_emptied = False
+        for task_id in ids:
+            record = self.records[task_id]
+            tokens = self._record_tokens(record)
+            record.subtasks = ()
+            for token in tokens - self._record_tokens(record):
+                posting = self._postings[token]
+                posting.discard(task_id)
+                if not posting:
+                    del self._postings[token]
+                    tokens_emptied = True
+        if tokens_emptied:
+            self._sorted_tokens = [token for token in self._sorted_tokens if token in self._postings]
+
+    def set_done(self, task_id, done):
+        record = self.records[task_id]
+        if record.parent is not None and bool(done) != bool(record.done):
+            self._progress[record.parent][0] += 1 if done else -1
+        record.done = done
+        if done:
+            self.done_ids.add(task_id)
+        else:
+            self.done_ids.discard(task_id)
+
+    def _match_prefix(self, prefix):
+        ids = set()
+        i = bisect_left(self._sorted_tokens, prefix)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(prefix):
+            ids |= self._postings[self._sorted_tokens[i]]
+            i += 1
+        return ids
+
+    def query(self, text="", priority=None, status="all", sort="added", today=None, roots_only=False):
+        """按搜索词、优先级、状态筛选并排序，返回 TaskRecord 列表
+
+        roots_only 为 True 时只返回顶层任务：搜索词匹配到子任务时返回它所属的顶层任务，
+        优先级和状态条件作用于顶层任务本身。
+        """
+        candidates = None  # None 表示不限制
+
+        def narrow(ids):
+            nonlocal candidates
+            candidates = set(ids) if candidates is None else candidates & ids
+
+        for token in sorted(tokenize(text), key=len, reverse=True):
+            narrow(self._match_prefix(token))
+            if not candidates:
+                return []
+        roots_only = roots_only and bool(self._children)
+        if roots_only and candidates is not None:
+            candidates = {self.root_of(task_id) for task_id in candidates}
+        if priority:
+            narrow(self._priority_buckets.get(priority, set()))
+        if status == "done":
+            narrow(self.done_ids)
+        elif status == "overdue":
+            today = today or date.today().isoformat()
+            end = bisect_left(self._deadline_index, (today,))
+            narrow({task_id for _, task_id in self._deadline_index[:end]} - self.done_ids)
+
+        records = self.records
+        if sort in ("deadline", "priority") and (candidates is None or len(candidates) * 8 >= len(records)):
+            # 结果较多时过滤缓存的排序视图，连续输入搜索词时不必每次都重新排序
+            view = self._sorted_view(sort, roots_only)
+            done = self.done_ids
+            if candidates is None:
+                return [r for r in view if r.id not in done] if status == "open" else list(view)
+            if status == "open":
+                return [r for r in view if r.id in candidates and r.id not in done]
+            return [r for r in view if r.id in candidates]
+        if roots_only:
+            if candidates is None:
+                if sort == "added":
+                    # 默认视图直接按顶层任务索引的顺序返回
+                    roots = (records[task_id] for _, task_id in self._root_index)
+                    if status == "open":
+                        return [r for r in roots if r.id not in self.done_ids]
+                    return list(roots)
+                candidates = {task_id for _, task_id in self._root_index}
+            else:
+                candidates = {task_id for task_id in candidates if self.is_root(records[task_id])}
+        if status == "open":
+            if candidates is None:
+                candidates = records.keys() - self.done_ids
+            else:
+                candidates -= self.done_ids
+
+        if sort == "deadline":
+            # 结果较少时直接排序，比遍历整个视图快
+            return sorted((records[task_id] for task_id in candidates),
+                          key=lambda r: (not r.deadline, r.deadline, r.seq))
+        if sort == "priority":
+            ordered = []
+            for p in self._priority_buckets:
+                ordered += self._in_added_order(self._priority_buckets[p] & candidates)
+            return ordered
+        return self._in_added_order(candidates)
+
+    def _sorted_view(self, sort, roots_only):
+        """全部（或全部顶层）任务按 sort 排好的顺序：截止日期按 (deadline, id)，没有截止日期的
+        按添加顺序排在最后；优先级按 PRIORITIES 的顺序，同一优先级按添加顺序"""
+        view = self._views.get((sort, roots_only))
+        if view is None:
+            records = self.records
+            if sort == "deadline":
+                view = [records[task_id] for _, task_id in self._deadline_index]
+                view += [r for r in records.values() if not r.deadline]
+            else:
+                groups = {p: [] for p in self._priority_buckets}
+                for r in records.values():
+                    groups[r.priority].append(r)
+                view = [r for group in groups.values() for r in group]
+            if roots_only:
+                view = [r for r in view if self.is_root(r)]
+            self._views[(sort, roots_only)] = view
+        return view
+
+    def due_before(self, day):
+        """未完成且截止日期不晚于 day 的任务，按截止日期排序"""
+        end = bisect_right(self._deadline_index, (day, float("inf")))
+        return [self.records[task_id] for _, task_id in self._deadline_index[:end]
+                if task_id not in self.done_ids]
+
+    def open_by_deadline(self):
+        """所有未完成且有截止日期的任务，按截止日期排序"""
+        return [self.records[task_id] for _, task_id in self._deadline_index if task_id not in self.done_ids]
+
+    def _in_added_order(self, ids):
+        if ids is None:
+            return list(self.records.values())
+        if len(ids) * 8 < len(self.records):
+            return sorted((self.records[task_id] for task_id in ids), key=lambda r: r.seq)
+        return [r for r in self.records.values() if r.id in ids]
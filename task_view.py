@@ -0,0 +1,190 @@
+import tkinter as tk
+
+from perf import timed
+from task_store import format_task
+
+ROW_HEIGHT = 24
+BOX_SIZE = 12
+INDENT = 18       # 每一级子任务的缩进
+ARROW_WIDTH = 16  # 展开/折叠箭头占的宽度
+
+
+class TaskListView:
+    """虚拟化的任务列表
+
+    只为可见的行创建画布元素，滚动时复用这些元素。行数据是 TaskRecord，
+    点击时交给 on_toggle 修改完成状态，不再为每一行创建 Checkbutton 和 IntVar。
+
+    传入 store（TaskStore）时按树显示：有子任务的行前面有展开箭头，子任务的行
+    只在展开时才从 store 取出并插入，折叠的子树不占用任何行。
+    """
+
+    def __init__(self, master, on_toggle=None, width=560, height=360, store=None, on_context=None):
+        self.on_toggle = on_toggle
+        self.on_context = on_context  # on_context(record, event)：右键点击某一行
+        self.store = store
+        self.roots = []
+        self.rows = []  # roots 加上已展开的子任务
+        self.expanded = set()
+        self._depth = {}  # 已插入的子任务 id -> 层级，顶层任务不在其中
+        self.top = 0
+        self._items = []  # 每个可见行复用的 (箭头, 方框, 勾, 文字) 画布元素
+        self._offsets = []  # 每个可见行当前的缩进
+
+        self.frame = tk.Frame(master)
+        self.canvas = tk.Canvas(self.frame, width=width, height=height, bg="white", highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self.yview)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Button-3>", self._on_right_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.yview("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def visible_count(self):
+        height = self.canvas.winfo_height()
+        if height <= 1:
+            height = int(self.canvas["height"])
+        return max(1, height // ROW_HEIGHT)
+
+    def set_rows(self, rows):
+        """rows 为顶层任务，已展开的任务重新取出子任务"""
+        self.roots = rows
+        self._depth = {}
+        if not self.expanded or self.store is None:
+            self.rows = rows
+        else:
+            self.rows = []
+            for record in rows:
+                self.rows.append(record)
+                if record.id in self.expanded:
+                    self._subtree(record, 1, self.rows)
+        self.redraw()
+
+    def _subtree(self, record, depth, out):
+        """把 record 已展开的子树按先序加入 out"""
+        for child in self.store.children(record.id):
+            if child.id in self._depth:
+                continue  # 数据中的环
+            self._depth[child.id] = depth
+            out.append(child)
+            if child.id in self.expanded:
+                self._subtree(child, depth + 1, out)
+        return out
+
+    def depth(self, record):
+        return self._depth.get(record.id, 0)
+
+    def expand(self, task_id):
+        """下次 set_rows 时展开该任务"""
+        self.expanded.add(task_id)
+
+    def toggle_expanded(self, index):
+        record = self.rows[index]
+        if record.id in self.expanded:
+            self.expanded.discard(record.id)
+            depth = self.depth(record)
+            end = index + 1
+            while end < len(self.rows) and self.depth(self.rows[end]) > depth:
+                self._depth.pop(self.rows[end].id, None)
+                end += 1
+            del self.rows[index + 1:end]
+        else:
+            self.expanded.add(record.id)
+            if self.rows is self.roots:
+                self.rows = list(self.roots)
+            self.rows[index + 1:index + 1] = self._subtree(record, self.depth(record) + 1, [])
+        self.redraw()
+
+    def see(self, index):
+        """滚动到使第 index 行可见"""
+        visible = self.visible_count()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + visible:
+            self.top = index - visible + 1
+        self.redraw()
+
+    def yview(self, *args):
+        visible = self.visible_count()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.top += step * visible if args[2] == "pages" else step
+        self.redraw()
+
+    def _ensure_items(self, count):
+        x = ARROW_WIDTH if self.store is not None else 0
+        while len(self._items) < count:
+            y = len(self._items) * ROW_HEIGHT + (ROW_HEIGHT - BOX_SIZE) // 2
+            arrow = self.canvas.create_text(4, y + BOX_SIZE // 2, anchor="w", state="hidden")
+            box = self.canvas.create_rectangle(x + 6, y, x + 6 + BOX_SIZE, y + BOX_SIZE)
+            check = self.canvas.create_line(x + 8, y + 6, x + 11, y + 10, x + 16, y + 2, width=2)
+            text = self.canvas.create_text(x + 26, y + BOX_SIZE // 2, anchor="w")
+            self._items.append((arrow, box, check, text))
+            self._offsets.append(0)
+
+    def _label(self, record):
+        label = format_task(record)
+        progress = self.store.progress(record.id) if self.store is not None else None
+        if progress:
+            label += f" | Subtasks: {progress[0]}/{progress[1]} done"
+        return label
+
+    @timed("view.redraw")
+    def redraw(self):
+        visible = self.visible_count()
+        self.top = max(0, min(self.top, len(self.rows) - visible))
+        self._ensure_items(visible + 1)
+
+        for i, (arrow, box, check, text) in enumerate(self._items):
+            index = self.top + i
+            if i <= visible and index < len(self.rows):
+                item = self.rows[index]
+                offset = self.depth(item) * INDENT
+                if offset != self._offsets[i]:
+                    # 只在缩进变化时移动元素
+                    for element in (arrow, box, check, text):
+                        self.canvas.move(element, offset - self._offsets[i], 0)
+                    self._offsets[i] = offset
+                if self.store is not None and self.store.has_children(item.id):
+                    self.canvas.itemconfigure(arrow, state="normal",
+                                              text="\u25bc" if item.id in self.expanded else "\u25b6")
+                else:
+                    self.canvas.itemconfigure(arrow, state="hidden")
+                self.canvas.itemconfigure(box, state="normal")
+                self.canvas.itemconfigure(check, state="normal" if item.done else "hidden")
+                self.canvas.itemconfigure(text, state="normal", text=self._label(item))
+            else:
+                for element in (arrow, box, check, text):
+                    self.canvas.itemconfigure(element, state="hidden")
+
+        if self.rows:
+            self.scrollbar.set(self.top / len(self.rows), min(1.0, (self.top + visible) / len(self.rows)))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_click(self, event):
+        index = self.top + event.y // ROW_HEIGHT
+        if index >= len(self.rows):
+            return
+        record = self.rows[index]
+        if (self.store is not None and self.store.has_children(record.id)
+                and event.x < self.depth(record) * INDENT + ARROW_WIDTH):
+            self.toggle_expanded(index)
+            return
+        if self.on_toggle:
+            self.on_toggle(record)
+        self.redraw()
+
+    def _on_right_click(self, event):
+        index = self.top + event.y // ROW_HEIGHT
+        if index < len(self.rows) and self.on_context:
+            self.on_context(self.rows[index], event)
@@ -0,0 +1,136 @@
+import http.server
+import os
+import re
+import sys
+import threading
+
+import pytest
+
+# 模块都在仓库根目录下，没有安装成包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeReleaseServer:
+    """本地的假发布服务器：files 是 路径 -> 内容，记录收到的 GET 请求
+
+    ranges 为 False 时忽略 Range 请求头，etags 为各文件的 ETag；redirect 为 True 时像 GitHub
+    一样先重定向到每次都不同的签名地址；cut_after 不为 None 时每个响应只发送这么多字节就断开。
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.etags = {}
+        self.ranges = True
+        self.redirect = False
+        self.cut_after = None
+        self.requests = []
+        self._signatures = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, send_body):
+                path, _, query = self.path.partition("?")
+                if server.redirect and not query:
+                    server._signatures += 1
+                    self.send_response(302)
+                    self.send_header("Location", f"{path}?sig={server._signatures}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if send_body:
+                    server.requests.append((path, self.headers.get("Range")))
+                data = server.files.get(path.lstrip("/"))
+                if data is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                match = re.match(r"bytes=(\d+)-(\d+)$", self.headers.get("Range") or "")
+                if match and server.ranges:
+                    start, end = int(match[1]), min(int(match[2]), len(data) - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                    data = data[start:end + 1]
+                else:
+                    self.send_response(200)
+                if server.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if path.lstrip("/") in server.etags:
+                    self.send_header("ETag", server.etags[path.lstrip("/")])
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if send_body:
+                    if server.cut_after is not None and len(data) > server.cut_after:
+                        self.wfile.write(data[:server.cut_after])
+                        self.close_connection = True
+                        return
+                    self.wfile.write(data)
+
+            def do_HEAD(self):
+                self._respond(False)
+
+            def do_GET(self):
+                self._respond(True)
+
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}/"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def url(self, path):
+        return self.base_url + path
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def release_server():
+    server = FakeReleaseServer()
+    yield server
+    server.close()
+
+
+class FakeRoot:
+    """代替 Tk 根窗口的假事件循环：after 的回调只在 advance() 推进时间后才执行"""
+
+    def __init__(self):
+        self.now = 0
+        self.jobs = {}  # id -> (到期时间, 回调)
+        self._next_id = 0
+
+    def after(self, ms, func, *args):
+        self._next_id += 1
+        job = f"after#{self._next_id}"
+        self.jobs[job] = (self.now + ms, lambda: func(*args))
+        return job
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def advance(self, ms=0):
+        """推进 ms 毫秒，按到期时间依次执行回调（包括回调中新安排的）"""
+        end = self.now + ms
+        while True:
+            due = [(when, job) for job, (when, _) in self.jobs.items() if when <= end]
+            if not due:
+                break
+            when, job = min(due, key=lambda entry: (entry[0], int(entry[1].split("#")[1])))
+            self.now = max(self.now, when)
+            _, func = self.jobs.pop(job)
+            func()
+        self.now = end
+
+
+@pytest.fixture
+def fake_root():
+    return FakeRoot()
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+import build
+from build import BuildError, check_base_url, copy_sources, find_regressions, inject, write_manifest
+from update_manifest import BLOCK_SIZE, MANIFEST_NAME
+
+
+def test_inject_replaces_value_and_keeps_comment():
+    source = 'APP_TITLE = "Task Manager"\nCURRENT_VERSION = "1.0.0"  # 注入\nOTHER = "CURRENT_VERSION"\n'
+    result = inject(source, "CURRENT_VERSION", "1.2.0")
+    assert 'CURRENT_VERSION = "1.2.0"  # 注入\n' in result
+    assert 'OTHER = "CURRENT_VERSION"' in result
+    assert inject(source, "APP_TITLE", '任务 "测试"').startswith('APP_TITLE = "任务 \\"测试\\""\n')
+
+
+@pytest.mark.parametrize("source", ['X = 1\n', 'CURRENT_VERSION = "1"\nCURRENT_VERSION = "2"\n',
+                                   '    CURRENT_VERSION = "1"\n'])
+def test_inject_needs_exactly_one_top_level_assignment(source):
+    with pytest.raises(BuildError):
+        inject(source, "CURRENT_VERSION", "1.2.0")
+
+
+def test_copy_sources_injects_only_the_main_module(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    out.mkdir()
+    (src / "task_manager.py").write_text('CURRENT_VERSION = "0.0.0"\nAPP_TITLE = "Task Manager"\n', encoding="utf-8")
+    (src / "other.py").write_text('CURRENT_VERSION = "0.0.0"\n', encoding="utf-8")
+    copy_sources(["task_manager.py", "other.py"], str(out), "1.1.0", "Test", root=str(src))
+    assert (out / "task_manager.py").read_text(encoding="utf-8") == 'CURRENT_VERSION = "1.1.0"\nAPP_TITLE = "Test"\n'
+    assert (out / "other.py").read_text(encoding="utf-8") == 'CURRENT_VERSION = "0.0.0"\n'
+
+
+def test_check_base_url():
+    assert check_base_url("https://example.com/releases/download/1.1.0") == \
+        "https://example.com/releases/download/1.1.0/"
+    assert check_base_url("http://localhost:8000/") == "http://localhost:8000/"
+    for url in (None, "", "example.com/x", "file:///tmp/dist"):
+        with pytest.raises(BuildError):
+            check_base_url(url)
+
+
+def test_find_regressions():
+    baseline = {"cli_start_ms": 100.0, "gui_import_ms": 200.0, "size_bytes": 1000}
+    assert find_regressions({"cli_start_ms": 139.0, "gui_import_ms": 200.0, "size_bytes": 1100}, baseline) == []
+    failures = find_regressions({"cli_start_ms": 141.0, "gui_import_ms": 280.0, "size_bytes": 1101}, baseline)
+    assert [failure.split(":")[0] for failure in failures] == ["cli_start_ms", "gui_import_ms", "size_bytes"]
+    # 旧的基准文件缺少某一项时不检查它
+    assert find_regressions({"cli_start_ms": 999.0, "gui_import_ms": 1.0, "size_bytes": 1}, {"gui_import_ms": 1.0}) == []
+
+
+def test_manifest_lists_flat_files_without_bytecode(tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "task_manager.py").write_text("x = 1\n", encoding="utf-8")
+    build.compile_bytecode(str(out))
+    assert os.listdir(out / "__pycache__")
+    binary = tmp_path / "task_manager.exe"
+    binary.write_bytes(os.urandom(BLOCK_SIZE + 10))
+    build.copy_binaries([str(binary)], str(out))
+    with pytest.raises(BuildError):
+        build.copy_binaries([str(binary)], str(out))
+
+    manifest = write_manifest(str(out), "1.1.0", "https://example.com/1.1.0/")
+    assert sorted(manifest["files"]) == ["task_manager.exe", "task_manager.py"]
+    assert len(manifest["files"]["task_manager.exe"]["blocks"]) == 2
+    assert "blocks" not in manifest["files"]["task_manager.py"]
+    with open(out / MANIFEST_NAME, encoding="utf-8") as f:
+        assert json.load(f) == manifest
+    sums = (out / "SHA256SUMS").read_text(encoding="utf-8").splitlines()
+    assert [line.split("  ")[1] for line in sums] == ["manifest.json", "task_manager.exe", "task_manager.py"]
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import file_watch
+from file_watch import FileWatcher
+
+
+@pytest.fixture
+def watcher(tmp_path, fake_root, monkeypatch):
+    monkeypatch.setattr(file_watch, "_init_inotify", lambda directory: None)
+    path = tmp_path / "tasks.json"
+    path.write_text("[]", encoding="utf-8")
+    calls = []
+    watcher = FileWatcher(fake_root, [str(path), str(tmp_path / "tasks.json.journal")],
+                          lambda: calls.append(fake_root.now), poll_interval_ms=100)
+    watcher.calls = calls
+    yield watcher
+    watcher.stop()
+
+
+def test_polling_fallback_reports_changes_once(watcher, fake_root, tmp_path):
+    assert watcher.mode == "polling"
+    fake_root.advance(250)
+    assert watcher.calls == []
+
+    (tmp_path / "tasks.json.journal").write_text('{"op":"add"}\n', encoding="utf-8")
+    fake_root.advance(100)
+    assert watcher.calls == [300]
+    fake_root.advance(300)
+    assert watcher.calls == [300]
+
+
+def test_polling_fallback_sees_replace_and_delete(watcher, fake_root, tmp_path):
+    path = tmp_path / "tasks.json"
+    replacement = tmp_path / "tasks.json.tmp"
+    replacement.write_text("[]", encoding="utf-8")
+    os.replace(replacement, path)  # 内容和大小相同，只有 inode 变了
+    fake_root.advance(100)
+    assert len(watcher.calls) == 1
+
+    path.unlink()
+    fake_root.advance(100)
+    assert len(watcher.calls) == 2
+
+
+def test_stop_cancels_polling(watcher, fake_root, tmp_path):
+    watcher.stop()
+    assert fake_root.jobs == {}
+    (tmp_path / "tasks.json").write_text("[1]", encoding="utf-8")
+    fake_root.advance(1000)
+    assert watcher.calls == []
@@ -0,0 +1,62 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import reminders
+from reminders import ReminderEngine
+from task_store import TaskRecord
+
+HOUR = 3600 * 1000
+
+
+@pytest.fixture
+def engine(fake_root, monkeypatch):
+    start = datetime(2024, 1, 1).timestamp()
+    monkeypatch.setattr(reminders, "time", SimpleNamespace(time=lambda: start + fake_root.now / 1000))
+    due = []
+    engine = ReminderEngine(fake_root, lambda records: due.append([(r.id, fake_root.now // HOUR) for r in records]))
+    engine.due = due
+    yield engine
+    engine.stop()
+
+
+def record(task_id, deadline, done=0):
+    return TaskRecord(task_id, f"task {task_id}", deadline, done=done)
+
+
+def test_reminders_fire_in_deadline_order(engine, fake_root):
+    engine.load([record(1, "2024-01-03"), record(2, "2024-01-01"), record(3, "2024-01-02"),
+                 record(4, "2024-01-01"), record(5, "not a date")])
+    assert len(engine) == 4
+
+    fake_root.advance(24 * HOUR)
+    assert engine.due == [[(2, 9), (4, 9)]]
+    fake_root.advance(48 * HOUR)
+    assert engine.due == [[(2, 9), (4, 9)], [(3, 33)], [(1, 57)]]
+    assert len(engine) == 0 and fake_root.jobs == {}
+
+
+def test_edits_rearm_the_timer(engine, fake_root):
+    engine.load([record(1, "2024-01-03")])
+    engine.tasks_changed([record(1, "2024-01-01")])
+    fake_root.advance(10 * HOUR)
+    assert engine.due == [[(1, 9)]]
+
+    engine.tasks_changed([record(2, "2024-01-02")])
+    engine.tasks_changed([record(2, "2024-01-05")])  # 推迟后原来的时间不再提醒
+    fake_root.advance(4 * 24 * HOUR)
+    assert engine.due == [[(1, 9)], [(2, 105)]]
+
+
+def test_delete_and_done_cancel_reminders(engine, fake_root):
+    engine.load([record(1, "2024-01-01"), record(2, "2024-01-01"), record(3, "2024-01-01")])
+    engine.tasks_changed(removed=[1])
+    engine.tasks_changed([record(2, "2024-01-01", done=1)])
+    fake_root.advance(24 * HOUR)
+    assert engine.due == [[(3, 9)]]
+
+    # 提醒过的任务取消完成后不会再次提醒
+    engine.tasks_changed([record(3, "2024-01-01")])
+    fake_root.advance(24 * HOUR)
+    assert engine.due == [[(3, 9)]]
@@ -0,0 +1,325 @@
+import io
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import task_cli
+from task_cli import CommandError, build_parser, run_command, send_command, serve
+from task_core import TaskService, make_task
+from task_storage import JournalStorage, SqliteStorage
+from undo_log import UndoLog
+
+
+def open_storage(kind, tmp_path):
+    if kind == "sqlite":
+        return SqliteStorage(str(tmp_path / "tasks.db"))
+    return JournalStorage(str(tmp_path / "tasks.json"))
+
+
+@pytest.fixture(params=["journal", "sqlite"])
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def service(backend, tmp_path):
+    service = TaskService(open_storage(backend, tmp_path), str(tmp_path / "archive.jsonl"))
+    service.load()
+    yield service
+    service.close()
+
+
+def reopen(service, backend, tmp_path):
+    service.close()
+    reopened = TaskService(open_storage(backend, tmp_path), service.archive_file)
+    reopened.load()
+    return reopened
+
+
+def texts(records):
+    return [record.text for record in records]
+
+
+def test_make_task_validates_input():
+    assert make_task("  Plan ", " 2026-01-02 ", "High") == {
+        "text": "Plan", "deadline": "2026-01-02", "priority": "High", "subtasks": [], "done": 0}
+    for args in (("  ",), ("x", "2026-13-01"), ("x", "20240101"), ("x", "2024-W01-1"), ("x", "2024-1-5"),
+                 ("x", "", "Urgent")):
+        with pytest.raises(ValueError):
+            make_task(*args)
+
+
+def test_changes_are_persisted(service, backend, tmp_path):
+    first = service.add("Write report", "2026-03-01", "High")
+    service.add("Review budget")
+    service.set_done(first.id, 1)
+    with pytest.raises(KeyError):
+        service.set_done(999, 1)
+
+    service = reopen(service, backend, tmp_path)
+    assert texts(service.query()) == ["Write report", "Review budget"]
+    assert [r.id for r in service.query(status="done")] == [first.id]
+    service.close()
+
+
+def test_listeners_see_every_change(service):
+    events = []
+    service.listeners.append(lambda records, removed: events.append(([r.id for r in records], list(removed))))
+    task = service.add("a")
+    service.set_done(task.id, 1)
+    service.delete_done()
+    assert events == [([task.id], []), ([task.id], []), ([], [task.id])]
+
+
+def test_delete_and_archive_completed(service, backend, tmp_path):
+    keep = service.add("keep")
+    for text in ("delete me", "archive me"):
+        service.set_done(service.add(text).id, 1)
+    assert service.delete_done() == 2
+    assert service.archive_done() == 0
+
+    service.set_done(service.add("archive me").id, 1)
+    assert service.archive_done() == 1
+    with open(service.archive_file, encoding="utf-8") as f:
+        assert [json.loads(line)["text"] for line in f] == ["archive me"]
+
+    service = reopen(service, backend, tmp_path)
+    assert [r.id for r in service.query()] == [keep.id]
+    service.close()
+
+
+def test_sync_picks_up_other_instances(service, backend, tmp_path):
+    other = TaskService(open_storage(backend, tmp_path))
+    other.load()
+    task = other.add("from other")
+    other.add("deleted later")
+    assert service.sync() > 0
+    assert texts(service.query()) == ["from other", "deleted later"]
+
+    other.set_done(task.id, 1)
+    other.storage.delete([task.id + 1])
+    removed = []
+    service.listeners.append(lambda records, ids: removed.extend(ids))
+    service.sync()
+    assert [r.text for r in service.query(status="done")] == ["from other"]
+    assert texts(service.query()) == ["from other"]
+    assert removed == [task.id + 1]
+    assert service.sync() == 0
+    other.close()
+
+
+def run(service, *argv):
+    out = io.StringIO()
+    run_command(service, build_parser().parse_args(list(argv)), out)
+    return out.getvalue()
+
+
+def test_cli_commands(service):
+    assert run(service, "add", "Write report", "--deadline", "2026-03-01", "--priority", "High") == "Added task 1\n"
+    run(service, "add", "Later", "--deadline", "2026-04-01")
+    run(service, "done", "2")
+    assert run(service, "due", "2026-03-01") == "1\t[ ] Write report | Due: 2026-03-01 | Priority: High\n"
+    listed = [json.loads(line) for line in run(service, "list", "--status", "done", "--json").splitlines()]
+    assert [item["text"] for item in listed] == ["Later"]
+    assert run(service, "delete-done") == "Deleted 1 tasks\n"
+
+    with pytest.raises(CommandError):
+        run(service, "done", "99")
+    with pytest.raises(CommandError):
+        run(service, "add", " ")
+    with pytest.raises(CommandError):
+        build_parser().parse_args(["list", "--sort", "nope"])
+    with pytest.raises(CommandError):
+        build_parser().parse_args(["due", "notaday"])
+
+
+def test_subtasks_are_child_records(service, backend, tmp_path):
+    parent = service.add("Project", priority="High", subtasks=["design", " ", "build"])
+    children = service.store.children(parent.id)
+    assert texts(children) == ["design", "build"]
+    assert all(child.priority == "High" for child in children)
+    nested = service.add("mockups", parent=children[0].id)
+    with pytest.raises(ValueError):
+        service.add("orphan", parent=999)
+    service.set_done(children[1].id, 1)
+    assert service.store.progress(parent.id) == (1, 2)
+
+    service = reopen(service, backend, tmp_path)
+    assert service.store.descendants([parent.id]) == [children[0].id, nested.id, children[1].id]
+    assert [r.text for r in service.store.query(roots_only=True)] == ["Project"]
+    service.close()
+
+
+def test_deleting_parent_removes_descendants(service):
+    parent = service.add("Project", subtasks=["a", "b"])
+    service.add("deep", parent=parent.id + 1)
+    service.add("other")
+    service.set_done(parent.id, 1)
+    assert service.delete_done() == 4
+    assert texts(service.query()) == ["other"]
+
+
+def test_legacy_subtasks_are_migrated_on_load(tmp_path):
+    path = tmp_path / "tasks.json"
+    path.write_text(json.dumps([
+        {"id": 1, "text": "Old", "deadline": "", "priority": "Low", "subtasks": ["x", "y"], "done": 0},
+        {"id": 2, "text": "Plain", "deadline": "", "priority": "Medium", "subtasks": [], "done": 0},
+    ]), encoding="utf-8")
+    service = TaskService(JournalStorage(str(path)))
+    service.load()
+    assert service.store.get(1).subtasks == ()
+    assert [(r.text, r.priority) for r in service.store.children(1)] == [("x", "Low"), ("y", "Low")]
+    assert service.query("x")[0].parent == 1
+    service.close()
+
+    # 只转换一次
+    service = TaskService(JournalStorage(str(path)))
+    service.load()
+    assert len(service.store) == 4
+    service.close()
+
+
+def test_export_keeps_subtask_hierarchy(service, tmp_path, backend):
+    parent = service.add("Project", subtasks=["a"])
+    deep = service.add("deep", parent=parent.id + 1)
+    service.set_done(deep.id, 1)
+    service.add("other")
+    assert [(item["text"], item.get("parent"), item["done"]) for item in service.export_items()] == [
+        ("Project", None, 0), ("a", parent.id, 0), ("deep", parent.id + 1, 1), ("other", None, 0)]
+
+    from task_io import export_tasks
+    path = str(tmp_path / "out.csv")
+    export_tasks(path, service.export_items())
+    (tmp_path / "copy").mkdir()
+    other = TaskService(open_storage(backend, tmp_path / "copy"), str(tmp_path / "copy" / "archive.jsonl"))
+    other.load()
+    other.add("existing")  # 导入后 id 与导出文件中的不同
+    other.import_tasks(path)
+    by_text = {record.text: record for record in other.query()}
+    assert by_text["a"].parent == by_text["Project"].id
+    assert by_text["deep"].parent == by_text["a"].id and by_text["deep"].done
+    assert other.store.progress(by_text["a"].id) == (1, 1)
+    other.close()
+
+
+@pytest.fixture
+def undoable(service):
+    service.history = UndoLog()
+    return service
+
+
+def test_undo_and_redo_add(undoable):
+    parent = undoable.add("Project", subtasks=["a", "b"])
+    assert undoable.undo() == "Add Task"
+    assert len(undoable.store) == 0
+    assert undoable.redo() == "Add Task"
+    assert [r.id for r in undoable.query()] == [parent.id, parent.id + 1, parent.id + 2]
+    assert undoable.store.progress(parent.id) == (0, 2)
+
+
+def test_undo_toggle_and_delete_completed(undoable):
+    parent = undoable.add("Project", "2026-01-01", "High", subtasks=["a"])
+    undoable.set_done(parent.id, 1)
+    assert undoable.delete_done() == 2
+    assert undoable.undo() == "Delete Completed"
+    restored = undoable.store.get(parent.id)
+    assert (restored.text, restored.deadline, restored.priority, restored.done) == ("Project", "2026-01-01", "High", 1)
+    assert texts(undoable.store.children(parent.id)) == ["a"]
+    assert undoable.undo() == "Mark Done"
+    assert undoable.store.get(parent.id).done == 0
+    assert undoable.redo() == "Mark Done"
+    assert undoable.redo() == "Delete Completed"
+    assert len(undoable.store) == 0
+
+
+def test_undo_import(undoable, tmp_path):
+    path = tmp_path / "in.jsonl"
+    path.write_text("".join(json.dumps({"text": f"t{i}", "subtasks": ["s"]}) + "\n" for i in range(3)),
+                    encoding="utf-8")
+    undoable.add("kept")
+    undoable.import_tasks(str(path))
+    assert len(undoable.store) == 7
+    assert undoable.undo() == "Import Tasks"
+    assert texts(undoable.query()) == ["kept"]
+
+
+def test_undo_skips_tasks_removed_elsewhere(undoable):
+    task = undoable.add("a")
+    undoable.store.remove(task.id)  # 例如其他实例已经删除
+    assert undoable.undo() == "Add Task"
+    assert undoable.redo() == "Add Task"
+    assert len(undoable.store) == 0
+
+
+def test_restore_gives_reused_ids_a_new_id(backend, tmp_path):
+    undo_path = str(tmp_path / "tasks.undo")
+    service = TaskService(open_storage(backend, tmp_path))
+    service.history = UndoLog(path=undo_path)
+    service.load()
+    parent = service.add("Project", subtasks=["a"])
+    service.set_done(parent.id, 1)
+    service.delete_done()
+    service.storage.compact()
+    service.close()
+
+    # 压缩后重新打开时从现有最大的 id 继续编号，被删除的 id 会分配给新任务
+    other = TaskService(open_storage(backend, tmp_path))
+    other.load()
+    assert other.add("reuses the id").id == parent.id
+    other.close()
+
+    service = TaskService(open_storage(backend, tmp_path))
+    service.history = UndoLog(path=undo_path)
+    service.load()
+    assert service.undo() == "Delete Completed"
+    assert service.store.get(parent.id).text == "reuses the id"
+    [restored] = [r for r in service.query() if r.text == "Project"]
+    assert restored.id != parent.id
+    assert texts(service.store.children(restored.id)) == ["a"]
+    assert service.store.is_root(restored)
+
+    service = reopen(service, backend, tmp_path)
+    [restored] = [r for r in service.query() if r.text == "Project"]
+    assert texts(service.store.children(restored.id)) == ["a"]
+    service.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="daemon mode needs Unix domain sockets")
+def test_daemon_survives_silent_clients_and_storage_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_cli, "CLIENT_TIMEOUT", 0.2)
+    service = TaskService(JournalStorage(str(tmp_path / "tasks.json")))
+    service.load()
+    path = str(tmp_path / "tasks.sock")
+    responses = []
+
+    def fail(item):
+        raise OSError(28, "No space left on device")
+
+    def client():
+        silent = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            while True:
+                try:
+                    silent.connect(path)  # socket 文件在 listen() 之前就已创建
+                    break
+                except OSError:
+                    time.sleep(0.01)
+            add, service.storage.add = service.storage.add, fail
+            responses.append(send_command(path, ["add", "x"]))
+            service.storage.add = add
+            responses.append(send_command(path, ["add", "y"]))
+        finally:
+            silent.close()
+            responses.append(send_command(path, ["stop"]))  # 出错时也要让 serve() 返回
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    assert serve(service, path) == 0  # 注册信号处理需要在主线程中运行
+    thread.join()
+    service.close()
+    assert responses[0] == (1, "Error: [Errno 28] No space left on device\n")
+    assert responses[1] == (0, "Added task 1\n")
+    assert responses[2][0] == 0
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from task_io import MAX_REPORTED_ERRORS, export_tasks, import_tasks, parse_task
+from task_storage import JournalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = JournalStorage(str(tmp_path / "tasks.json"))
+    storage.load()
+    yield storage
+    storage.close()
+
+
+def write_lines(path, rows):
+    path.write_text("".join((row if isinstance(row, str) else json.dumps(row, ensure_ascii=False)) + "\n"
+                            for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def test_parse_task_normalizes_fields():
+    item, error = parse_task({"text": "  Plan  ", "priority": "high", "subtasks": "a, b,,", "done": "Yes"})
+    assert error is None
+    assert item == {"text": "Plan", "deadline": "", "priority": "High", "subtasks": ["a", "b"], "done": 1}
+
+
+@pytest.mark.parametrize("raw, message", [
+    (["not", "a", "dict"], "row is not an object"),
+    ({"text": "  "}, "text is empty"),
+    ({"text": "x", "deadline": "2026-02-30"}, "invalid deadline"),
+    ({"text": "x", "deadline": "2026-1-5"}, "invalid deadline"),
+    ({"text": "x", "deadline": "20240101"}, "invalid deadline"),
+    ({"text": "x", "deadline": "2024-W01-1"}, "invalid deadline"),
+    ({"text": "x", "priority": "Urgent"}, "invalid priority"),
+    ({"text": "x", "subtasks": 5}, "subtasks must be"),
+])
+def test_parse_task_rejects_invalid_rows(raw, message):
+    item, error = parse_task(raw)
+    assert item is None and error.startswith(message)
+
+
+def test_jsonl_import_skips_bad_rows_and_reports_line_numbers(tmp_path, storage):
+    path = write_lines(tmp_path / "in.jsonl", [
+        {"text": "first", "deadline": "2026-01-02"},
+        "{broken",
+        "",
+        {"text": ""},
+        {"text": "会议", "priority": "Low", "subtasks": ["准备"]},
+    ])
+    imported, report = import_tasks(path, storage)
+    assert [item["text"] for item in imported] == ["first", "会议"]
+    assert report.imported == 2 and report.error_count == 2
+    assert [row for row, _ in report.errors] == [2, 4]
+    assert report.errors[0][1].startswith("invalid JSON")
+    assert [item["id"] for item in imported] == [1, 2]
+    assert [item["text"] for item in storage.load()] == ["first", "会议"]
+
+
+def test_import_writes_in_batches(tmp_path, storage):
+    path = write_lines(tmp_path / "in.jsonl", [{"text": f"task {i}"} for i in range(25)])
+    batches = []
+    add_many = storage.add_many
+    storage.add_many = lambda items: (batches.append(len(items)), add_many(items))
+    imported, report = import_tasks(path, storage, batch_size=10)
+    assert batches == [10, 10, 5]
+    assert report.imported == len(imported) == 25
+
+
+def test_error_list_is_capped(tmp_path, storage):
+    path = write_lines(tmp_path / "in.jsonl", [{"text": ""}] * (MAX_REPORTED_ERRORS + 5))
+    _, report = import_tasks(path, storage)
+    assert report.error_count == MAX_REPORTED_ERRORS + 5
+    assert len(report.errors) == MAX_REPORTED_ERRORS
+
+
+@pytest.mark.parametrize("name", ["out.csv", "out.jsonl"])
+def test_export_then_import_roundtrip(tmp_path, storage, name):
+    items = [
+        {"text": "Plan, with comma", "deadline": "2026-05-01", "priority": "High", "subtasks": ["a", "b"], "done": 1},
+        {"text": "写报告 \"quoted\"", "deadline": "", "priority": "Low", "subtasks": [], "done": 0},
+    ]
+    path = str(tmp_path / name)
+    assert export_tasks(path, iter(items)) == 2
+    assert not (tmp_path / (name + ".tmp")).exists()
+    imported, report = import_tasks(path, storage)
+    assert report.error_count == 0
+    assert [{k: v for k, v in item.items() if k != "id"} for item in imported] == items
+
+
+def test_csv_import_reports_physical_line_numbers(tmp_path, storage):
+    path = tmp_path / "in.csv"  # 带 BOM，像 Excel 保存的 CSV
+    path.write_text("\ufefftext,deadline,priority,subtasks,done\n"
+                    "\"multi\nline\",,,,\n"
+                    "bad,not-a-date,,,\n", encoding="utf-8")
+    imported, report = import_tasks(str(path), storage)
+    assert [item["text"] for item in imported] == ["multi\nline"]
+    assert report.errors[0][0] == 4
+
+
+def test_import_links_subtasks_by_file_id(tmp_path, storage):
+    path = write_lines(tmp_path / "in.jsonl", [
+        {"text": "orphan", "parent": 99},
+        {"text": "Project", "id": 7},
+        {"text": "a", "id": 8, "parent": 7, "done": 1},
+        {"text": "b", "id": "x", "parent": 7},
+        {"text": "deep", "parent": 8},
+    ])
+    imported, report = import_tasks(path, storage)
+    assert [error[0] for error in report.errors] == [1, 4]
+    by_text = {item["text"]: item for item in imported}
+    assert "parent" not in by_text["Project"]
+    assert by_text["a"]["parent"] == by_text["Project"]["id"] and by_text["a"]["done"] == 1
+    assert by_text["deep"]["parent"] == by_text["a"]["id"]
+    stored = {item["id"]: item for item in storage.load()}
+    assert stored[by_text["deep"]["id"]]["parent"] == by_text["a"]["id"]
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from task_snapshot import SnapshotReader, verify_roundtrip, write_snapshot
+from task_storage import JournalStorage
+
+
+def write(path, items):
+    with open(path, "w+b") as f:
+        write_snapshot(f, items)
+
+
+@pytest.mark.parametrize("item", [
+    {"id": 1, "text": "full", "deadline": "2026-01-01", "priority": "High", "subtasks": ["a", "b"], "done": 1},
+    {"id": 2, "text": "only required keys"},
+    {"id": 3, "text": "done as bool", "done": True},
+    {"id": 4, "text": "done as 2", "done": 2},
+    {"id": "x", "text": "string id"},
+    {"id": -5, "text": "negative id"},
+    {"id": 2 ** 64, "text": "id too large"},
+    {"text": "missing id"},
+    {"id": 6, "text": "no deadline", "deadline": None},
+    {"id": 7, "text": "会议 报告 ✓", "subtasks": ["写报告", "émoji 🎉"], "priority": "低"},
+    {"id": 8, "text": "child", "parent": 1, "tags": ["x"], "note": {"k": 1}},
+    {"id": 9, "text": "non-string subtask", "subtasks": [1, None]},
+    {"id": 10, "text": "x" * 70000, "deadline": "d" * 300},
+])
+def test_roundtrip_is_lossless(tmp_path, item):
+    assert verify_roundtrip([item], str(tmp_path / "t.snap")) == []
+
+
+def test_roundtrip_mixed_list_keeps_order(tmp_path):
+    items = [{"id": i, "text": f"task {i}", "priority": "Medium", "subtasks": [], "done": i % 2}
+             for i in range(1, 200)]
+    items.insert(50, {"id": "raw", "text": 5})
+    assert verify_roundtrip(items, str(tmp_path / "t.snap")) == []
+    with SnapshotReader(str(tmp_path / "t.snap")) as reader:
+        assert list(reader) == items
+
+
+def test_empty_list(tmp_path):
+    path = str(tmp_path / "t.snap")
+    write(path, [])
+    with SnapshotReader(path) as reader:
+        assert len(reader) == 0
+        assert list(reader) == []
+        assert reader.next_id == 1
+
+
+@pytest.mark.parametrize("content", [b"", b"TMS", b"not a snapshot at all, just text"])
+def test_invalid_file_is_rejected(tmp_path, content):
+    path = tmp_path / "t.snap"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        SnapshotReader(str(path))
+
+
+def test_next_id_ignores_non_int_ids(tmp_path):
+    path = str(tmp_path / "t.snap")
+    write(path, [{"id": 3, "text": "a"}, {"id": "99", "text": "b"}, {"id": 10, "text": "c", "done": True}])
+    with SnapshotReader(path) as reader:
+        assert reader.next_id == 11
+
+
+def test_journal_switches_from_json_to_binary(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    storage = JournalStorage(path)
+    storage.load()
+    for i in range(5):
+        storage.add({"text": f"task {i}", "deadline": "", "priority": "Low", "subtasks": [], "done": 0})
+    storage.update(2, done=1)
+    storage.compact()
+    storage.close()
+    with open(path, "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    binary = JournalStorage(path, snapshot_format="binary")
+    assert binary.load() == expected
+    binary.compact()
+    binary.close()
+    assert (tmp_path / "tasks.snap").exists()
+    assert not (tmp_path / "tasks.json").exists()
+    assert (tmp_path / "tasks.json.migrated").exists()
+
+    reopened = JournalStorage(path, snapshot_format="binary")
+    assert reopened.load() == expected
+    reopened.close()
+
+
+def test_add_while_paging_does_not_reuse_ids(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    items = [{"id": i, "text": f"task {i}", "deadline": "", "priority": "Medium", "subtasks": [], "done": 0}
+             for i in range(1, 12001)]
+    write(str(tmp_path / "tasks.snap"), items)
+
+    storage = JournalStorage(path, snapshot_format="binary")
+    pages = storage.iter_pages(page_size=5000)
+    next(pages)
+    new_id = storage.add({"text": "added during load", "deadline": "", "priority": "Medium",
+                          "subtasks": [], "done": 0})
+    assert new_id == 12001
+    loaded = [item for page in pages for item in page]
+    assert len(loaded) == 7000
+    storage.close()
+
+    reopened = JournalStorage(path, snapshot_format="binary")
+    tasks = {item["id"]: item for item in reopened.load()}
+    reopened.close()
+    assert len(tasks) == 12001
+    assert tasks[5001]["text"] == "task 5001"
+    assert tasks[12001]["text"] == "added during load"
@@ -0,0 +1,350 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import task_storage
+from task_storage import FileLock, JournalStorage, SqliteStorage, WriteBehind, open_storage
+
+
+@pytest.fixture
+def json_path(tmp_path):
+    return str(tmp_path / "tasks.json")
+
+
+def reload(path, **kwargs):
+    storage = JournalStorage(path, **kwargs)
+    tasks = storage.load()
+    storage.close()
+    return tasks
+
+
+def test_torn_last_journal_line_is_dropped(json_path):
+    storage = JournalStorage(json_path)
+    storage.load()
+    storage.add({"text": "kept"})
+    storage.add({"text": "torn"})
+    storage.close()
+    with open(json_path + ".journal", "rb+") as f:
+        data = f.read()
+        f.truncate(len(data) - 10)  # 模拟写到一半断电
+
+    assert [task["text"] for task in reload(json_path)] == ["kept"]
+    with open(json_path + ".journal", "rb") as f:
+        assert f.read().endswith(b"}\n")
+
+    storage = JournalStorage(json_path)
+    storage.load()
+    storage.add({"text": "after"})  # 追加在完整的行之后
+    storage.close()
+    assert [(task["id"], task["text"]) for task in reload(json_path)] == [(1, "kept"), (2, "after")]
+
+
+def test_journal_is_compacted_at_threshold(json_path):
+    storage = JournalStorage(json_path, compact_threshold=5)
+    storage.load()
+    for i in range(4):
+        storage.add({"text": f"task {i}"})
+    assert not os.path.exists(json_path)
+
+    storage.add({"text": "task 4"})
+    storage.wait_compaction()
+    assert not os.path.exists(json_path + ".journal")
+    assert not os.path.exists(json_path + ".journal.1")
+    with open(json_path, encoding="utf-8") as f:
+        assert [task["id"] for task in json.load(f)] == [1, 2, 3, 4, 5]
+
+    storage.update(1, done=1)
+    storage.close()
+    tasks = reload(json_path)
+    assert len(tasks) == 5 and tasks[0]["done"] == 1
+
+
+def test_compaction_resumes_after_interrupted_rotation(json_path):
+    storage = JournalStorage(json_path)
+    storage.load()
+    storage.add({"text": "rotated"})
+    os.replace(json_path + ".journal", json_path + ".journal.1")  # 上次压缩在写快照前中断
+    storage.add({"text": "new"})
+    storage.compact()
+    storage.close()
+
+    assert not os.path.exists(json_path + ".journal.1")
+    assert [task["text"] for task in reload(json_path)] == ["rotated", "new"]
+
+
+def test_legacy_tasks_get_ids(json_path):
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump([{"text": "a", "done": 0}, {"text": "b", "done": 1}], f)
+
+    storage = JournalStorage(json_path)
+    assert [(task["id"], task["text"]) for task in storage.load()] == [(1, "a"), (2, "b")]
+    assert storage.add({"text": "c"}) == 3
+    storage.close()
+    with open(json_path, encoding="utf-8") as f:
+        assert [task["id"] for task in json.load(f)] == [1, 2]  # 分配的 id 立即写回快照
+    assert [task["id"] for task in reload(json_path)] == [1, 2, 3]
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    path = str(tmp_path / "tasks.json.lock")
+    first, second = FileLock(path), FileLock(path)
+    with first:
+        assert not second.acquire(blocking=False)
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(second.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+        assert acquired == []
+    waiter.join(5)
+    assert acquired == [True]
+    second.release()
+    first.close()
+    second.close()
+
+
+def test_file_lock_is_held_across_processes(tmp_path):
+    path = str(tmp_path / "tasks.json.lock")
+    code = ("import sys; from task_storage import FileLock; lock = FileLock(sys.argv[1]); lock.acquire(); "
+            "print('locked', flush=True); sys.stdin.read()")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    child = subprocess.Popen([sys.executable, "-c", code, path], cwd=root,
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert child.stdout.readline() == "locked\n"
+        lock = FileLock(path)
+        assert not lock.acquire(blocking=False)
+        child.stdin.close()
+        child.wait(10)
+        assert lock.acquire(blocking=False)
+        lock.release()
+        lock.close()
+    finally:
+        child.kill()
+        child.wait()
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_storage, "CHANGELOG_KEEP", 5)
+    return str(tmp_path / "tasks.db")
+
+
+def changed_ids(changes):
+    return {change["task"]["id"] for change in changes if change["op"] == "add"}
+
+
+def test_prune_keeps_changes_the_slowest_reader_has_not_seen(db_path):
+    writer = SqliteStorage(db_path)
+    slow = SqliteStorage(db_path)
+    ids = [writer.add({"text": f"task {i}"}) for i in range(20)]
+    writer.compact()
+
+    assert changed_ids(slow.poll_changes()) == set(ids)
+    writer.close()
+    slow.close()
+
+
+def test_prune_drops_changes_every_reader_has_seen(db_path):
+    writer = SqliteStorage(db_path)
+    reader = SqliteStorage(db_path)
+    for i in range(20):
+        writer.add({"text": f"task {i}"})
+    reader.poll_changes()
+    writer.compact()
+
+    remaining = writer.conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+    assert remaining == task_storage.CHANGELOG_KEEP
+    writer.close()
+    reader.close()
+
+
+def test_closed_readers_no_longer_hold_back_prune(db_path):
+    writer = SqliteStorage(db_path)
+    SqliteStorage(db_path).close()
+    for i in range(20):
+        writer.add({"text": f"task {i}"})
+    writer.compact()
+
+    remaining = writer.conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+    assert remaining == task_storage.CHANGELOG_KEEP
+    writer.close()
+
+
+def test_own_writes_are_not_polled_back(db_path):
+    mine = SqliteStorage(db_path)
+    other = SqliteStorage(db_path)
+    mine.add({"text": "mine"})
+    assert mine.poll_changes() == []
+
+    theirs = other.add({"text": "theirs"})
+    mine.update(1, done=1)  # 写入时还没读到 other 的修改
+    changes = mine.poll_changes()
+    assert changed_ids(changes) == {theirs}
+    assert mine.poll_changes() == []
+    mine.close()
+    other.close()
+
+
+def test_no_secondary_indexes(db_path):
+    storage = SqliteStorage(db_path)
+    indexes = storage.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks' AND sql IS NOT NULL").fetchall()
+    assert indexes == []
+    storage.close()
+
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_open_storage_migrates_journal_install(tmp_path, snapshot_format):
+    data_file = str(tmp_path / "tasks.json")
+    journal = JournalStorage(data_file, snapshot_format=snapshot_format)
+    journal.load()
+    journal.add({"text": "old", "deadline": "2024-05-01"})
+    journal.add({"text": "new"})
+    journal.compact()
+    journal.delete([2])
+    journal.close()
+    assert os.path.exists(data_file) == (snapshot_format == "json")
+
+    storage = open_storage({"storage": "sqlite", "sqlite_file": "tasks.db",
+                            "snapshot_format": snapshot_format}, data_file)
+    assert [(item["id"], item["text"]) for item in storage.load()] == [(1, "old")]
+    storage.close()
+    leftovers = sorted(name for name in os.listdir(tmp_path) if not name.endswith((".lock", ".migrated")))
+    assert leftovers == ["tasks.db"]
+
+
+@pytest.fixture
+def paged_file(tmp_path):
+    """10 个任务的二进制快照，没有日志，iter_pages 会按页解码"""
+    path = str(tmp_path / "tasks.json")
+    storage = JournalStorage(path, snapshot_format="binary")
+    storage.load()
+    storage.add_many([{"text": f"task {i}"} for i in range(10)])
+    storage.compact()
+    storage.close()
+    return path
+
+
+def test_edits_from_another_instance_during_paging(paged_file):
+    reader = JournalStorage(paged_file, snapshot_format="binary")
+    other = JournalStorage(paged_file, snapshot_format="binary")
+    other.load()
+    pages = reader.iter_pages(page_size=3)
+    assert [item["id"] for item in next(pages)] == [1, 2, 3]
+
+    other.update(8, text="edited")
+    other.delete([9])
+    other.update(2, done=1)
+    reader.update(1, text="mine")  # 本实例的写入会先读入 other 的记录
+    assert reader.poll_changes() == []
+    loaded = [item["id"] for page in pages for item in page]
+    assert loaded == [4, 5, 6, 7, 8, 9, 10]
+
+    changes = reader.poll_changes()
+    assert {change["task"]["id"]: change["task"]["text"] for change in changes if change["op"] == "add"} == {
+        8: "edited", 2: "task 1"}
+    assert changes[-1] == {"op": "delete", "ids": [9]}
+    reader.compact()
+    reader.close()
+    other.close()
+
+    tasks = {item["id"]: item for item in JournalStorage(paged_file, snapshot_format="binary").load()}
+    assert 9 not in tasks
+    assert tasks[8]["text"] == "edited" and tasks[2]["done"] == 1 and tasks[1]["text"] == "mine"
+
+
+def test_snapshot_rewritten_during_paging(paged_file):
+    reader = JournalStorage(paged_file, snapshot_format="binary")
+    other = JournalStorage(paged_file, snapshot_format="binary")
+    other.load()
+    pages = reader.iter_pages(page_size=3)
+    next(pages)
+
+    other.delete([9])
+    other.compact()
+    reader.update(1, text="mine")
+    list(pages)
+
+    assert reader.poll_changes() == [{"op": "delete", "ids": [9]}]
+    reader.close()
+    other.close()
+    tasks = {item["id"]: item for item in JournalStorage(paged_file, snapshot_format="binary").load()}
+    assert 9 not in tasks and tasks[1]["text"] == "mine"
+
+
+class RecordingStorage:
+    """记录 WriteBehind 转发过来的调用"""
+
+    def __init__(self):
+        self.calls = []
+        self.closed = False
+
+    def add(self, item):
+        self.calls.append(("add", item["text"]))
+        return 1
+
+    def update_many(self, changes):
+        self.calls.append(("update_many", changes))
+
+    def delete(self, ids):
+        self.calls.append(("delete", list(ids)))
+
+    def poll_changes(self):
+        self.calls.append(("poll_changes",))
+        return []
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def write_behind(fake_root):
+    return WriteBehind(RecordingStorage(), fake_root, delay_ms=500)
+
+
+def test_write_behind_coalesces_updates(write_behind, fake_root):
+    write_behind.update(1, text="a")
+    write_behind.update(1, done=1)
+    write_behind.update_many({1: {"text": "b"}, 2: {"priority": "High"}})
+    fake_root.advance(499)
+    assert write_behind.storage.calls == []
+
+    fake_root.advance(1)
+    assert write_behind.storage.calls == [("update_many", {1: {"text": "b", "done": 1}, 2: {"priority": "High"}})]
+    assert write_behind.metrics()["edits"] == 4 and write_behind.metrics()["flushes"] == 1
+
+    write_behind.update(1, done=0)  # 上次写入后重新开始计时
+    fake_root.advance(500)
+    assert write_behind.storage.calls[-1] == ("update_many", {1: {"done": 0}})
+
+
+def test_write_behind_delete_drops_pending_updates(write_behind, fake_root):
+    write_behind.update(1, text="a")
+    write_behind.update(2, text="b")
+    write_behind.delete([1])
+    fake_root.advance(500)
+    assert write_behind.storage.calls == [("update_many", {2: {"text": "b"}}), ("delete", [1])]
+
+
+def test_write_behind_add_writes_pending_deletes_first(write_behind, fake_root):
+    write_behind.delete([1])
+    write_behind.add({"text": "restored"})
+    assert write_behind.storage.calls == [("delete", [1]), ("add", "restored")]
+    fake_root.advance(500)
+    assert len(write_behind.storage.calls) == 2
+
+
+def test_write_behind_flushes_before_poll_and_on_close(write_behind, fake_root):
+    write_behind.update(1, text="a")
+    write_behind.poll_changes()
+    assert write_behind.storage.calls == [("update_many", {1: {"text": "a"}}), ("poll_changes",)]
+
+    write_behind.update(2, done=1)
+    write_behind.close()
+    assert write_behind.storage.calls[-1] == ("update_many", {2: {"done": 1}})
+    assert write_behind.storage.closed
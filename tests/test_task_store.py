@@ -0,0 +1,231 @@
+import random
+
+import pytest
+
+from task_store import PRIORITIES, TaskStore, format_task, tokenize
+
+TODAY = "2026-03-10"
+
+
+def item(task_id, text, deadline="", priority="Medium", done=0, subtasks=()):
+    return {"id": task_id, "text": text, "deadline": deadline, "priority": priority,
+            "subtasks": list(subtasks), "done": done}
+
+
+@pytest.fixture
+def store():
+    store = TaskStore()
+    store.load([
+        item(1, "Write report", "2026-03-12", "High"),
+        item(2, "Review budget", "2026-03-01", "Low", done=1),
+        item(3, "Plan meeting", "", "Medium", subtasks=["book room", "send invites"]),
+        item(4, "写报告 review report", "2026-03-05", "High"),
+        item(5, "Fix deploy script", "2026-03-10", "Low"),
+    ])
+    return store
+
+
+def ids(records):
+    return [record.id for record in records]
+
+
+def test_tokenize_splits_words_and_non_ascii_characters():
+    assert tokenize("Write the REPORT") == {"write", "the", "report"}
+    assert tokenize("写报告 ok") == {"写报告", "写", "报", "告", "ok"}
+
+
+def test_search_matches_word_prefixes_in_text_and_subtasks(store):
+    assert ids(store.query("rep")) == [1, 4]
+    assert ids(store.query("review rep")) == [4]
+    assert ids(store.query("invites")) == [3]
+    assert ids(store.query("报")) == [4]
+    assert store.query("missing") == []
+
+
+def test_filters_by_priority_and_status(store):
+    assert ids(store.query(priority="High")) == [1, 4]
+    assert ids(store.query(status="done")) == [2]
+    assert ids(store.query(status="open")) == [1, 3, 4, 5]
+    # 截止日期早于今天且未完成；今天到期的不算逾期
+    assert ids(store.query(status="overdue", today=TODAY)) == [4]
+    assert ids(store.query("review", status="open")) == [4]
+
+
+def test_sorts_by_deadline_and_priority(store):
+    assert ids(store.query(sort="deadline")) == [2, 4, 5, 1, 3]
+    assert ids(store.query(sort="priority")) == [1, 4, 3, 2, 5]
+    assert ids(store.query(priority="Low", sort="deadline")) == [2, 5]
+
+
+def test_due_before_includes_the_day_itself(store):
+    assert ids(store.due_before(TODAY)) == [4, 5]
+    assert ids(store.open_by_deadline()) == [4, 5, 1]
+
+
+def test_update_reindexes_and_keeps_added_order(store):
+    store.update(1, {"text": "Draft summary", "deadline": "2026-02-01", "priority": "Low"})
+    assert ids(store.query("report")) == [4]
+    assert ids(store.query("summary")) == [1]
+    assert ids(store.query(priority="High")) == [4]
+    assert ids(store.query(sort="deadline"))[0] == 1
+    assert ids(store.query()) == [1, 2, 3, 4, 5]
+    store.update(2, {"done": 0})
+    assert 2 not in store.done_ids
+
+
+def test_remove_clears_every_index(store):
+    assert store.remove(4).text == "写报告 review report"
+    assert store.remove(4) is None
+    assert ids(store.query("报")) == []
+    assert ids(store.query("review")) == [2]
+    assert ids(store.query(priority="High")) == [1]
+    assert ids(store.query(sort="deadline")) == [2, 5, 1, 3]
+    assert len(store) == 4
+
+
+def brute_force(items, text="", priority=None, status="all"):
+    words = tokenize(text)
+    result = []
+    for task in items:
+        tokens = tokenize(task["text"])
+        for subtask in task["subtasks"]:
+            tokens |= tokenize(subtask)
+        if not all(any(token.startswith(word) for token in tokens) for word in words):
+            continue
+        if priority and task["priority"] != priority:
+            continue
+        if status == "open" and task["done"] or status == "done" and not task["done"]:
+            continue
+        result.append(task["id"])
+    return result
+
+
+@pytest.mark.parametrize("batch", [10, 500])  # remove_many 少量时逐条删除，大量时重建索引
+def test_indexes_match_a_linear_scan_after_edits(batch):
+    rng = random.Random(batch)
+    words = ["alpha", "beta", "gamma", "delta", "会议", "报告"]
+    items = [item(i, " ".join(rng.choices(words, k=3)), rng.choice(["", "2026-01-01", "2026-06-01"]),
+                  rng.choice(PRIORITIES), int(rng.random() < 0.3), rng.sample(words, rng.randrange(2)))
+             for i in range(1, 1001)]
+    store = TaskStore()
+    store.extend(items)
+    removed = set(rng.sample(range(1, 1001), batch))
+    store.remove_many(removed)
+    items = [task for task in items if task["id"] not in removed]
+    for task in rng.sample(items, 50):
+        task.update(text=rng.choice(words) + " edited", priority=rng.choice(PRIORITIES))
+        store.update(task["id"], {"text": task["text"], "priority": task["priority"]})
+
+    for text in ("", "al", "gamma be", "会", "edited"):
+        for priority in (None,) + PRIORITIES:
+            for status in ("all", "open", "done"):
+                assert ids(store.query(text, priority, status)) == brute_force(items, text, priority, status)
+    by_deadline = ids(store.query(sort="deadline"))
+    deadlines = [store.get(task_id).deadline or "~" for task_id in by_deadline]
+    assert deadlines == sorted(deadlines)
+
+
+def test_sorted_views_follow_edits():
+    rng = random.Random(7)
+    store = TaskStore()
+    store.extend(item(i, f"task {i}", rng.choice(["", "2026-01-01", "2026-02-01", "2026-03-01"]),
+                      rng.choice(PRIORITIES), int(rng.random() < 0.3)) for i in range(1, 201))
+
+    def check():
+        # 结果较多，走缓存的排序视图
+        for status in ("all", "open"):
+            records = [r for r in store.records.values() if status == "all" or not r.done]
+            by_deadline = sorted(records, key=lambda r: (not r.deadline, r.deadline, r.id if r.deadline else r.seq))
+            by_priority = sorted(records, key=lambda r: (PRIORITIES.index(r.priority), r.seq))
+            assert ids(store.query(sort="deadline", status=status)) == ids(by_deadline)
+            assert ids(store.query(sort="priority", status=status)) == ids(by_priority)
+            assert ids(store.query("task", sort="deadline", status=status)) == ids(by_deadline)
+
+    check()
+    store.add(item(500, "task new", "2026-01-15", "High"))
+    check()
+    store.update(3, {"deadline": "2025-12-31", "priority": "Low"})
+    check()
+    store.set_done(4, 1 - store.get(4).done)
+    check()
+    store.remove(5)
+    check()
+    store.remove_many(range(100, 180))
+    check()
+
+
+def test_format_task():
+    store = TaskStore()
+    record = store.add(item(1, "Plan", "", "Low", subtasks=["a", "b"]))
+    assert format_task(record) == "Plan | Due: N/A | Priority: Low | Subtasks: a, b"
+
+
+@pytest.fixture
+def tree():
+    # 1 ─┬─ 2 ── 4
+    #    └─ 3
+    # 5
+    store = TaskStore()
+    store.load([item(1, "Project"), {**item(2, "Design"), "parent": 1}, {**item(3, "Build", done=1), "parent": 1},
+                {**item(4, "Mockups report"), "parent": 2}, item(5, "Errand")])
+    return store
+
+
+def test_children_progress_and_descendants(tree):
+    assert ids(tree.children(1)) == [2, 3]
+    assert tree.has_children(2) and not tree.has_children(3)
+    assert tree.progress(1) == (1, 2)
+    assert tree.progress(5) is None
+    assert tree.descendants([1]) == [2, 4, 3]
+    assert tree.root_of(4) == 1
+
+    tree.set_done(2, 1)
+    assert tree.progress(1) == (2, 2)
+    tree.update(3, {"parent": 5})
+    assert tree.progress(1) == (1, 1)
+    assert tree.progress(5) == (1, 1)
+
+
+def test_roots_only_query(tree):
+    assert ids(tree.query(roots_only=True)) == [1, 5]
+    # 搜索词匹配到子任务时返回它所属的顶层任务
+    assert ids(tree.query("report", roots_only=True)) == [1]
+    assert ids(tree.query(status="open", roots_only=True)) == [1, 5]
+    tree.set_done(1, 1)
+    assert ids(tree.query(status="open", roots_only=True)) == [5]
+    assert ids(tree.query(status="done", sort="priority", roots_only=True)) == [1]
+
+
+def test_root_index_follows_edits(tree):
+    tree.update(5, {"parent": 4})
+    assert ids(tree.query(roots_only=True)) == [1]
+    tree.update(2, {"parent": None})
+    assert ids(tree.query(roots_only=True)) == [1, 2]
+    tree.add({**item(6, "Late child"), "parent": 1})
+    tree.add(item(7, "New root"))
+    assert ids(tree.query(roots_only=True)) == [1, 2, 7]
+
+
+def test_orphans_become_roots_in_added_order(tree):
+    # 其他实例只删除了父任务时，子任务按原来的位置显示为顶层任务
+    tree.remove(1)
+    assert ids(tree.query(roots_only=True)) == [2, 3, 5]
+    assert tree.root_of(4) == 2
+
+
+@pytest.mark.parametrize("count", [1, 100])  # remove_many 的两种路径
+def test_orphans_after_remove_many(count):
+    store = TaskStore()
+    store.extend([item(i, f"root {i}") for i in range(1, count + 1)])
+    store.add({**item(1000, "child"), "parent": 1})
+    store.remove_many(range(1, count + 1))
+    assert ids(store.query(roots_only=True)) == [1000]
+
+
+def test_child_loaded_before_parent():
+    store = TaskStore()
+    store.extend([{**item(2, "child"), "parent": 1}, item(3, "other")])
+    assert ids(store.query(roots_only=True)) == [2, 3]
+    store.extend([item(1, "parent")])
+    assert ids(store.query(roots_only=True)) == [3, 1]
+    assert store.progress(1) == (0, 1)
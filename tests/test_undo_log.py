@@ -0,0 +1,131 @@
+import pytest
+
+from undo_log import UndoLog, delta_size, id_runs, iter_run_ids
+
+
+def test_id_runs_compresses_consecutive_ids():
+    assert id_runs([5, 1, 2, 3, 3, 9, 10]) == [[1, 4], [5, 6], [9, 11]]
+    assert list(iter_run_ids(id_runs([7, 3, 4]))) == [3, 4, 7]
+    assert id_runs([]) == []
+
+
+class Flags:
+    """模拟 TaskService 执行 "done" 差异：设置完成状态，返回原来的状态"""
+
+    def __init__(self):
+        self.done = {}
+
+    def toggle(self, log, task_id):
+        previous = self.done.get(task_id, 0)
+        self.done[task_id] = 1 - previous
+        log.push(f"toggle {task_id}", ["done", [[task_id, previous]]])
+
+    def apply(self, delta):
+        inverse = [[task_id, self.done.get(task_id, 0)] for task_id, _ in delta[1]]
+        self.done.update(delta[1])
+        return ["done", inverse]
+
+
+def test_undo_redo_and_new_step_clears_redo():
+    log, flags = UndoLog(), Flags()
+    flags.toggle(log, 1)
+    flags.toggle(log, 2)
+    assert log.undo(flags.apply) == "toggle 2" and flags.done == {1: 1, 2: 0}
+    assert log.redo_label == "toggle 2"
+    assert log.redo(flags.apply) == "toggle 2" and flags.done == {1: 1, 2: 1}
+    log.undo(flags.apply)
+    flags.toggle(log, 3)
+    assert log.redo_label is None
+    assert log.redo(flags.apply) is None
+
+
+def test_failed_apply_keeps_both_stacks():
+    log = UndoLog()
+    log.push("step", ["done", [[1, 0]]])
+
+    def fail(delta):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        log.undo(fail)
+    assert log.undo_label == "step" and log.redo_label is None
+
+
+def test_oldest_steps_are_dropped_over_the_limit():
+    size = delta_size(["delete", [[1, 2]]])
+    log = UndoLog(limit=3 * size)
+    for i in range(5):
+        log.push(f"step {i}", ["delete", [[i, i + 1]]])
+    assert [label for label, _, _ in log.undo_stack] == ["step 2", "step 3", "step 4"]
+    assert log.size == 3 * size
+
+
+def test_history_survives_restart(tmp_path):
+    path = str(tmp_path / "tasks.json.undo")
+    log, flags = UndoLog(path=path), Flags()
+    for task_id in (1, 2, 3):
+        flags.toggle(log, task_id)
+    log.undo(flags.apply)
+    log.close()
+
+    reloaded = UndoLog(path=path)
+    assert [entry[:2] for entry in reloaded.undo_stack] == [entry[:2] for entry in log.undo_stack]
+    assert [entry[:2] for entry in reloaded.redo_stack] == [["toggle 3", ["done", [[3, 1]]]]]
+    assert reloaded.size == log.size
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "tasks.json.undo"
+    log = UndoLog(path=str(path))
+    log.push("kept", ["delete", [[1, 2]]])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "push", "label": "torn", "del')
+    log.close()
+    assert UndoLog(path=str(path)).undo_label == "kept"
+
+
+def test_file_is_rewritten_when_mostly_dead(tmp_path):
+    path = tmp_path / "tasks.json.undo"
+    log, flags = UndoLog(path=str(path)), Flags()
+    flags.toggle(log, 1)
+    for _ in range(200):
+        log.undo(flags.apply)
+        log.redo(flags.apply)
+    log.close()
+    assert len(path.read_text(encoding="utf-8").splitlines()) < 70
+    log = UndoLog(path=str(path))
+    assert log.undo_label == "toggle 1"
+    log.clear()
+    log.close()
+    assert UndoLog(path=str(path)).undo_label is None
+
+
+def test_concurrent_instances_keep_separate_files(tmp_path):
+    path = str(tmp_path / "tasks.json.undo")
+    first, second = UndoLog(path=path), UndoLog(path=path)
+    assert (first.path, second.path) == (path, path + ".1")
+    flags = Flags()
+    for task_id in range(1, 40):
+        flags.toggle(first, task_id)
+        flags.toggle(second, 100 + task_id)
+    second.undo(flags.apply)  # 交错写入，second 的重写不会丢掉 first 的步骤
+    first.close()
+    second.close()
+
+    first, second = UndoLog(path=path), UndoLog(path=path)
+    assert [entry[0] for entry in first.undo_stack] == [f"toggle {i}" for i in range(1, 40)]
+    assert second.undo_label == "toggle 138" and second.redo_label == "toggle 139"
+    first.close()
+    second.close()
+
+
+def test_closed_instance_releases_its_file(tmp_path):
+    path = str(tmp_path / "tasks.json.undo")
+    first = UndoLog(path=path)
+    first.push("kept", ["delete", [[1, 2]]])
+    first.close()
+    first.push("memory only", ["delete", [[2, 3]]])
+
+    second = UndoLog(path=path)
+    assert second.path == path and second.undo_label == "kept"
+    second.close()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+import pytest
+
+import update_manifest
+from update_manifest import (DeltaUnavailable, HashCache, build_from_blocks, changed_files, download_verified,
+                             fetch_manifest, file_sha256, file_url)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_hash_cache_reuses_digest_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"one")
+    cache = HashCache(str(tmp_path / "cache.json"))
+    assert cache.sha256(str(path)) == sha256(b"one")
+    cache.save()
+
+    calls = []
+    monkeypatch.setattr(update_manifest, "file_sha256", lambda p: calls.append(p) or file_sha256(p))
+    reloaded = HashCache(str(tmp_path / "cache.json"))
+    assert reloaded.sha256(str(path)) == sha256(b"one")
+    assert calls == []
+    path.write_bytes(b"changed")
+    assert reloaded.sha256(str(path)) == sha256(b"changed")
+    assert len(calls) == 1
+
+
+def test_hash_cache_ignores_corrupt_file(tmp_path):
+    (tmp_path / "cache.json").write_text("{broken", encoding="utf-8")
+    assert HashCache(str(tmp_path / "cache.json"))._entries == {}
+
+
+def test_changed_files_compares_size_and_hash(tmp_path):
+    (tmp_path / "same.py").write_bytes(b"same")
+    (tmp_path / "edited.py").write_bytes(b"old!")
+    manifest = {"files": {
+        "same.py": {"sha256": sha256(b"same"), "size": 4},
+        "edited.py": {"sha256": sha256(b"new!"), "size": 4},
+        "pkg/new.py": {"sha256": sha256(b"x"), "size": 1},
+        "updater.exe": {"sha256": sha256(b"y"), "size": 1},
+    }}
+    cache = HashCache(str(tmp_path / "cache.json"))
+    assert changed_files(manifest, str(tmp_path), cache, skip={"updater.exe"}) == ["edited.py", "pkg/new.py"]
+    assert os.path.exists(tmp_path / "cache.json")
+
+
+def test_file_url_prefers_entry_url():
+    manifest = {"base_url": "https://example.com/1.1.0/",
+                "files": {"a.py": {}, "b.exe": {"url": "https://cdn.example.com/b.exe"}}}
+    assert file_url(manifest, "a.py") == "https://example.com/1.1.0/a.py"
+    assert file_url(manifest, "b.exe") == "https://cdn.example.com/b.exe"
+    with pytest.raises(DeltaUnavailable):
+        file_url({"files": {"a.py": {}}}, "a.py")
+
+
+def test_fetch_manifest_from_release_assets(release_server):
+    release_server.files["manifest.json"] = b'{"version": "1.1.0", "files": {}}'
+    release = {"assets": [{"name": "manifest.json", "browser_download_url": release_server.url("manifest.json")}]}
+    assert fetch_manifest(release)["version"] == "1.1.0"
+    with pytest.raises(DeltaUnavailable):
+        fetch_manifest({"assets": []})
+
+
+def test_download_verified_replaces_only_on_matching_hash(tmp_path, release_server):
+    dest = tmp_path / "out" / "a.py"
+    release_server.files["a.py"] = b"new content"
+    progress = []
+    download_verified(release_server.url("a.py"), str(dest), sha256(b"new content"), progress.append)
+    assert dest.read_bytes() == b"new content"
+    assert sum(progress) == len(b"new content")
+
+    release_server.files["a.py"] = b"tampered"
+    with pytest.raises(DeltaUnavailable):
+        download_verified(release_server.url("a.py"), str(dest), sha256(b"newer"))
+    assert dest.read_bytes() == b"new content"
+    assert os.listdir(dest.parent) == ["a.py"]
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(update_manifest, "BLOCK_SIZE", 4)
+
+
+def block_entry(data):
+    return {"sha256": sha256(data), "size": len(data),
+            "blocks": [sha256(data[i:i + 4]) for i in range(0, len(data), 4)]}
+
+
+def test_build_from_blocks_downloads_only_changed_blocks(tmp_path, release_server, small_blocks):
+    old = tmp_path / "tool.exe"
+    old.write_bytes(b"aaaabbbbccccdd")
+    new = b"aaaaXXXXccccddee"
+    release_server.files["tool.exe"] = new
+    dest = tmp_path / "staged.exe"
+    progress = []
+    build_from_blocks(str(old), str(dest), block_entry(new), release_server.url("tool.exe"), progress.append)
+    assert dest.read_bytes() == new
+    assert [r for _, r in release_server.requests] == ["bytes=4-7", "bytes=12-15"]
+    assert progress == [4, 4]
+
+
+def test_build_from_blocks_rejects_bad_result(tmp_path, release_server, small_blocks):
+    old = tmp_path / "tool.exe"
+    old.write_bytes(b"aaaabbbb")
+    new = b"aaaaXXXX"
+    release_server.files["tool.exe"] = b"aaaaYYYY"
+    entry = block_entry(new)
+    with pytest.raises(DeltaUnavailable):
+        build_from_blocks(str(old), str(tmp_path / "staged.exe"), entry, release_server.url("tool.exe"))
+    assert not (tmp_path / "staged.exe").exists()
+
+
+def test_build_from_blocks_needs_block_list_and_local_file(tmp_path):
+    with pytest.raises(DeltaUnavailable):
+        build_from_blocks(str(tmp_path / "missing.exe"), str(tmp_path / "out"), block_entry(b"abcd"), "http://x/")
+    (tmp_path / "tool.exe").write_bytes(b"abcd")
+    with pytest.raises(DeltaUnavailable):
+        build_from_blocks(str(tmp_path / "tool.exe"), str(tmp_path / "out"), {"sha256": "", "size": 4}, "http://x/")
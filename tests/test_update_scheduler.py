@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("tkinter")
+
+from app_config import DEFAULTS
+from task_manager import UpdateScheduler
+
+INTERVAL = 3600
+
+
+def lowest(low, high):
+    return low
+
+
+def highest(low, high):
+    return high
+
+
+def scheduler(root, uniform):
+    config = dict(DEFAULTS, update_check_interval=INTERVAL, update_check_jitter=0.5)
+    return UpdateScheduler(root, config, lambda release: None, uniform=uniform)
+
+
+def checked(updates, root, ok):
+    """模拟定时器到期、后台检查完成；返回新安排的下一次检查的等待（秒）"""
+    root.jobs.pop(updates._job, None)
+    updates._on_checked((ok, None))
+    [(when, _)] = root.jobs.values()
+    return when / 1000
+
+
+def test_backoff_doubles_up_to_interval_and_resets(fake_root):
+    updates = scheduler(fake_root, lowest)
+    delays = [checked(updates, fake_root, False) for _ in range(8)]
+    assert delays == [60, 120, 240, 480, 960, 1920, INTERVAL, INTERVAL]
+
+    assert checked(updates, fake_root, True) == INTERVAL * 0.5
+    assert updates.failures == 0
+    updates.stop()
+    assert fake_root.jobs == {}
+
+
+def test_jitter_bounds(fake_root):
+    updates = scheduler(fake_root, highest)
+    assert updates.next_delay() == INTERVAL * 1.5
+    updates.failures = 1
+    assert updates.next_delay() == 60 * 1.5  # 重试只会向后抖动，不会早于退避时间
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+import update_staging
+from update_manifest import DeltaUnavailable
+from update_staging import UpdateStager
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def app_dir(tmp_path):
+    (tmp_path / "task_manager.py").write_bytes(b"old main")
+    (tmp_path / "task_io.py").write_bytes(b"old io")
+    return tmp_path
+
+
+def stage(stager, server, version, files):
+    """把 files（相对路径 -> 内容）放到假服务器上并下载到暂存目录"""
+    for relative_path, data in files.items():
+        server.files[relative_path] = data
+        stager.download(version, relative_path, server.url(relative_path), sha256(data))
+
+
+def test_install_replaces_files_and_keeps_backup(app_dir, release_server):
+    stager = UpdateStager(str(app_dir))
+    stage(stager, release_server, "1.1.0", {"task_manager.py": b"new main", "lib/extra.py": b"added"})
+    name = stager.install("1.1.0", ["task_manager.py", "lib/extra.py"], previous_version="1.0.0")
+
+    assert read(app_dir / "task_manager.py") == b"new main"
+    assert read(app_dir / "lib" / "extra.py") == b"added"
+    assert read(app_dir / "task_io.py") == b"old io"
+    assert not os.path.exists(stager.journal_path)
+    assert not os.path.exists(stager.staging_dir("1.1.0"))
+    [(backup, info)] = stager.backups()
+    assert backup == name
+    assert info["replaced"] == ["task_manager.py"] and info["added"] == ["lib/extra.py"]
+    assert info["previous_version"] == "1.0.0"
+
+
+def test_rollback_restores_previous_files(app_dir, release_server):
+    stager = UpdateStager(str(app_dir))
+    stage(stager, release_server, "1.1.0", {"task_manager.py": b"new main", "lib/extra.py": b"added"})
+    stager.install("1.1.0", ["task_manager.py", "lib/extra.py"], previous_version="1.0.0")
+
+    assert stager.rollback() == "1.0.0"
+    assert read(app_dir / "task_manager.py") == b"old main"
+    assert not (app_dir / "lib" / "extra.py").exists()
+    assert stager.backups() == []
+    with pytest.raises(FileNotFoundError):
+        stager.rollback()
+
+
+def test_hash_mismatch_is_not_staged(app_dir, release_server):
+    stager = UpdateStager(str(app_dir))
+    release_server.files["task_manager.py"] = b"tampered"
+    with pytest.raises(DeltaUnavailable):
+        stager.download("1.1.0", "task_manager.py", release_server.url("task_manager.py"), sha256(b"new main"))
+    assert not os.path.exists(stager.staging_path("1.1.0", "task_manager.py"))
+    with pytest.raises(FileNotFoundError):
+        stager.install("1.1.0", ["task_manager.py"])
+    assert read(app_dir / "task_manager.py") == b"old main"
+    assert stager.backups() == []
+
+
+def test_download_skips_file_already_staged(app_dir, release_server):
+    stager = UpdateStager(str(app_dir))
+    stage(stager, release_server, "1.1.0", {"task_manager.py": b"new main"})
+    reported = []
+    stager.download("1.1.0", "task_manager.py", release_server.url("task_manager.py"), sha256(b"new main"),
+                    reported.append)
+    assert len(release_server.requests) == 1
+    assert reported == [len(b"new main")]
+
+
+def test_failed_install_rolls_back(app_dir, release_server, monkeypatch):
+    stager = UpdateStager(str(app_dir))
+    stage(stager, release_server, "1.1.0", {"task_manager.py": b"new main", "task_io.py": b"new io"})
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if os.path.basename(dst) == "task_io.py" and "backups" not in src:
+            raise OSError("file in use")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(update_staging.os, "replace", replace)
+    with pytest.raises(OSError):
+        stager.install("1.1.0", ["task_manager.py", "task_io.py"])
+    assert read(app_dir / "task_manager.py") == b"old main"
+    assert read(app_dir / "task_io.py") == b"old io"
+    assert not os.path.exists(stager.journal_path)
+    assert stager.backups() == []
+
+
+def test_recover_rolls_back_interrupted_install(app_dir, release_server, monkeypatch):
+    stager = UpdateStager(str(app_dir))
+    stage(stager, release_server, "1.1.0", {"task_manager.py": b"new main", "task_io.py": b"new io"})
+    real_replace = os.replace
+
+    def crash(src, dst):
+        if os.path.basename(dst) == "task_io.py":
+            raise KeyboardInterrupt  # 模拟进程在两个文件之间退出，不会执行 install 里的回滚
+        real_replace(src, dst)
+
+    monkeypatch.setattr(update_staging.os, "replace", crash)
+    with pytest.raises(KeyboardInterrupt):
+        stager.install("1.1.0", ["task_manager.py", "task_io.py"])
+    monkeypatch.undo()
+    assert read(app_dir / "task_manager.py") == b"new main"
+
+    restarted = UpdateStager(str(app_dir))
+    assert restarted.recover() is True
+    assert read(app_dir / "task_manager.py") == b"old main"
+    assert read(app_dir / "task_io.py") == b"old io"
+    assert restarted.recover() is False
+
+
+def test_recover_ignores_broken_journal(app_dir):
+    stager = UpdateStager(str(app_dir))
+    os.makedirs(stager.state_dir)
+    with open(stager.journal_path, "w", encoding="utf-8") as f:
+        json.dump({"backup": "missing"}, f)
+    assert stager.recover() is False
+    assert not os.path.exists(stager.journal_path)
+
+
+def test_keeps_only_recent_backups(app_dir, release_server):
+    stager = UpdateStager(str(app_dir), keep=2)
+    for i in range(4):
+        stage(stager, release_server, f"1.{i}", {"task_manager.py": f"main {i}".encode()})
+        stager.install(f"1.{i}", ["task_manager.py"], previous_version=f"1.{i - 1}")
+    assert [info["version"] for _, info in stager.backups()] == ["1.2", "1.3"]
+
+
+@pytest.mark.parametrize("path", ["../outside.py", "/etc/passwd", "a/../../outside.py"])
+def test_rejects_paths_outside_the_program_directory(app_dir, path):
+    stager = UpdateStager(str(app_dir))
+    with pytest.raises(ValueError):
+        stager.staging_path("1.1.0", path)
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+pytest.importorskip("tkinter")  # updater.py 是图形界面程序
+import updater
+from updater import RangeDownloader
+
+BLOCK = 1024
+DATA = bytes(range(256)) * 64  # 16 KiB，分成 4 段，每段 4 块
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(updater, "BLOCK_SIZE", BLOCK)
+    monkeypatch.setattr(updater, "CHUNK_SIZE", 256)
+    monkeypatch.setattr(updater, "PROGRESS_INTERVAL", 0.01)
+
+
+def blocks(data):
+    return [hashlib.sha256(data[i:i + BLOCK]).hexdigest() for i in range(0, len(data), BLOCK)]
+
+
+@pytest.fixture
+def asset(release_server):
+    release_server.files["tool.exe"] = DATA
+    release_server.etags["tool.exe"] = '"v1"'
+    release_server.redirect = True
+    return release_server.url("tool.exe")
+
+
+def ranges_requested(server):
+    return [header for _, header in server.requests]
+
+
+def test_interrupted_download_resumes_from_verified_blocks(tmp_path, release_server, asset):
+    dest = str(tmp_path / "tool.exe")
+    release_server.cut_after = 1500
+    with pytest.raises(Exception):
+        RangeDownloader(asset, dest, blocks=blocks(DATA)).run()
+    with open(dest + ".state", encoding="utf-8") as f:
+        state = json.load(f)
+    # 按原始地址记录，而不是每次都不同的签名地址
+    assert state["url"] == asset and state["etag"] == '"v1"'
+
+    release_server.cut_after = None
+    release_server.requests.clear()
+    downloader = RangeDownloader(asset, dest, blocks=blocks(DATA))
+    downloader.run()
+    # 每段已收到 1500 字节，只有前 1024 字节（完整的一块）保留下来
+    assert sorted(ranges_requested(release_server)) == [
+        "bytes=1024-4095", "bytes=13312-16383", "bytes=5120-8191", "bytes=9216-12287"]
+    downloader.verify(hashlib.sha256(DATA).hexdigest(), len(DATA))
+    assert open(dest, "rb").read() == DATA
+    assert not os.path.exists(dest + ".state")
+
+
+def test_changed_etag_restarts_the_download(tmp_path, release_server, asset):
+    dest = str(tmp_path / "tool.exe")
+    release_server.cut_after = 1500
+    with pytest.raises(Exception):
+        RangeDownloader(asset, dest, blocks=blocks(DATA)).run()
+
+    new = DATA[::-1]
+    release_server.files["tool.exe"] = new
+    release_server.etags["tool.exe"] = '"v2"'
+    release_server.cut_after = None
+    release_server.requests.clear()
+    RangeDownloader(asset, dest, blocks=blocks(new)).run()
+    assert sorted(ranges_requested(release_server)) == [
+        "bytes=0-4095", "bytes=12288-16383", "bytes=4096-8191", "bytes=8192-12287"]
+    assert open(dest, "rb").read() == new
+
+
+def test_server_without_ranges_uses_a_single_stream(tmp_path, release_server, asset):
+    release_server.ranges = False
+    dest = str(tmp_path / "tool.exe")
+    downloader = RangeDownloader(asset, dest, blocks=blocks(DATA))
+    downloader.run()
+    assert ranges_requested(release_server) == [None]
+    downloader.verify(hashlib.sha256(DATA).hexdigest(), len(DATA))
+    assert open(dest, "rb").read() == DATA
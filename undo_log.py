@@ -0,0 +1,176 @@
+"""撤销/重做记录
+
+每一步只保存把修改反过来所需的最小差异（inverse delta），而不是整个任务列表：
+
+    ["delete", [[起始 id, 结束 id（不含）], ...]]   撤销添加、导入：按 id 区间删除
+    ["done", [[id, 原来的 done], ...]]             撤销勾选
+    ["restore", [任务 dict, ...]]                  撤销删除：按原来的 id 重新加入
+
+差异由 TaskService 生成和执行，执行时返回反方向的差异放到另一个栈上。两个栈的
+估算总大小超过 limit 时从最旧的一步开始丢弃。
+
+指定 path 时，每一步以 JSON 行追加到该文件（不 fsync，不影响任务数据的保存），
+启动时重放即可恢复撤销历史；行数远多于剩余步数时整体重写一次。
+同时运行的多个实例各自锁住一个文件（path、path.1、path.2……），互不覆盖。
+"""
+import json
+import os
+from collections import deque
+
+from task_storage import FileLock, atomic_write
+
+UNDO_SUFFIX = ".undo"
+DEFAULT_LIMIT = 16 * 1024 * 1024
+MAX_FILES = 8  # 同时运行的实例更多时，多出的实例只在内存中保留撤销历史
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def id_runs(ids):
+    """把 id 列表压缩为 [[起始, 结束（不含）], ...]，批量导入的连续 id 只占一项"""
+    runs = []
+    for task_id in sorted(set(ids)):
+        if runs and runs[-1][1] == task_id:
+            runs[-1][1] = task_id + 1
+        else:
+            runs.append([task_id, task_id + 1])
+    return runs
+
+
+def iter_run_ids(runs):
+    for start, stop in runs:
+        yield from range(start, stop)
+
+
+def delta_size(delta):
+    """估算一步差异占用的内存（字节），不需要精确"""
+    kind, payload = delta
+    if kind == "restore":
+        return 64 + sum(200 + len(item.get("text", "")) for item in payload)
+    return 64 + 80 * len(payload)
+
+
+class UndoLog:
+    def __init__(self, limit=DEFAULT_LIMIT, path=None):
+        self.limit = limit
+        self.undo_stack = deque()  # [说明, 差异, 估算大小]，右端是最近的一步
+        self.redo_stack = deque()
+        self.size = 0
+        self._lines = 0
+        self._lock = None
+        self.path = self._claim(path) if path is not None else None
+        if self.path is not None and os.path.exists(self.path):
+            self._load()
+
+    def _claim(self, path):
+        """依次尝试 path、path.1……，返回第一个没有被其他实例锁住的文件，锁一直持有到 close()"""
+        for n in range(MAX_FILES):
+            candidate = f"{path}.{n}" if n else path
+            lock = FileLock(candidate + ".lock")
+            if lock.acquire(blocking=False):
+                self._lock = lock
+                return candidate
+            lock.close()
+        return None
+
+    @property
+    def undo_label(self):
+        return self.undo_stack[-1][0] if self.undo_stack else None
+
+    @property
+    def redo_label(self):
+        return self.redo_stack[-1][0] if self.redo_stack else None
+
+    def push(self, label, delta):
+        """记录一步新的修改，清空重做栈"""
+        self._push(label, delta)
+        self._append({"op": "push", "label": label, "delta": delta})
+
+    def _push(self, label, delta):
+        self.size -= sum(entry[2] for entry in self.redo_stack)
+        self.redo_stack.clear()
+        self._add(self.undo_stack, label, delta)
+
+    def _add(self, stack, label, delta):
+        size = delta_size(delta)
+        stack.append([label, delta, size])
+        self.size += size
+        # 从最旧的一步开始丢弃，撤销栈的底部比重做栈的底部更旧
+        while self.size > self.limit:
+            oldest = (self.undo_stack or self.redo_stack).popleft()
+            self.size -= oldest[2]
+
+    def undo(self, apply):
+        """用 apply(差异) 执行撤销，apply 返回反方向的差异；返回撤销的说明，没有可撤销的步骤时返回 None"""
+        return self._move(self.undo_stack, self.redo_stack, apply, "undo")
+
+    def redo(self, apply):
+        return self._move(self.redo_stack, self.undo_stack, apply, "redo")
+
+    def _move(self, source, target, apply, op):
+        if not source:
+            return None
+        label, delta, size = source[-1]
+        inverse = apply(delta)  # 失败时两个栈保持不变
+        source.pop()
+        self.size -= size
+        self._add(target, label, inverse)
+        self._append({"op": op, "delta": inverse})
+        return label
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+        if self.path is not None:
+            self._rewrite()
+
+    def _replay(self, record):
+        op = record["op"]
+        if op == "push":
+            self._push(record["label"], record["delta"])
+        elif op == "entry":
+            self._add(self.undo_stack if record["stack"] == "undo" else self.redo_stack,
+                      record["label"], record["delta"])
+        else:
+            source, target = ((self.undo_stack, self.redo_stack) if op == "undo"
+                              else (self.redo_stack, self.undo_stack))
+            if source:
+                label, _, size = source.pop()
+                self.size -= size
+                self._add(target, label, record["delta"])
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # 崩溃时写了一半的最后一行
+                self._replay(record)
+                self._lines += 1
+
+    def _append(self, record):
+        if self.path is None:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(_ENCODER.encode(record) + "\n")
+        self._lines += 1
+        if self._lines > 2 * (len(self.undo_stack) + len(self.redo_stack)) + 64:
+            self._rewrite()
+
+    def _rewrite(self):
+        """只写入剩余的步骤，丢掉已被淘汰和相互抵消的记录"""
+        records = [{"op": "entry", "stack": name, "label": label, "delta": delta}
+                   for name, stack in (("undo", self.undo_stack), ("redo", self.redo_stack))
+                   for label, delta, _ in stack]
+        atomic_write(self.path, lambda f: f.write("".join(_ENCODER.encode(r) + "\n" for r in records)))
+        self._lines = len(records)
+
+    def close(self):
+        """释放文件锁，之后的步骤只保留在内存中"""
+        if self._lock is not None:
+            self._lock.release()
+            self._lock.close()
+            self._lock = None
+        self.path = None
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+
+from release_cache import REQUEST_TIMEOUT, get_session
+from task_storage import atomic_write
+
+MANIFEST_NAME = "manifest.json"
+HASH_CACHE_FILE = ".hash_cache.json"
+CHUNK_SIZE = 1024 * 1024
+BLOCK_SIZE = 1024 * 1024  # 二进制差量的块大小，需与生成清单时一致
+
+# 发布清单格式:
+# {
+#   "version": "1.1.0",
+#   "base_url": "https://github.com/G-Est/test_tool/releases/download/1.1.0/",  # build.py --base-url，构建产物发布的位置
+#   "files": {
+#     "task_manager.py": {"sha256": "...", "size": 1234},
+#     "task_manager.exe": {"sha256": "...", "size": 5678, "url": "...", "blocks": ["<每块的sha256>", ...]}
+#   }
+# }
+
+
+class DeltaUnavailable(Exception):
+    """无法进行差量更新，调用方应回退到完整更新包"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """本地文件哈希缓存，mtime 和大小都没变时直接返回上次的结果"""
+
+    def __init__(self, path=HASH_CACHE_FILE):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except ValueError:
+                self._entries = {}
+
+    def sha256(self, path):
+        st = os.stat(path)
+        key = os.path.normpath(path)
+        cached = self._entries.get(key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        digest = file_sha256(path)
+        self._entries[key] = [st.st_mtime_ns, st.st_size, digest]
+        self._dirty = True
+        return digest
+
+    def save(self):
+        if self._dirty:
+            atomic_write(self.path, lambda f: json.dump(self._entries, f))
+            self._dirty = False
+
+
+def find_manifest_url(release_info):
+    for asset in release_info.get("assets", []):
+        if asset["name"] == MANIFEST_NAME:
+            return asset["browser_download_url"]
+    return None
+
+
+def fetch_manifest(release_info):
+    url = find_manifest_url(release_info)
+    if url is None:
+        raise DeltaUnavailable("release has no manifest")
+    response = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def file_url(manifest, relative_path):
+    entry = manifest["files"][relative_path]
+    if "url" in entry:
+        return entry["url"]
+    if "base_url" not in manifest:
+        raise DeltaUnavailable(f"no download url for {relative_path}")
+    return manifest["base_url"] + relative_path
+
+
+def changed_files(manifest, root=".", cache=None, skip=()):
+    """返回与本地不同的文件列表（相对路径）"""
+    cache = cache or HashCache()
+    changed = []
+    for relative_path, entry in manifest["files"].items():
+        if relative_path in skip:
+            continue
+        local = os.path.join(root, *relative_path.split("/"))
+        if (not os.path.isfile(local) or os.path.getsize(local) != entry["size"]
+                or cache.sha256(local) != entry["sha256"]):
+            changed.append(relative_path)
+    cache.save()
+    return changed
+
+
+def download_verified(url, dest, expected_sha256, progress=None):
+    """边下载边计算 SHA-256，校验通过后才原子替换目标文件"""
+    digest = hashlib.sha256()
+
+    def write(f):
+        with get_session().get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                if progress:
+                    progress(len(chunk))
+        if digest.hexdigest() != expected_sha256:
+            raise DeltaUnavailable(f"hash mismatch for {url}")
+
+    if os.path.dirname(dest):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+    atomic_write(dest, write, binary=True)
+
+
+def build_from_blocks(local_path, dest, entry, url, progress=None):
+    """按块比较本地旧文件，相同的块直接复用，只用 Range 请求下载不同的块"""
+    blocks = entry.get("blocks")
+    if not blocks or not os.path.isfile(local_path):
+        raise DeltaUnavailable("no block list for binary delta")
+
+    digest = hashlib.sha256()
+    with open(local_path, "rb") as old, open(dest, "wb") as out:
+        for index, block_hash in enumerate(blocks):
+            start = index * BLOCK_SIZE
+            end = min(start + BLOCK_SIZE, entry["size"]) - 1
+            old.seek(start)
+            data = old.read(end - start + 1)
+            if hashlib.sha256(data).hexdigest() != block_hash:
+                response = get_session().get(url, headers={"Range": f"bytes={start}-{end}"},
+                                            timeout=REQUEST_TIMEOUT)
+                if response.status_code != 206:
+                    raise DeltaUnavailable("server does not support range requests")
+                data = response.content
+                if progress:
+                    progress(len(data))
+            out.write(data)
+            digest.update(data)
+
+    if digest.hexdigest() != entry["sha256"]:
+        os.remove(dest)
+        raise DeltaUnavailable("patched file hash mismatch")
@@ -0,0 +1,168 @@
+"""分阶段安装更新：先下载到按版本划分的暂存目录，全部校验通过后再替换，并保留旧文件用于回滚
+
+    .update/
+        staging/<版本>/...        下载中的文件，全部就绪后才会安装
+        backups/<时间>/backup.json 本次安装替换和新增了哪些文件
+        backups/<时间>/files/...   被替换前的旧文件，最多保留 keep 份
+        installing.json            安装进行中的标记，中途崩溃后由 recover() 回滚
+
+每个文件都用 os.replace 原子替换；安装前先备份全部旧文件，任何一步失败都会
+恢复到安装前的状态。
+"""
+import json
+import os
+import shutil
+import time
+
+from task_storage import atomic_write
+
+UPDATE_DIR = ".update"
+KEEP_VERSIONS = 3
+
+
+def is_safe_path(relative_path):
+    """发布清单或压缩包中的路径不能指向程序目录之外"""
+    dest = os.path.normpath(relative_path)
+    return not (os.path.isabs(dest) or dest == ".." or dest.startswith(".." + os.sep))
+
+
+class UpdateStager:
+    def __init__(self, root=".", state_dir=UPDATE_DIR, keep=KEEP_VERSIONS):
+        self.root = root
+        self.state_dir = os.path.join(root, state_dir)
+        self.keep = keep
+        self.journal_path = os.path.join(self.state_dir, "installing.json")
+
+    def _target(self, relative_path):
+        if not is_safe_path(relative_path):
+            raise ValueError(f"unsafe path in update: {relative_path}")
+        return os.path.join(self.root, *relative_path.split("/"))
+
+    def staging_dir(self, version):
+        return os.path.join(self.state_dir, "staging", version)
+
+    def staging_path(self, version, relative_path):
+        """返回暂存文件路径，并创建所在目录"""
+        if not is_safe_path(relative_path):
+            raise ValueError(f"unsafe path in update: {relative_path}")
+        path = os.path.join(self.staging_dir(version), *relative_path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def download(self, version, relative_path, url, expected_sha256, progress=None):
+        """下载到暂存目录，边下载边校验；已暂存且哈希一致的文件不再下载"""
+        from update_manifest import download_verified, file_sha256
+        path = self.staging_path(version, relative_path)
+        if os.path.isfile(path) and file_sha256(path) == expected_sha256:
+            if progress:
+                progress(os.path.getsize(path))
+            return path
+        download_verified(url, path, expected_sha256, progress)
+        return path
+
+    def install(self, version, files, previous_version=None):
+        """把暂存目录中的 files（相对路径）安装到程序目录，失败时回滚并重新抛出异常"""
+        for relative_path in files:
+            if not os.path.isfile(os.path.join(self.staging_dir(version), *relative_path.split("/"))):
+                raise FileNotFoundError(f"{relative_path} is not staged for {version}")
+        name = time.strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(os.path.join(self.state_dir, "backups", name)):
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+        backup_dir = os.path.join(self.state_dir, "backups", name)
+
+        # 先备份全部旧文件，再开始替换
+        replaced, added = [], []
+        try:
+            os.makedirs(backup_dir)
+            for relative_path in files:
+                target = self._target(relative_path)
+                if os.path.isfile(target):
+                    saved = os.path.join(backup_dir, "files", *relative_path.split("/"))
+                    os.makedirs(os.path.dirname(saved), exist_ok=True)
+                    shutil.copy2(target, saved)
+                    replaced.append(relative_path)
+                else:
+                    added.append(relative_path)
+            info = {"version": version, "previous_version": previous_version,
+                    "installed_at": time.time(), "replaced": replaced, "added": added}
+            atomic_write(os.path.join(backup_dir, "backup.json"), lambda f: json.dump(info, f))
+            atomic_write(self.journal_path, lambda f: json.dump({"backup": name}, f))
+        except Exception:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+            raise
+
+        try:
+            for relative_path in files:
+                staged = os.path.join(self.staging_dir(version), *relative_path.split("/"))
+                target = self._target(relative_path)
+                if os.path.dirname(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                if os.path.exists(target):
+                    shutil.copymode(target, staged)
+                os.replace(staged, target)
+        except Exception:
+            self.rollback(name)
+            raise
+        os.remove(self.journal_path)
+        shutil.rmtree(self.staging_dir(version), ignore_errors=True)
+        self._prune()
+        return name
+
+    def backups(self):
+        """已保存的备份，按安装时间从旧到新排列，返回 [(名称, backup.json 内容)]"""
+        root = os.path.join(self.state_dir, "backups")
+        if not os.path.isdir(root):
+            return []
+        result = []
+        for name in os.listdir(root):
+            try:
+                with open(os.path.join(root, name, "backup.json"), "r", encoding="utf-8") as f:
+                    result.append((name, json.load(f)))
+            except (OSError, ValueError):
+                continue
+        result.sort(key=lambda item: item[1]["installed_at"])
+        return result
+
+    def rollback(self, name=None):
+        """恢复到某次安装之前的状态（默认最近一次），返回那次安装前的版本号"""
+        backups = dict(self.backups())
+        if name is None:
+            if not backups:
+                raise FileNotFoundError("no previous version to roll back to")
+            name = list(backups)[-1]
+        info = backups[name]
+        backup_dir = os.path.join(self.state_dir, "backups", name)
+        for relative_path in info["replaced"]:
+            saved = os.path.join(backup_dir, "files", *relative_path.split("/"))
+            if os.path.isfile(saved):
+                os.replace(saved, self._target(relative_path))
+        for relative_path in info["added"]:
+            target = self._target(relative_path)
+            if os.path.isfile(target):
+                os.remove(target)
+        shutil.rmtree(backup_dir)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        return info["previous_version"]
+
+    def recover(self):
+        """上次安装中途退出时回滚，返回是否进行了回滚"""
+        if not os.path.exists(self.journal_path):
+            return False
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                name = json.load(f)["backup"]
+        except (OSError, ValueError, KeyError):
+            os.remove(self.journal_path)
+            return False
+        if name not in dict(self.backups()):
+            os.remove(self.journal_path)
+            return False
+        self.rollback(name)
+        return True
+
+    def _prune(self):
+        for name, _ in self.backups()[:-self.keep or None]:
+            shutil.rmtree(os.path.join(self.state_dir, "backups", name), ignore_errors=True)
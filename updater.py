@@ -1,14 +1,193 @@
+import hashlib
+import json
 import os
 import requests
-import shutil
 import subprocess
+import sys
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk
+from app_config import load_config
+from release_cache import REQUEST_TIMEOUT, ReleaseCache, get_session
+from update_manifest import BLOCK_SIZE, DeltaUnavailable, HashCache, build_from_blocks, fetch_manifest
+from update_staging import UpdateStager
 
 # ▼ GitHubの設定を変えてね ▼
 GITHUB_API = "https://api.github.com/repos/G-Est/test_tool/releases/latest"
 TOOL_NAME = "task_manager.exe"
-TEMP_FILE = "tool_updater.exe"
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_PARTS = 4        # 并行下载的分段数，1 为单连接
+PROGRESS_INTERVAL = 0.1   # 进度条最短刷新间隔（秒）
+
+
+class RangeDownloader:
+    """支持断点续传和多段并行的下载器
+
+    有清单中的分块哈希（blocks）且服务器支持 Range 时，把文件按块边界分成若干段并行下载，
+    每块写完立即与清单比较，不需要下载后再读一遍文件。每段的进度记录在 <文件名>.state 中，
+    中断后再次调用 run() 从已下载的位置继续（回退到块边界，只重新下载不完整的那一块）。
+    进度按原始的下载地址、文件大小和 ETag 记录：GitHub 重定向后的签名地址每次都不同，
+    不能用来判断是否是同一个文件。
+
+    只有整个文件的哈希时用单连接顺序下载，边下载边计算哈希。
+    """
+
+    def __init__(self, url, filename, parts=DOWNLOAD_PARTS, blocks=None):
+        self.url = url
+        self.download_url = url  # 重定向后的实际地址，只用于本次下载
+        self.etag = None
+        self.filename = filename
+        self.state_file = filename + ".state"
+        self.parts = parts
+        self.blocks = blocks
+        self.total = 0
+        self.ranges = []  # [起始, 结束(含), 已写入字节数]，起始都在块边界上
+        self._lock = threading.Lock()
+        self._error = None
+        self.sha256 = None  # 单连接下载时边下载边计算的哈希
+        self.blocks_verified = False
+
+    @property
+    def downloaded(self):
+        with self._lock:
+            return sum(written for _, _, written in self.ranges)
+
+    def _load_state(self):
+        if not (os.path.exists(self.state_file) and os.path.exists(self.filename)):
+            return False
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except ValueError:
+            return False
+        if (state.get("url") != self.url or state.get("total") != self.total
+                or state.get("etag") != self.etag):
+            return False
+        ranges = state["ranges"]
+        if any(start % BLOCK_SIZE for start, _, _ in ranges):
+            return False
+        for r in ranges:
+            if r[0] + r[2] <= r[1]:
+                # 不完整的块没有校验过，从它的开头重新下载
+                r[2] -= r[2] % BLOCK_SIZE
+        self.ranges = ranges
+        return True
+
+    def _save_state(self):
+        with self._lock:
+            state = {"url": self.url, "total": self.total, "etag": self.etag,
+                     "ranges": [list(r) for r in self.ranges]}
+        with open(self.state_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def _fetch_range(self, index):
+        start, end, written = self.ranges[index]
+        if start + written > end:
+            return
+        try:
+            headers = {"Range": f"bytes={start + written}-{end}"}
+            with get_session().get(self.download_url, headers=headers, stream=True,
+                                   timeout=REQUEST_TIMEOUT) as response:
+                if response.status_code != 206:
+                    raise Exception("Server does not support resuming downloads")
+                position = start + written
+                digest = hashlib.sha256()
+                with open(self.filename, "r+b") as f:
+                    f.seek(position)
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        # 写入文件后才计入进度，.state 中不会记录还留在缓冲区里的数据
+                        f.flush()
+                        view = memoryview(chunk)
+                        while view:
+                            block = position // BLOCK_SIZE
+                            block_end = min((block + 1) * BLOCK_SIZE, self.total)
+                            piece = view[:block_end - position]
+                            digest.update(piece)
+                            position += len(piece)
+                            view = view[len(piece):]
+                            if position == block_end:
+                                if digest.hexdigest() != self.blocks[block]:
+                                    with self._lock:
+                                        self.ranges[index][2] = block * BLOCK_SIZE - start
+                                    raise Exception(f"Block {block} is corrupted (hash mismatch)")
+                                digest = hashlib.sha256()
+                        with self._lock:
+                            self.ranges[index][2] += len(chunk)
+        except Exception as e:
+            self._error = e
+
+    def _fetch_whole(self, on_tick):
+        with get_session().get(self.download_url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            self.total = int(response.headers.get("content-length", 0))
+            self.ranges = [[0, max(self.total - 1, 0), 0]]
+            digest = hashlib.sha256()
+            with open(self.filename, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    self.ranges[0][2] += len(chunk)
+                    on_tick()
+            self.sha256 = digest.hexdigest()
+
+    def run(self, on_tick=lambda: None):
+        """下载到 filename，期间按固定间隔调用 on_tick 刷新界面"""
+        head = get_session().head(self.url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+        head.raise_for_status()
+        self.download_url = head.url
+        self.etag = head.headers.get("etag")
+        self.total = int(head.headers.get("content-length", 0))
+        if not self.blocks or not self.total or head.headers.get("accept-ranges", "").lower() != "bytes":
+            self._fetch_whole(on_tick)
+            return
+        if len(self.blocks) != -(-self.total // BLOCK_SIZE):
+            raise Exception(f"Download size {self.total} does not match the manifest")
+
+        if not self._load_state():
+            size = -(-self.total // self.parts)
+            size = -(-size // BLOCK_SIZE) * BLOCK_SIZE
+            self.ranges = [[start, min(start + size, self.total) - 1, 0] for start in range(0, self.total, size)]
+            with open(self.filename, "wb") as f:
+                f.truncate(self.total)
+            self._save_state()
+
+        self._error = None
+        threads = [threading.Thread(target=self._fetch_range, args=(i,), daemon=True) for i in range(len(self.ranges))]
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            time.sleep(PROGRESS_INTERVAL)
+            self._save_state()
+            on_tick()
+        self._save_state()
+        if self._error is not None:
+            raise self._error
+        if any(start + written <= end for start, end, written in self.ranges):
+            raise Exception("Download ended early, retry to continue")
+        self.blocks_verified = True
+        os.remove(self.state_file)
+
+    def verify(self, expected_sha256, expected_size=None):
+        """替换前确认文件大小和哈希，哈希都是下载时计算好的，这里不再读文件"""
+        if not expected_sha256:
+            raise Exception("No SHA-256 to verify the download against")
+        size = os.path.getsize(self.filename)
+        if expected_size and size != expected_size:
+            raise Exception(f"Downloaded size {size} does not match expected {expected_size}")
+        if self.blocks_verified:
+            return
+        if self.sha256 != expected_sha256:
+            os.remove(self.filename)
+            raise Exception("Downloaded file is corrupted (hash mismatch)")
+
+
+def asset_sha256(asset):
+    """GitHub 资源的 digest 字段，格式为 "sha256:<十六进制>"；没有时返回 None"""
+    algorithm, _, value = (asset.get("digest") or "").partition(":")
+    return value.lower() if algorithm == "sha256" and value else None
+
 
 class UpdaterApp:
     def __init__(self, root):
@@ -29,15 +208,26 @@ class UpdaterApp:
         self.ok_btn.pack(side="right", padx=10, pady=10)
         self.retry_btn.pack(side="right", pady=10)
 
+        self._last_refresh = 0
+        self.stager = UpdateStager(keep=load_config()["update_keep_versions"])
+
         self.root.after(100, self.start_update)
 
     def start_update(self):
         try:
-            download_url = self.get_github_asset_url()
-            self.label.config(text="Downloading latest version...")
-            self.download_file(download_url, TEMP_FILE)
-            self.replace_file()
-            self.label.config(text="Update completed successfully!")
+            if self.stager.recover():
+                self.label.config(text="Rolled back an interrupted update.")
+            release_info = self.get_release_info()
+            asset = self.get_github_asset(release_info)
+            entry = self.get_manifest_entry(release_info)
+            if entry and self.is_up_to_date(entry):
+                self.label.config(text="Already up to date.")
+            else:
+                self.label.config(text="Downloading latest version...")
+                version = release_info.get("tag_name", "latest")
+                self.fetch_update(asset, entry, self.stager.staging_path(version, TOOL_NAME))
+                self.replace_file(version)
+                self.label.config(text="Update completed successfully!")
             self.ok_btn.config(state="normal")
             self.launch_tool()
             self.root.after(1000, self.root.destroy)
@@ -45,35 +235,71 @@ class UpdaterApp:
             self.label.config(text=f"Error: {e}")
             self.retry_btn.config(state="normal")
 
-    def get_github_asset_url(self):
-        response = requests.get(GITHUB_API)
-        if response.status_code != 200:
+    def get_release_info(self):
+        try:
+            cache = ReleaseCache(min_interval=load_config()["update_check_min_interval"])
+            return cache.get(GITHUB_API)
+        except (requests.RequestException, ValueError):
             raise Exception("Failed to get release info")
-        release_info = response.json()
 
+    def get_github_asset(self, release_info):
         for asset in release_info.get("assets", []):
             if asset["name"] == TOOL_NAME:
-                return asset["browser_download_url"]
+                return asset
         raise Exception(f"{TOOL_NAME} not found in release")
 
-    def download_file(self, url, filename):
-        response = requests.get(url, stream=True)
-        total_length = int(response.headers.get('content-length', 0))
+    def get_manifest_entry(self, release_info):
+        try:
+            return fetch_manifest(release_info)["files"].get(TOOL_NAME)
+        except (DeltaUnavailable, requests.RequestException, ValueError):
+            return None
+
+    def is_up_to_date(self, entry):
+        return (os.path.isfile(TOOL_NAME) and os.path.getsize(TOOL_NAME) == entry["size"]
+                and HashCache().sha256(TOOL_NAME) == entry["sha256"])
 
-        with open(filename, 'wb') as f:
+    def fetch_update(self, asset, entry, staged):
+        url = asset["browser_download_url"]
+        # 没有可信的哈希时不安装，只检查大小挡不住被篡改或截断的文件
+        expected_sha256 = entry["sha256"] if entry else asset_sha256(asset)
+        if not expected_sha256:
+            raise Exception(f"No SHA-256 published for {TOOL_NAME}; refusing to install")
+        # 清单里有分块哈希时只下载变化的块，否则下载整个文件
+        if entry:
             downloaded = 0
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    progress_percent = int(100 * downloaded / total_length)
-                    self.progress['value'] = progress_percent
-                    self.root.update()
 
-    def replace_file(self):
-        if os.path.exists(TOOL_NAME):
-            os.rename(TOOL_NAME, TOOL_NAME + ".bak")
-        shutil.move(TEMP_FILE, TOOL_NAME)
+            def report(size):
+                nonlocal downloaded
+                downloaded += size
+                self.show_progress(downloaded, entry["size"])
+
+            try:
+                build_from_blocks(TOOL_NAME, staged, entry, url, report)
+                return
+            except (DeltaUnavailable, requests.RequestException):
+                pass
+        self.download_file(url, staged, expected_sha256, expected_size=(entry or asset).get("size"),
+                           blocks=entry and entry.get("blocks"))
+
+    def show_progress(self, downloaded, total, force=False):
+        # 限制刷新频率，避免每个数据块都重绘界面
+        now = time.monotonic()
+        if not force and now - self._last_refresh < PROGRESS_INTERVAL:
+            return
+        self._last_refresh = now
+        if total:
+            self.progress['value'] = int(100 * downloaded / total)
+        self.root.update()
+
+    def download_file(self, url, filename, expected_sha256, expected_size=None, blocks=None):
+        downloader = RangeDownloader(url, filename, blocks=blocks)
+        downloader.run(lambda: self.show_progress(downloader.downloaded, downloader.total))
+        self.show_progress(downloader.downloaded, downloader.total, force=True)
+        downloader.verify(expected_sha256, expected_size)
+
+    def replace_file(self, version):
+        # 旧文件保存在 .update/backups 中，替换失败时自动恢复
+        self.stager.install(version, [TOOL_NAME])
 
     def launch_tool(self):
         subprocess.Popen([TOOL_NAME], shell=True)
@@ -82,9 +308,27 @@ class UpdaterApp:
         self.retry_btn.config(state="disabled")
         self.label.config(text="Retrying...")
         self.progress["value"] = 0
+        # 已下载的部分会保留，重试时从中断处继续
+        self.root.after(100, self.start_update)
 
 
 def main():
+    if "--rollback" in sys.argv:
+        # 恢复到最近一次更新之前的版本
+        try:
+            UpdateStager().rollback()
+        except OSError as e:
+            # 打包成无控制台的 exe 后异常信息看不到，用对话框告诉用户
+            from tkinter import messagebox
+            root = tk.Tk()
+            root.withdraw()
+            if isinstance(e, FileNotFoundError):
+                messagebox.showinfo("Rollback", "There is no previous version to roll back to.")
+            else:
+                messagebox.showerror("Rollback failed", str(e))
+            root.destroy()
+        subprocess.Popen([TOOL_NAME], shell=True)
+        return
     root = tk.Tk()
     app = UpdaterApp(root)
     root.mainloop()